@@ -1,54 +1,137 @@
-from typing import Generator, Optional
+from typing import Any, Callable, Generator, Iterator, Optional, Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 
+from app import schemas
 from app.core import security
 from app.core.config import settings
-from app.db.database import get_db
+from app.core.tenancy import resolve_realm
+from app.core.tracing import traced
+from app.crud import crud_user
+from app.db.database import ReadSessionLocal, get_db, replica_router, route_for_user
 from app.db import models
-from app import schemas
+from app.services.permissions import permission_resource, permission_service
+from app.services.revocation import revocation_set
+from app.services.token_validation import claims_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/token")
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> models.User:
-    credentials_exception = HTTPException(
+def get_realm(
+    realm: Optional[str] = Header(None, alias=settings.TENANT_HEADER),
+) -> str:
+    """Realm (tenant) of the request, from the TENANT_HEADER header"""
+    resolved = resolve_realm(realm)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Unknown realm")
+    return resolved
+
+
+def get_read_db(db: Session = Depends(get_db)) -> Iterator[Session]:
+    """Session for read-only lookups: a replica when any are configured,
+    otherwise the request's own session"""
+    if not replica_router.replicas:
+        yield db
+        return
+    read_db = ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+@traced("auth.current_user")
+def _verified_user(
+    db: Session, token: str, load_user: Callable[[Session, int], Any], realm: str
+) -> Any:
+    credentials_exception = _credentials_exception()
     
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = security.decode_jwt(token)
         user_id: str = payload.get("sub")
         jti: str = payload.get("jti")
         
         if user_id is None:
             raise credentials_exception
-        
-        token_data = schemas.TokenPayload(**payload)
     except JWTError:
         raise credentials_exception
     
+    route_for_user(db, int(user_id))
+    
     # Check if token is blacklisted
-    blacklisted = db.query(models.TokenBlacklist).filter(
-        models.TokenBlacklist.jti == jti
-    ).first()
-    if blacklisted:
+    if crud_user.is_token_blacklisted(db, jti):
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.id == int(user_id)).first()
-    if user is None:
+    user = load_user(db, int(user_id))
+    # A token only authenticates in the realm it was issued for
+    if user is None or user.realm != realm:
+        raise credentials_exception
+    
+    # Tokens issued before a "log out everywhere" are no longer valid
+    if not security.is_epoch_current(payload, user.token_epoch):
+        raise credentials_exception
+    
+    return user
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    realm: str = Depends(get_realm),
+) -> models.User:
+    """Current user as an ORM instance, for endpoints that modify it"""
+    return _verified_user(db, token, crud_user.get_user, realm)
+
+
+def get_current_user_row(
+    db: Session = Depends(get_read_db),
+    token: str = Depends(oauth2_scheme),
+    realm: str = Depends(get_realm),
+) -> Row:
+    """Current user as an immutable column row, for read-only endpoints"""
+    return _verified_user(db, token, crud_user.get_user_row_shared, realm)
+
+
+def get_current_user_claims(
+    db: Session = Depends(get_read_db),
+    token: str = Depends(oauth2_scheme),
+    realm: str = Depends(get_realm),
+) -> Union[schemas.TokenUser, Row]:
+    """Current user for routes that can be served from token claims alone
+
+    With STATELESS_ACCESS_TOKENS the access token is verified locally
+    against the cached revocation set, without touching Postgres or Vault.
+    Otherwise this is the same check as ``get_current_user_row``. Either
+    way the result exposes id, username, is_active and is_superuser.
+    """
+    if not settings.STATELESS_ACCESS_TOKENS:
+        return _verified_user(db, token, crud_user.get_user_row_shared, realm)
+    return _verified_claims(token, realm)
+
+
+@traced("auth.current_user", stateless=True)
+def _verified_claims(token: str, realm: str) -> schemas.TokenUser:
+    credentials_exception = _credentials_exception()
+    try:
+        payload = security.decode_jwt(token)
+    except JWTError:
         raise credentials_exception
     
+    user = claims_user(payload)
+    if user is None or user.realm != realm or revocation_set.is_revoked(payload):
+        raise credentials_exception
     return user
 
 
@@ -60,11 +143,61 @@ def get_current_active_user(
     return current_user
 
 
-def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+def get_current_active_user_row(
+    current_user: Row = Depends(get_current_user_row),
+) -> Row:
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+def get_current_active_user_claims(
+    current_user: Union[schemas.TokenUser, Row] = Depends(get_current_user_claims),
+) -> Union[schemas.TokenUser, Row]:
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+def _require_superuser(current_user: Any) -> Any:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+def get_current_active_superuser(
+    current_user: Row = Depends(get_current_user_row),
+) -> Row:
+    return _require_superuser(current_user)
+
+
+def get_current_active_superuser_claims(
+    current_user: Union[schemas.TokenUser, Row] = Depends(get_current_user_claims),
+) -> Union[schemas.TokenUser, Row]:
+    return _require_superuser(current_user)
+
+
+def require_permission(*permissions: str) -> Callable[..., Any]:
+    """Dependency factory: the current active user, if it holds every one
+    of ``permissions`` (403 otherwise)
+
+    The user's permission set is compiled and cached by
+    ``permission_service``, so the check itself is a few set lookups.
+    """
+    required = [(p, permission_resource(p)) for p in permissions]
+
+    def check_permissions(
+        current_user: Union[schemas.TokenUser, Row] = Depends(get_current_active_user_claims),
+    ) -> Union[schemas.TokenUser, Row]:
+        granted = permission_service.permissions_for(current_user)
+        for permission, resource in required:
+            if not granted.allows(permission, resource):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"Missing permission: {permission}",
+                )
+        return current_user
+
+    return check_permissions
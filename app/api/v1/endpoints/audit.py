@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.api import deps
+from app.core.config import settings
+from app.crud import crud_audit
+from app.db.database import get_db
+
+router = APIRouter()
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def audit_filters(
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> crud_audit.AuditLogFilters:
+    return crud_audit.AuditLogFilters(
+        user_id=user_id, action=action, status=status, since=since, until=until
+    )
+
+
+@router.get("/logs", response_model=schemas.AuditLogPage)
+def read_audit_logs(
+    filters: crud_audit.AuditLogFilters = Depends(audit_filters),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: schemas.TokenUser = Depends(deps.require_permission("audit:read")),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Query audit logs, newest first, with cursor pagination
+    """
+    try:
+        items, next_cursor = crud_audit.get_audit_logs(
+            db, filters, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/logs/export")
+def export_audit_logs(
+    filters: crud_audit.AuditLogFilters = Depends(audit_filters),
+    current_user: schemas.TokenUser = Depends(deps.require_permission("audit:read")),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Stream matching audit logs as NDJSON
+    """
+    def stream():
+        try:
+            for row in crud_audit.iter_audit_logs(
+                db, filters, batch_size=settings.AUDIT_EXPORT_BATCH_SIZE
+            ):
+                yield json.dumps(row, default=_json_default) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
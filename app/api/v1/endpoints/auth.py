@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
@@ -10,35 +10,57 @@ from slowapi.util import get_remote_address
 from app import schemas
 from app.core import security
 from app.core.config import settings
+from app.core.responses import render
 from app.core.security import limiter
-from app.db.database import get_db
+from app.core.tracing import span
+from app.api import deps
+from app.db.database import get_db, replica_router
 from app.db import models
 from app.services.vault import vault_service
-from app.services.keycloak import keycloak_service
-from app.crud import crud_user
+from app.services.keycloak import keycloak_clients
+from app.services.login_guard import account_for, login_guard
+from app.services.permissions import permission_service
+from app.services.revocation import revocation_set
+from app.services import token_validation
+from app.services.token_cache import validation_cache
+from app.crud import crud_revocation, crud_session, crud_user
 
 router = APIRouter()
 
 
+def _store_access_token(user_id: int, access_token: str) -> None:
+    # Stateless access tokens are never looked up, so skip the Vault write
+    if settings.STATELESS_ACCESS_TOKENS:
+        return
+    access_payload = security.decode_token(access_token)
+    vault_service.store_token(user_id, {
+        "jti": access_payload["jti"],
+        "type": "access",
+        "exp": access_payload["exp"],
+        "token": access_token
+    })
+
+
 @router.post("/register", response_model=schemas.User)
 @limiter.limit("5/minute")
 async def register(
     request: Request,
     user_in: schemas.UserCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    realm: str = Depends(deps.get_realm),
 ) -> Any:
     """
-    Register new user
+    Register new user in the request's realm
     """
     # Check if user exists
-    user = crud_user.get_user_by_email(db, email=user_in.email)
+    user = crud_user.get_user_by_email(db, email=user_in.email, realm=realm)
     if user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
-    user = crud_user.get_user_by_username(db, username=user_in.username)
+    user = crud_user.get_user_by_username(db, username=user_in.username, realm=realm)
     if user:
         raise HTTPException(
             status_code=400,
@@ -46,7 +68,7 @@ async def register(
         )
     
     # Create user in Keycloak
-    keycloak_id = keycloak_service.create_user(
+    keycloak_id = keycloak_clients.get(realm).create_user(
         email=user_in.email,
         username=user_in.username,
         password=user_in.password,
@@ -54,7 +76,7 @@ async def register(
     )
     
     # Create user in database
-    user = crud_user.create_user(db, user_in, keycloak_id)
+    user = crud_user.create_user(db, user_in, keycloak_id, realm=realm)
     
     # Log the registration
     audit_log = models.AuditLog(
@@ -66,6 +88,8 @@ async def register(
     )
     db.add(audit_log)
     db.commit()
+    # Reads about this user go to the primary until replicas have it
+    replica_router.mark_written(user.id)
     
     return user
 
@@ -75,15 +99,30 @@ async def register(
 async def login(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    realm: str = Depends(deps.get_realm),
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud_user.authenticate_user(
-        db, username=form_data.username, password=form_data.password
-    )
+    # Reject locked accounts before spending any time on password hashing.
+    # Not audited: under a credential-stuffing attack that would turn every
+    # rejected request into a database write. Known accounts are counted
+    # by user id, so alternating username and email shares one counter.
+    user = crud_user.get_user_by_login(db, form_data.username, realm)
+    account = account_for(realm, user.id if user else None, form_data.username)
+    locked_for = login_guard.locked_for(account)
+    if locked_for:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(locked_for)},
+        )
+    
+    user = crud_user.check_password(db, user, form_data.password)
     if not user:
+        login_guard.register_failure(account)
+        
         # Log failed attempt
         audit_log = models.AuditLog(
             action="login",
@@ -93,7 +132,8 @@ async def login(
             details=f"Invalid credentials for username: {form_data.username}"
         )
         db.add(audit_log)
-        db.commit()
+        with span("audit.commit"):
+            db.commit()
         
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -105,28 +145,34 @@ async def login(
             detail="Inactive user"
         )
     
-    # Create tokens
-    access_token = security.create_access_token(user.id)
-    refresh_token = security.create_refresh_token(user.id)
-    
-    # Decode tokens to get JTI
-    access_payload = security.decode_token(access_token)
-    refresh_payload = security.decode_token(refresh_token)
+    login_guard.reset(account)
     
-    # Store tokens in Vault
-    vault_service.store_token(user.id, {
-        "jti": access_payload["jti"],
-        "type": "access",
-        "exp": access_payload["exp"],
-        "token": access_token
-    })
-    
-    vault_service.store_token(user.id, {
-        "jti": refresh_payload["jti"],
-        "type": "refresh",
-        "exp": refresh_payload["exp"],
-        "token": refresh_token
-    })
+    # Create tokens
+    # Stateless tokens carry the roles; they hold until the token expires
+    claims = security.user_claims(user, permission_service.roles_for(user))
+    access_token = security.create_access_token(user.id, epoch=user.token_epoch, claims=claims)
+    _store_access_token(user.id, access_token)
+    
+    # The login starts a refresh token family: one session row holding the
+    # family's current refresh token, which replaces any Vault record
+    refresh_jti = security.new_jti()
+    refresh_lifetime = security.refresh_token_lifetime()
+    db_session = crud_session.create_session(
+        db,
+        user_id=user.id,
+        refresh_jti=refresh_jti,
+        expires_at=datetime.now(timezone.utc) + refresh_lifetime,
+        ip_address=get_remote_address(request),
+        user_agent=request.headers.get("user-agent"),
+    )
+    db.flush()
+    refresh_token = security.create_refresh_token(
+        user.id,
+        expires_delta=refresh_lifetime,
+        epoch=user.token_epoch,
+        jti=refresh_jti,
+        session_id=db_session.id,
+    )
     
     # Log successful login
     audit_log = models.AuditLog(
@@ -137,14 +183,15 @@ async def login(
         status="success"
     )
     db.add(audit_log)
-    db.commit()
+    with span("audit.commit"):
+        db.commit()
     
-    return {
+    return render(schemas.Token, {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    }
+        "expires_in": int(security.access_token_lifetime().total_seconds())
+    })
 
 
 @router.post("/refresh", response_model=schemas.Token)
@@ -171,48 +218,63 @@ async def refresh_token(
     
     user_id = payload.get("sub")
     jti = payload.get("jti")
+    session_id = payload.get("sid")
     
-    # Check if token exists in Vault
-    token_data = vault_service.get_token(user_id, jti)
-    if not token_data or token_data.get("revoked"):
+    # Check if user exists and is active
+    user = crud_user.get_user_row(db, user_id=int(user_id))
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or inactive"
+        )
+    
+    if not security.is_epoch_current(payload, user.token_epoch):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been revoked"
         )
     
-    # Check if user exists and is active
-    user = crud_user.get_user(db, user_id=int(user_id))
-    if not user or not user.is_active:
+    # Rotate the family's refresh token in one compare-and-swap
+    new_jti = security.new_jti()
+    refresh_lifetime = security.refresh_token_lifetime()
+    rotated_session_id = crud_session.rotate_session(
+        db,
+        old_jti=jti,
+        new_jti=new_jti,
+        expires_at=datetime.now(timezone.utc) + refresh_lifetime,
+        session_id=session_id,
+    )
+    if rotated_session_id is None:
+        # A superseded token of a live family was replayed: log the family out
+        if session_id is not None and crud_session.revoke_family_on_reuse(db, session_id, jti):
+            validation_cache.invalidate_user(user.id)
+            db.add(models.AuditLog(
+                user_id=user.id,
+                action="refresh_token_reuse",
+                ip_address=get_remote_address(request),
+                user_agent=request.headers.get("user-agent"),
+                status="failure",
+                details=f"Session {session_id} revoked",
+            ))
+            db.commit()
+            replica_router.mark_written(user.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found or inactive"
+            detail="Token has been revoked"
         )
     
     # Create new tokens
-    new_access_token = security.create_access_token(user.id)
-    new_refresh_token = security.create_refresh_token(user.id)
-    
-    # Decode new tokens to get JTI
-    access_payload = security.decode_token(new_access_token)
-    refresh_payload = security.decode_token(new_refresh_token)
-    
-    # Store new tokens in Vault
-    vault_service.store_token(user.id, {
-        "jti": access_payload["jti"],
-        "type": "access",
-        "exp": access_payload["exp"],
-        "token": new_access_token
-    })
-    
-    vault_service.store_token(user.id, {
-        "jti": refresh_payload["jti"],
-        "type": "refresh",
-        "exp": refresh_payload["exp"],
-        "token": new_refresh_token
-    })
-    
-    # Revoke old refresh token
-    vault_service.revoke_token(user_id, jti)
+    claims = security.user_claims(user, permission_service.roles_for(user))
+    new_access_token = security.create_access_token(user.id, epoch=user.token_epoch, claims=claims)
+    new_refresh_token = security.create_refresh_token(
+        user.id,
+        expires_delta=refresh_lifetime,
+        epoch=user.token_epoch,
+        jti=new_jti,
+        session_id=rotated_session_id,
+    )
+    _store_access_token(user.id, new_access_token)
+    validation_cache.invalidate_token(refresh_token, user.id)
     
     # Log token refresh
     audit_log = models.AuditLog(
@@ -224,13 +286,14 @@ async def refresh_token(
     )
     db.add(audit_log)
     db.commit()
+    replica_router.mark_written(user.id)
     
-    return {
+    return render(schemas.Token, {
         "access_token": new_access_token,
         "refresh_token": new_refresh_token,
         "token_type": "bearer",
-        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    }
+        "expires_in": int(security.access_token_lifetime().total_seconds())
+    })
 
 
 @router.post("/revoke", response_model=schemas.Message)
@@ -252,23 +315,31 @@ async def revoke_token(
     user_id = payload.get("sub")
     jti = payload.get("jti")
     
-    # Revoke token in Vault
-    success = vault_service.revoke_token(user_id, jti)
+    if payload.get("type") == "refresh":
+        # Refresh tokens live in their session: revoking one ends the family
+        success = crud_session.revoke_session_by_refresh_jti(db, jti) is not None
+    else:
+        # Revoke token in Vault; stateless access tokens are only blacklisted
+        success = vault_service.revoke_token(user_id, jti)
+        success = success or (
+            settings.STATELESS_ACCESS_TOKENS and token_validation.claims_user(payload) is not None
+        )
     if not success:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to revoke token"
         )
     
-    # Add to blacklist in database
-    blacklist_entry = models.TokenBlacklist(
+    # Add to blacklist in database (and the gateways' revocation feed)
+    crud_revocation.blacklist_token(
+        db,
         jti=jti,
         token_type=payload.get("type", "unknown"),
         user_id=int(user_id),
         expires_at=datetime.fromtimestamp(payload.get("exp")),
         reason=token_revoke.reason
     )
-    db.add(blacklist_entry)
+    validation_cache.invalidate_token(token_revoke.token, int(user_id))
     
     # Log token revocation
     audit_log = models.AuditLog(
@@ -281,6 +352,8 @@ async def revoke_token(
     )
     db.add(audit_log)
     db.commit()
+    revocation_set.revoke_jti(jti, payload.get("exp"))
+    replica_router.mark_written(int(user_id))
     
     return {"message": "Token revoked successfully"}
 
@@ -288,41 +361,9 @@ async def revoke_token(
 @router.get("/validate", response_model=schemas.ValidationResponse)
 async def validate_token(
     token: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(deps.get_read_db)
 ) -> Any:
     """
     Validate a token
     """
-    payload = security.decode_token(token)
-    if not payload:
-        return {"valid": False}
-    
-    user_id = payload.get("sub")
-    jti = payload.get("jti")
-    
-    # Check if token is blacklisted
-    blacklisted = db.query(models.TokenBlacklist).filter(
-        models.TokenBlacklist.jti == jti
-    ).first()
-    if blacklisted:
-        return {"valid": False}
-    
-    # Check token in Vault
-    token_data = vault_service.get_token(user_id, jti)
-    if not token_data or token_data.get("revoked"):
-        return {"valid": False}
-    
-    # Check if user exists and is active
-    user = crud_user.get_user(db, user_id=int(user_id))
-    if not user or not user.is_active:
-        return {"valid": False}
-    
-    # Optionally validate with Keycloak
-    # keycloak_valid = keycloak_service.validate_token(token)
-    
-    return {
-        "valid": True,
-        "user_id": user.id,
-        "username": user.username,
-        "exp": payload.get("exp")
-    }
+    return render(schemas.ValidationResponse, token_validation.check_token(db, token))
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import schemas
+from app.api import deps
+from app.core.config import settings
+from app.core.responses import DefaultResponse
+from app.services.revocation_feed import revocation_feed
+
+router = APIRouter()
+
+# Clients reconnect after this many milliseconds (SSE ``retry``)
+RECONNECT_MS = 3000
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+async def event_stream(offset: Optional[int]) -> AsyncIterator[bytes]:
+    """Server-sent revocation events after ``offset`` (the head if None)"""
+    yield f"retry: {RECONNECT_MS}\n\n".encode()
+    if offset is None:
+        offset = await run_in_threadpool(revocation_feed.head)
+
+    last_sent = time.monotonic()
+    while True:
+        events, reset = await run_in_threadpool(revocation_feed.events_after, offset)
+        if reset:
+            # Missed events were pruned: the client reloads the snapshot
+            yield _sse("reset", {"offset": offset})
+            return
+        if events:
+            yield b"".join(_sse(e["type"], e, e["id"]) for e in events)
+            offset = events[-1]["id"]
+            last_sent = time.monotonic()
+            continue
+        if time.monotonic() - last_sent >= settings.REVOCATION_STREAM_HEARTBEAT_SECONDS:
+            # Comment line: keeps proxies from closing an idle connection
+            yield b": keepalive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(settings.REVOCATION_STREAM_POLL_SECONDS)
+
+
+@router.get("/snapshot", response_model=schemas.RevocationSnapshot)
+def read_revocation_snapshot(
+    current_user: schemas.TokenUser = Depends(deps.require_permission("revocations:read")),
+) -> Any:
+    """
+    Unexpired revoked tokens and users with revoked tokens, plus the
+    offset to resume the event stream from
+    """
+    return DefaultResponse(revocation_feed.snapshot())
+
+
+@router.get("/events")
+async def stream_revocation_events(
+    after: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[int] = Header(None, ge=0),
+    current_user: schemas.TokenUser = Depends(deps.require_permission("revocations:read")),
+    db: Session = Depends(deps.get_read_db),
+) -> Any:
+    """
+    Stream revocation events (server-sent events)
+
+    Each event's ``id`` is its offset. Resume with ``Last-Event-ID`` (sent
+    by EventSource on reconnect) or ``after``; without either the stream
+    starts at the current head. ``token`` events revoke one jti, ``user``
+    events revoke a user's tokens below ``token_epoch`` (all of them when
+    ``is_active`` is false), and ``reset`` asks the client to reload the
+    snapshot.
+    """
+    # Only needed for authentication: give the connection back instead of
+    # holding it for the lifetime of the stream
+    db.close()
+    offset = last_event_id if last_event_id is not None else after
+    return StreamingResponse(
+        event_stream(offset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
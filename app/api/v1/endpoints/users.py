@@ -1,24 +1,39 @@
-from typing import Any
+from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
+from slowapi.util import get_remote_address
 
 from app import schemas
 from app.api import deps
-from app.db.database import get_db
-from app.crud import crud_user
+from app.db.database import get_db, replica_router
+from app.core.responses import render
+from app.crud import crud_revocation, crud_session, crud_user
+from app.db import models
+from app.services.revocation import revocation_set
+from app.services.permissions import permission_service
+from app.services.token_cache import validation_cache
+from app.services.bulk_users import FORMAT_CSV, FORMAT_NDJSON, bulk_user_service
+
+EXPORT_MEDIA_TYPES = {
+    FORMAT_NDJSON: "application/x-ndjson",
+    FORMAT_CSV: "text/csv",
+}
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=schemas.User)
 async def read_user_me(
-    current_user: schemas.User = Depends(deps.get_current_active_user),
+    current_user: Row = Depends(deps.get_current_active_user_row),
 ) -> Any:
     """
     Get current user
     """
-    return current_user
+    return render(schemas.User, current_user)
 
 
 @router.put("/me", response_model=schemas.User)
@@ -31,6 +46,10 @@ async def update_user_me(
     Update current user
     """
     user = crud_user.update_user(db, db_user=current_user, user_update=user_update)
+    validation_cache.invalidate_user(user.id)
+    revocation_set.update_user(user.id, user.token_epoch, user.is_active)
+    permission_service.invalidate_user(user.id)
+    replica_router.mark_written(user.id)
     return user
 
 
@@ -44,7 +63,10 @@ async def change_password(
     Change current user password
     """
     user = crud_user.authenticate_user(
-        db, username=current_user.username, password=password_change.current_password
+        db,
+        username=current_user.username,
+        password=password_change.current_password,
+        realm=current_user.realm,
     )
     if not user:
         raise HTTPException(
@@ -54,5 +76,151 @@ async def change_password(
     
     # Update password
     crud_user.update_password(db, user=user, new_password=password_change.new_password)
+    validation_cache.invalidate_user(user.id)
+    replica_router.mark_written(user.id)
     
     return {"message": "Password updated successfully"}
+
+
+def _logout_everywhere(
+    db: Session, request: Request, user: models.User, actor_id: int
+) -> None:
+    crud_user.revoke_all_tokens(db, user)
+    validation_cache.invalidate_user(user.id)
+    revocation_set.update_user(user.id, user.token_epoch, user.is_active)
+    permission_service.invalidate_user(user.id)
+    db.add(models.AuditLog(
+        user_id=user.id,
+        action="logout_all",
+        ip_address=get_remote_address(request),
+        user_agent=request.headers.get("user-agent"),
+        status="success",
+        details=None if actor_id == user.id else f"Revoked by user {actor_id}",
+    ))
+    db.commit()
+    replica_router.mark_written(user.id)
+
+
+@router.get("/me/sessions", response_model=List[schemas.Session])
+def read_user_sessions(
+    current_user: schemas.TokenUser = Depends(deps.get_current_active_user_claims),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    List active sessions of the current user
+    """
+    return crud_session.get_active_sessions(db, user_id=current_user.id)
+
+
+@router.delete("/me/sessions/{session_id}", response_model=schemas.Message)
+def revoke_user_session(
+    session_id: int,
+    current_user: schemas.TokenUser = Depends(deps.get_current_active_user_claims),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Log out a single session
+    """
+    db_session = crud_session.revoke_session(
+        db, user_id=current_user.id, session_id=session_id
+    )
+    if db_session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    # The revoked session can no longer rotate; the blacklist entry also
+    # rejects its current refresh token everywhere else
+    validation_cache.invalidate_user(current_user.id)
+    crud_revocation.blacklist_token(
+        db,
+        jti=db_session.refresh_jti,
+        token_type="refresh",
+        user_id=current_user.id,
+        expires_at=db_session.expires_at,
+        reason="Session revoked",
+    )
+    db.commit()
+    replica_router.mark_written(current_user.id)
+    return {"message": "Session revoked"}
+
+
+@router.post("/me/logout-all", response_model=schemas.Message)
+def logout_all_sessions(
+    request: Request,
+    current_user: models.User = Depends(deps.get_current_active_user),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Revoke every token of the current user
+    """
+    _logout_everywhere(db, request, user=current_user, actor_id=current_user.id)
+    return {"message": "All sessions revoked"}
+
+
+@router.post("/{user_id}/logout-all", response_model=schemas.Message)
+def logout_user_everywhere(
+    user_id: int,
+    request: Request,
+    current_user: schemas.TokenUser = Depends(deps.require_permission("users:revoke")),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Revoke every token of a user (e.g. a compromised account)
+    """
+    user = crud_user.get_user(db, user_id=user_id)
+    # Admins only manage users of their own realm
+    if not user or user.realm != current_user.realm:
+        raise HTTPException(status_code=404, detail="User not found")
+    _logout_everywhere(db, request, user=user, actor_id=current_user.id)
+    return {"message": "All sessions revoked"}
+
+
+@router.post("/import", response_model=schemas.BulkImportResult)
+async def import_users(
+    request: Request,
+    format: str = Query(FORMAT_NDJSON, pattern="^(ndjson|csv)$"),
+    provision_keycloak: bool = True,
+    current_user: schemas.TokenUser = Depends(deps.require_permission("users:import")),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Bulk import users from an NDJSON or CSV request body into the
+    caller's realm
+    """
+    progress = await bulk_user_service.import_stream(
+        db,
+        request.stream(),
+        fmt=format,
+        provision_keycloak=provision_keycloak,
+        realm=current_user.realm,
+    )
+    await run_in_threadpool(
+        bulk_user_service.log_import,
+        db,
+        progress,
+        actor_id=current_user.id,
+        ip_address=get_remote_address(request),
+        user_agent=request.headers.get("user-agent"),
+    )
+    return progress.as_dict()
+
+
+@router.get("/export")
+def export_users(
+    format: str = Query(FORMAT_NDJSON, pattern="^(ndjson|csv)$"),
+    current_user: schemas.TokenUser = Depends(deps.require_permission("users:export")),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Stream all users of the caller's realm as NDJSON or CSV
+    """
+    def stream():
+        try:
+            yield from bulk_user_service.export_lines(db, fmt=format, realm=current_user.realm)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=users.{format}"},
+    )
@@ -0,0 +1,12 @@
+"""Envoy external authorization (ext_authz) for the token validation logic.
+
+Two transports share ``app.services.token_validation``:
+
+* ``app.authz.server``: the gRPC ``envoy.service.auth.v3.Authorization``
+  service, run as its own process (``python -m app.authz.server``).
+* ``app.authz.asgi``: the HTTP ext_authz variant, mounted on the main app
+  at ``/ext_authz``.
+
+Allowed requests are forwarded upstream with ``x-user-id``,
+``x-username`` and ``x-user-realm`` headers; denied ones get a 401.
+"""
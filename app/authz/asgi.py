@@ -0,0 +1,68 @@
+"""HTTP ext_authz endpoint for Envoy, mounted at /ext_authz.
+
+Envoy's HTTP ext_authz filter sends the original method, path and
+(allow-listed) headers to ``/ext_authz/<original path>``. A 200 with
+``x-user-id`` / ``x-username`` / ``x-user-realm`` lets the request
+through with those headers added; any other status is returned to the
+client as is.
+
+A pure ASGI app: no routing, validation or middleware beyond the token
+check. Results cached in this process and stateless tokens are answered
+on the event loop without I/O; anything needing Redis, a revocation
+refresh or the database runs in the threadpool. Errors during the check
+are logged and denied, like the gRPC server.
+"""
+import logging
+
+from starlette.concurrency import run_in_threadpool
+
+from app.authz import checks
+from app.core.tracing import span
+from app.services import token_validation
+
+logger = logging.getLogger(__name__)
+
+_AUTHORIZATION = b"authorization"
+_DENY_HEADERS = [
+    (b"www-authenticate", b"Bearer"),
+    (b"content-length", b"0"),
+]
+
+
+def _allow_headers(result: dict) -> list:
+    return [
+        *((name.encode(), value.encode()) for name, value in checks.identity_headers(result)),
+        (b"content-length", b"0"),
+    ]
+
+
+async def ext_authz_app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+
+    authorization = None
+    for name, value in scope["headers"]:
+        if name == _AUTHORIZATION:
+            authorization = value.decode("latin-1")
+            break
+    token = checks.bearer_token(authorization)
+
+    with span("authz.check"):
+        result = None
+        if token is not None:
+            try:
+                result = token_validation.check_local(token)
+                if result is None:
+                    result = await run_in_threadpool(checks.check_blocking, token)
+                else:
+                    result = checks.allowed(result)
+            except Exception:
+                logger.exception("Error checking token")
+                result = None
+
+    await send({
+        "type": "http.response.start",
+        "status": 200 if result else 401,
+        "headers": _allow_headers(result) if result else _DENY_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": b""})
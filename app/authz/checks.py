@@ -0,0 +1,57 @@
+from typing import Dict, Optional, Tuple
+
+from app.core.tenancy import DEFAULT_REALM
+from app.db.database import ReadSessionLocal
+from app.services import token_validation
+
+USER_ID_HEADER = "x-user-id"
+USERNAME_HEADER = "x-username"
+REALM_HEADER = "x-user-realm"
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """Token from an ``Authorization: Bearer`` header value"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def identity_headers(result: Dict) -> Tuple[Tuple[str, str], ...]:
+    return (
+        (USER_ID_HEADER, str(result["user_id"])),
+        (USERNAME_HEADER, result["username"] or ""),
+        (REALM_HEADER, result.get("realm") or DEFAULT_REALM),
+    )
+
+
+def allowed(result: Dict) -> Optional[Dict]:
+    # Only access tokens authorize requests; refresh tokens are for /auth/refresh
+    return result if result["valid"] and result.get("type") == "access" else None
+
+
+def check_blocking(token: str) -> Optional[Dict]:
+    """Validation that may use Redis or the database, in a read-only
+    session (which connects only if the database is needed); blocks"""
+    db = ReadSessionLocal()
+    try:
+        result = token_validation.check_token(db, token)
+    finally:
+        db.close()
+    return allowed(result)
+
+
+def check(token: Optional[str]) -> Optional[Dict]:
+    """Validation result for an allowed token, None to deny
+
+    Results cached in this process and stateless tokens are answered
+    without I/O.
+    """
+    if token is None:
+        return None
+    result = token_validation.check_local(token)
+    if result is None:
+        return check_blocking(token)
+    return allowed(result)
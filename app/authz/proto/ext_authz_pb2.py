@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: app/authz/proto/ext_authz.proto
+# Protobuf Python Version: 4.25.0
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1f\x61pp/authz/proto/ext_authz.proto\x12\x15\x65nvoy.service.auth.v3\"*\n\tRpcStatus\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\")\n\x0bHeaderValue\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\"G\n\x11HeaderValueOption\x12\x32\n\x06header\x18\x01 \x01(\x0b\x32\".envoy.service.auth.v3.HeaderValue\"\x1a\n\nHttpStatus\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\"\xed\x02\n\x10\x41ttributeContext\x12@\n\x07request\x18\x04 \x01(\x0b\x32/.envoy.service.auth.v3.AttributeContext.Request\x1a\xc8\x01\n\x0bHttpRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0e\n\x06method\x18\x02 \x01(\t\x12Q\n\x07headers\x18\x03 \x03(\x0b\x32@.envoy.service.auth.v3.AttributeContext.HttpRequest.HeadersEntry\x12\x0c\n\x04path\x18\x04 \x01(\t\x12\x0c\n\x04host\x18\x05 \x01(\t\x1a.\n\x0cHeadersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x1aL\n\x07Request\x12\x41\n\x04http\x18\x02 \x01(\x0b\x32\x33.envoy.service.auth.v3.AttributeContext.HttpRequest\"K\n\x0c\x43heckRequest\x12;\n\nattributes\x18\x01 \x01(\x0b\x32\'.envoy.service.auth.v3.AttributeContext\"\x90\x01\n\x12\x44\x65niedHttpResponse\x12\x31\n\x06status\x18\x01 \x01(\x0b\x32!.envoy.service.auth.v3.HttpStatus\x12\x39\n\x07headers\x18\x02 \x03(\x0b\x32(.envoy.service.auth.v3.HeaderValueOption\x12\x0c\n\x04\x62ody\x18\x03 \x01(\t\"K\n\x0eOkHttpResponse\x12\x39\n\x07headers\x18\x02 \x03(\x0b\x32(.envoy.service.auth.v3.HeaderValueOption\"\xd6\x01\n\rCheckResponse\x12\x30\n\x06status\x18\x01 \x01(\x0b\x32 .envoy.service.auth.v3.RpcStatus\x12\x44\n\x0f\x64\x65nied_response\x18\x02 \x01(\x0b\x32).envoy.service.auth.v3.DeniedHttpResponseH\x00\x12<\n\x0bok_response\x18\x03 \x01(\x0b\x32%.envoy.service.auth.v3.OkHttpResponseH\x00\x42\x0f\n\rhttp_response2c\n\rAuthorization\x12R\n\x05\x43heck\x12#.envoy.service.auth.v3.CheckRequest\x1a$.envoy.service.auth.v3.CheckResponseb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'app.authz.proto.ext_authz_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+  DESCRIPTOR._options = None
+  _globals['_ATTRIBUTECONTEXT_HTTPREQUEST_HEADERSENTRY']._options = None
+  _globals['_ATTRIBUTECONTEXT_HTTPREQUEST_HEADERSENTRY']._serialized_options = b'8\001'
+  _globals['_RPCSTATUS']._serialized_start=58
+  _globals['_RPCSTATUS']._serialized_end=100
+  _globals['_HEADERVALUE']._serialized_start=102
+  _globals['_HEADERVALUE']._serialized_end=143
+  _globals['_HEADERVALUEOPTION']._serialized_start=145
+  _globals['_HEADERVALUEOPTION']._serialized_end=216
+  _globals['_HTTPSTATUS']._serialized_start=218
+  _globals['_HTTPSTATUS']._serialized_end=244
+  _globals['_ATTRIBUTECONTEXT']._serialized_start=247
+  _globals['_ATTRIBUTECONTEXT']._serialized_end=612
+  _globals['_ATTRIBUTECONTEXT_HTTPREQUEST']._serialized_start=334
+  _globals['_ATTRIBUTECONTEXT_HTTPREQUEST']._serialized_end=534
+  _globals['_ATTRIBUTECONTEXT_HTTPREQUEST_HEADERSENTRY']._serialized_start=488
+  _globals['_ATTRIBUTECONTEXT_HTTPREQUEST_HEADERSENTRY']._serialized_end=534
+  _globals['_ATTRIBUTECONTEXT_REQUEST']._serialized_start=536
+  _globals['_ATTRIBUTECONTEXT_REQUEST']._serialized_end=612
+  _globals['_CHECKREQUEST']._serialized_start=614
+  _globals['_CHECKREQUEST']._serialized_end=689
+  _globals['_DENIEDHTTPRESPONSE']._serialized_start=692
+  _globals['_DENIEDHTTPRESPONSE']._serialized_end=836
+  _globals['_OKHTTPRESPONSE']._serialized_start=838
+  _globals['_OKHTTPRESPONSE']._serialized_end=913
+  _globals['_CHECKRESPONSE']._serialized_start=916
+  _globals['_CHECKRESPONSE']._serialized_end=1130
+  _globals['_AUTHORIZATION']._serialized_start=1132
+  _globals['_AUTHORIZATION']._serialized_end=1231
+# @@protoc_insertion_point(module_scope)
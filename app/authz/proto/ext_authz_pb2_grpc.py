@@ -0,0 +1,66 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+from app.authz.proto import ext_authz_pb2 as app_dot_authz_dot_proto_dot_ext__authz__pb2
+
+
+class AuthorizationStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Check = channel.unary_unary(
+                '/envoy.service.auth.v3.Authorization/Check',
+                request_serializer=app_dot_authz_dot_proto_dot_ext__authz__pb2.CheckRequest.SerializeToString,
+                response_deserializer=app_dot_authz_dot_proto_dot_ext__authz__pb2.CheckResponse.FromString,
+                )
+
+
+class AuthorizationServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def Check(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_AuthorizationServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Check': grpc.unary_unary_rpc_method_handler(
+                    servicer.Check,
+                    request_deserializer=app_dot_authz_dot_proto_dot_ext__authz__pb2.CheckRequest.FromString,
+                    response_serializer=app_dot_authz_dot_proto_dot_ext__authz__pb2.CheckResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'envoy.service.auth.v3.Authorization', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Authorization(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Check(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/envoy.service.auth.v3.Authorization/Check',
+            app_dot_authz_dot_proto_dot_ext__authz__pb2.CheckRequest.SerializeToString,
+            app_dot_authz_dot_proto_dot_ext__authz__pb2.CheckResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
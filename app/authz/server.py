@@ -0,0 +1,109 @@
+"""gRPC ext_authz server for Envoy.
+
+    python -m app.authz.server
+
+Implements ``envoy.service.auth.v3.Authorization/Check``: the bearer
+token from the request's Authorization header is validated like
+/auth/validate. Allowed requests get an OK status and ``x-user-id`` /
+``x-username`` / ``x-user-realm`` headers for the upstream; everything
+else is denied with UNAUTHENTICATED and a 401. Validation blocks on the database and Vault
+when the token is neither cached nor stateless, so calls are served by
+a thread pool; calls beyond AUTHZ_GRPC_MAX_CONCURRENT_RPCS are rejected
+immediately rather than queued, and Envoy applies its failure mode.
+"""
+import logging
+import signal
+from concurrent import futures
+from typing import Optional
+
+import grpc
+
+from app.authz import checks
+from app.authz.proto import ext_authz_pb2 as pb
+from app.authz.proto import ext_authz_pb2_grpc as pb_grpc
+from app.core.config import settings
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# google.rpc.Code values
+RPC_OK = 0
+RPC_UNAUTHENTICATED = 16
+
+
+def _header_options(headers) -> list:
+    return [
+        pb.HeaderValueOption(header=pb.HeaderValue(key=key, value=value))
+        for key, value in headers
+    ]
+
+
+def allow_response(result: dict) -> pb.CheckResponse:
+    return pb.CheckResponse(
+        status=pb.RpcStatus(code=RPC_OK),
+        ok_response=pb.OkHttpResponse(headers=_header_options(checks.identity_headers(result))),
+    )
+
+
+DENY_RESPONSE = pb.CheckResponse(
+    status=pb.RpcStatus(code=RPC_UNAUTHENTICATED, message="Invalid or missing bearer token"),
+    denied_response=pb.DeniedHttpResponse(
+        status=pb.HttpStatus(code=401),
+        headers=_header_options([("www-authenticate", "Bearer")]),
+    ),
+)
+
+
+class AuthorizationServicer(pb_grpc.AuthorizationServicer):
+    def Check(self, request: pb.CheckRequest, context) -> pb.CheckResponse:
+        # Envoy lower-cases header names
+        headers = request.attributes.request.http.headers
+        with span("authz.check"):
+            try:
+                result = checks.check(checks.bearer_token(headers.get("authorization")))
+            except Exception:
+                logger.exception("Error checking token")
+                result = None
+        return allow_response(result) if result else DENY_RESPONSE
+
+
+def create_server(
+    address: Optional[str] = None,
+    workers: int = settings.AUTHZ_GRPC_WORKERS,
+    max_concurrent_rpcs: int = settings.AUTHZ_GRPC_MAX_CONCURRENT_RPCS,
+):
+    """Build (not start) the server; returns it and the bound port"""
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="authz"),
+        maximum_concurrent_rpcs=max_concurrent_rpcs,
+        options=[
+            ("grpc.so_reuseport", 1),
+            ("grpc.keepalive_permit_without_calls", 1),
+        ],
+    )
+    pb_grpc.add_AuthorizationServicer_to_server(AuthorizationServicer(), server)
+    port = server.add_insecure_port(
+        address or f"{settings.AUTHZ_GRPC_HOST}:{settings.AUTHZ_GRPC_PORT}"
+    )
+    return server, port
+
+
+def serve() -> None:
+    from app.core.log import setup_logging
+    from app.core.tracing import setup_tracing
+
+    setup_logging()
+    setup_tracing()
+    server, port = create_server()
+    server.start()
+    logger.info("ext_authz gRPC server listening on port %s", port)
+
+    def _stop(signum, frame):
+        server.stop(grace=settings.SERVER_GRACEFUL_TIMEOUT)
+
+    signal.signal(signal.SIGTERM, _stop)
+    server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    serve()
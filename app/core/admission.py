@@ -0,0 +1,185 @@
+"""Adaptive admission control with priority-based load shedding.
+
+Each worker admits at most ``limit`` requests at a time. Routes fall
+into priority classes by path prefix, and each class may only fill its
+share of the limit, so when the worker saturates the expensive low
+priority routes (registration, login: bcrypt + Keycloak + Vault) are
+turned away first. Then the normal ones go. Critical routes
+(/auth/validate, ext_authz, health) can use the whole limit. A shed
+request gets a 503 with Retry-After without touching the app.
+
+The limit adapts once per window (AIMD on latency). Each class keeps a
+baseline: its lowest average latency, drifting up slowly so the
+baseline follows lasting changes. If any class averaged more than
+``tolerance`` times its baseline during the window, the worker is
+queueing rather than working, and the limit is cut by ``decrease``. If
+the limit was reached instead, it grows by about its square root.
+
+This complements the per-client slowapi ``limiter``. That one caps what
+a single caller may ask for; this caps what the worker accepts from
+everyone together.
+"""
+import math
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import orjson
+
+from app.core.config import settings
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+EXEMPT = "exempt"
+
+# Classes with fewer samples in a window do not vote on the limit
+MIN_SAMPLES = 5
+# Per window, a class's baseline may rise by this factor towards its
+# current latency
+BASELINE_DRIFT = 1.02
+
+
+class AdmissionController:
+    """In-flight limit shared by the requests of one worker (event loop)
+
+    Not thread-safe: all calls come from the event loop.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.ADMISSION_CONTROL_ENABLED,
+        initial_limit: int = settings.ADMISSION_INITIAL_LIMIT,
+        min_limit: int = settings.ADMISSION_MIN_LIMIT,
+        max_limit: int = settings.ADMISSION_MAX_LIMIT,
+        window_seconds: float = settings.ADMISSION_WINDOW_SECONDS,
+        tolerance: float = settings.ADMISSION_LATENCY_TOLERANCE,
+        decrease: float = settings.ADMISSION_DECREASE_FACTOR,
+        normal_share: float = settings.ADMISSION_NORMAL_SHARE,
+        low_share: float = settings.ADMISSION_LOW_SHARE,
+        critical_paths: Sequence[str] = tuple(settings.ADMISSION_CRITICAL_PATHS),
+        low_paths: Sequence[str] = tuple(settings.ADMISSION_LOW_PATHS),
+        exempt_paths: Sequence[str] = tuple(settings.ADMISSION_EXEMPT_PATHS),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window_seconds = window_seconds
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.shares = {CRITICAL: 1.0, NORMAL: normal_share, LOW: low_share}
+        self.critical_paths = tuple(critical_paths)
+        self.low_paths = tuple(low_paths)
+        self.exempt_paths = tuple(exempt_paths)
+        self.clock = clock
+        self.in_flight = 0
+        self.admitted = {cls: 0 for cls in self.shares}
+        self.shed = {cls: 0 for cls in self.shares}
+        self._baselines: Dict[str, float] = {}
+        # class -> (latency sum, samples) in the current window
+        self._samples: Dict[str, Tuple[float, int]] = {}
+        self._window_start = clock()
+        self._window_peak = 0
+        self._window_shed = False
+
+    def classify(self, path: str) -> str:
+        if path.startswith(self.exempt_paths):
+            return EXEMPT
+        if path.startswith(self.critical_paths):
+            return CRITICAL
+        if path.startswith(self.low_paths):
+            return LOW
+        return NORMAL
+
+    def try_acquire(self, cls: str) -> bool:
+        if self.in_flight >= self.limit * self.shares[cls]:
+            self.shed[cls] += 1
+            self._window_shed = True
+            return False
+        self.in_flight += 1
+        self.admitted[cls] += 1
+        if self.in_flight > self._window_peak:
+            self._window_peak = self.in_flight
+        return True
+
+    def release(self, cls: str, latency: float) -> None:
+        self.in_flight -= 1
+        total, count = self._samples.get(cls, (0.0, 0))
+        self._samples[cls] = (total + latency, count + 1)
+        now = self.clock()
+        if now - self._window_start >= self.window_seconds:
+            self._adjust()
+            self._window_start = now
+
+    def _adjust(self) -> None:
+        congested = False
+        for cls, (total, count) in self._samples.items():
+            if count < MIN_SAMPLES:
+                continue
+            average = total / count
+            baseline = self._baselines.get(cls)
+            baseline = average if baseline is None else min(average, baseline * BASELINE_DRIFT)
+            self._baselines[cls] = baseline
+            if average > baseline * self.tolerance:
+                congested = True
+
+        if congested:
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+        elif self._window_shed or self._window_peak >= self.limit * self.shares[LOW]:
+            self.limit = min(self.max_limit, self.limit + math.sqrt(self.limit))
+
+        self._samples = {}
+        self._window_peak = self.in_flight
+        self._window_shed = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying an AdmissionController"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+        self._shed_body = orjson.dumps({"detail": "Service overloaded, retry later"})
+        self._shed_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(self._shed_body)).encode()),
+            (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or not controller.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        cls = controller.classify(scope["path"])
+        if cls == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+        if not controller.try_acquire(cls):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": self._shed_headers,
+            })
+            await send({"type": "http.response.body", "body": self._shed_body})
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(cls, time.monotonic() - started)
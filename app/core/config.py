@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic_settings import BaseSettings
 from pydantic import AnyHttpUrl, field_validator
 import secrets
@@ -16,15 +16,95 @@ class Settings(BaseSettings):
     
     # Security
     SECRET_KEY: str = secrets.token_urlsafe(32)
-    ALGORITHM: str = "HS256"
+    ALGORITHM: str = "HS256"  # HS256 signs with SECRET_KEY; RS256/ES256 use the keyring
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Asymmetric signing keyring (scripts/jwt_keys.py manages it)
+    JWT_KEYRING_PATH: str = "keys/keyring.json"
+    # Retired keys stay published this long; keep it above the longest token lifetime
+    JWT_KEY_OVERLAP_SECONDS: int = 8 * 24 * 3600
+    # Keep accepting SECRET_KEY-signed tokens issued before switching algorithms
+    JWT_ACCEPT_HS256: bool = True
+    JWKS_MAX_AGE_SECONDS: int = 3600
+    
+    # Stateless access tokens: short-lived, carry the user's claims and are
+    # verified locally against a cached revocation set (no Postgres/Vault
+    # round trip). Refresh tokens always go through the stateful stores.
+    STATELESS_ACCESS_TOKENS: bool = False
+    STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    REVOCATION_SET_REFRESH_SECONDS: int = 5
+    
+    # Revocation feed for gateways keeping a local deny-list (/revocations)
+    REVOCATION_STREAM_POLL_SECONDS: float = 1.0
+    REVOCATION_STREAM_HEARTBEAT_SECONDS: int = 15
+    REVOCATION_STREAM_BUFFER_SIZE: int = 10000  # recent events served from memory
+    REVOCATION_STREAM_SETTLE_SECONDS: float = 5.0  # wait for ids of in-flight transactions
+    REVOCATION_EVENT_RETENTION_HOURS: int = 24
+    
+    # Permissions (deps.require_permission): role -> permissions granted;
+    # a role not listed grants the permission named like it
+    ROLE_PERMISSIONS: Dict[str, List[str]] = {"superuser": ["*"]}
+    # Also grant the user's Keycloak realm roles and KEYCLOAK_CLIENT_ID client roles
+    KEYCLOAK_ROLES_ENABLED: bool = False
+    PERMISSION_CACHE_TTL_SECONDS: int = 300
+    PERMISSION_CACHE_MAX_ENTRIES: int = 10000
+    # Changes made by other workers reach this worker's cache within this delay
+    PERMISSION_CACHE_REFRESH_SECONDS: int = 5
+    
+    # Login lockout (checked before any password hashing)
+    LOGIN_LOCKOUT_ENABLED: bool = True
+    LOGIN_LOCKOUT_THRESHOLD: int = 5
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 900
+    LOGIN_LOCKOUT_BASE_SECONDS: int = 30
+    LOGIN_LOCKOUT_MAX_SECONDS: int = 3600
+    LOGIN_GUARD_REDIS_ENABLED: bool = False
+    
+    # Idempotency keys: POSTs to these paths with an Idempotency-Key header
+    # run once; retries get the stored response
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_HEADER: str = "Idempotency-Key"
+    IDEMPOTENCY_PATHS: List[str] = [
+        "/api/v1/auth/register", "/api/v1/auth/token", "/api/v1/auth/refresh",
+    ]
+    # Stored responses hold tokens: keep them only as long as clients retry
+    IDEMPOTENCY_TTL_SECONDS: int = 600
+    # A claim whose request has not finished by then is taken over
+    IDEMPOTENCY_LOCK_SECONDS: int = 30
+    # Duplicates wait this long for the original, then get a 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_REDIS_ENABLED: bool = False
+    
+    # Password hashing
+    PASSWORD_HASH_SCHEME: str = "bcrypt"  # bcrypt or argon2 (argon2id)
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    # Pick the cost at startup so one hash takes about PASSWORD_HASH_TARGET_MS
+    PASSWORD_HASH_AUTO_CALIBRATE: bool = False
+    PASSWORD_HASH_TARGET_MS: int = 250
+    
+    # Production server (python -m app.server)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0  # 0 = derive from the cgroup CPU quota
+    SERVER_MAX_REQUESTS: int = 10000  # recycle a worker after this many requests
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    SERVER_PRELOAD: bool = True
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_TIMEOUT: int = 60
+    SERVER_KEEPALIVE: int = 5
+    
     # Database
     POSTGRES_DB: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     DATABASE_URL: str = ""
+    # Read-only lookups (token checks, /users/me) go to these when set
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # lagging replicas are skipped
+    REPLICA_LAG_CHECK_SECONDS: float = 5.0
     
     # Vault
     VAULT_URL: str = "http://localhost:8200"
@@ -35,6 +115,26 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     REDIS_TTL: int = 3600
+    REDIS_SOCKET_TIMEOUT: float = 0.05
+    
+    # /auth/validate result cache
+    VALIDATE_CACHE_ENABLED: bool = True
+    VALIDATE_CACHE_MAX_ENTRIES: int = 10000
+    VALIDATE_CACHE_TTL_SECONDS: int = 60
+    VALIDATE_CACHE_REDIS_ENABLED: bool = False
+    VALIDATE_CACHE_LOCAL_TTL_WITH_REDIS: int = 5
+    # Revocations made by other workers drop their entries within this delay
+    VALIDATE_CACHE_SYNC_SECONDS: float = 1.0
+    
+    # Share one upstream call between concurrent identical Vault, Keycloak
+    # and user lookups (see app/core/singleflight.py)
+    SINGLEFLIGHT_ENABLED: bool = True
+    
+    # Envoy external authorization (python -m app.authz.server)
+    AUTHZ_GRPC_HOST: str = "0.0.0.0"
+    AUTHZ_GRPC_PORT: int = 9191
+    AUTHZ_GRPC_WORKERS: int = 32  # threads handling Check calls
+    AUTHZ_GRPC_MAX_CONCURRENT_RPCS: int = 1024  # beyond this, calls fail fast
     
     # Keycloak
     KEYCLOAK_URL: str = "http://localhost:8080"
@@ -43,6 +143,25 @@ class Settings(BaseSettings):
     KEYCLOAK_CLIENT_SECRET: str = ""
     KEYCLOAK_ADMIN_USERNAME: str = "admin"
     KEYCLOAK_ADMIN_PASSWORD: str = "admin"
+    # Realm the admin user logs into (e.g. "master"); empty = the target realm
+    KEYCLOAK_ADMIN_REALM: str = ""
+    KEYCLOAK_JWKS_CACHE_SECONDS: int = 300  # per realm; 0 = no caching
+    
+    # Tenants: KEYCLOAK_REALM is the default, these are served as well.
+    # Requests pick a realm with TENANT_HEADER (see app/core/tenancy.py).
+    KEYCLOAK_REALMS: List[str] = []
+    TENANT_HEADER: str = "X-Realm"
+    # Client secrets of realms whose client differs from KEYCLOAK_CLIENT_SECRET
+    KEYCLOAK_REALM_CLIENT_SECRETS: Dict[str, str] = {}
+    # Per-realm Keycloak clients kept at most; least recently used go first
+    KEYCLOAK_MAX_REALM_CLIENTS: int = 16
+    
+    # Incremental Keycloak <-> local user sync (scripts/sync_keycloak_users.py)
+    KEYCLOAK_SYNC_BATCH_SIZE: int = 200
+    KEYCLOAK_SYNC_WORKERS: int = 8  # concurrent Keycloak admin calls
+    # Local changes younger than this wait for the next run, so rows from
+    # transactions still committing are not passed by the watermark
+    KEYCLOAK_SYNC_SETTLE_SECONDS: float = 30.0
     
     # JWT
     JWT_ALGORITHM: str = "RS256"
@@ -52,6 +171,8 @@ class Settings(BaseSettings):
     # CORS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
     ALLOWED_HOSTS: List[str] = ["localhost", "127.0.0.1"]
+    # Internal routes that skip host and CORS checks (app/core/edge.py)
+    EDGE_BYPASS_PATHS: List[str] = ["/api/v1/auth/validate", "/ext_authz/", "/health"]
     
     @field_validator("BACKEND_CORS_ORIGINS", mode="before")
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
@@ -65,8 +186,57 @@ class Settings(BaseSettings):
     RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_PER_HOUR: int = 1000
     
+    # Admission control (per worker): an adaptive in-flight request limit,
+    # with low priority routes shed first (503 + Retry-After)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 200
+    ADMISSION_MIN_LIMIT: int = 20
+    ADMISSION_MAX_LIMIT: int = 1000
+    ADMISSION_WINDOW_SECONDS: float = 1.0  # the limit is adjusted once per window
+    # Cut the limit when a class's latency exceeds its baseline by this factor
+    ADMISSION_LATENCY_TOLERANCE: float = 2.0
+    ADMISSION_DECREASE_FACTOR: float = 0.9
+    # Share of the limit each class may fill; critical routes get all of it
+    ADMISSION_NORMAL_SHARE: float = 0.8
+    ADMISSION_LOW_SHARE: float = 0.5
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    # Path prefixes per class; everything else is normal priority
+    ADMISSION_CRITICAL_PATHS: List[str] = [
+        "/health", "/ext_authz/", "/.well-known/", "/api/v1/auth/validate",
+    ]
+    ADMISSION_LOW_PATHS: List[str] = [
+        "/api/v1/auth/register", "/api/v1/auth/token", "/api/v1/users/change-password",
+        "/api/v1/users/import", "/api/v1/users/export", "/api/v1/audit/logs/export",
+    ]
+    # Long-lived streams would hold a slot for their whole lifetime
+    ADMISSION_EXEMPT_PATHS: List[str] = ["/api/v1/revocations/events", "/metrics"]
+    
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json or text
+    # Cap identical warnings/errors per logger and message (0 = no cap)
+    LOG_ERROR_RATE_LIMIT: int = 10
+    LOG_ERROR_RATE_WINDOW_SECONDS: int = 60
+    
+    # Tracing (OpenTelemetry)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.1  # for traces not started by the caller
+    TRACING_EXPORTER: str = "otlp"  # otlp, file or console
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    
+    # Bulk user import/export
+    BULK_IMPORT_BATCH_SIZE: int = 500
+    BULK_HASH_WORKERS: int = 0  # 0 = one worker per CPU
+    BULK_KEYCLOAK_WORKERS: int = 8
+    BULK_EXPORT_BATCH_SIZE: int = 1000
+    
+    # Audit log queries
+    AUDIT_EXPORT_BATCH_SIZE: int = 1000
+    
+    # Audit log partitioning (PostgreSQL)
+    AUDIT_PARTITION_PREMAKE_MONTHS: int = 3
+    AUDIT_RETENTION_MONTHS: int = 12  # 0 = keep forever
     
     class Config:
         env_file = ".env"
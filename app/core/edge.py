@@ -0,0 +1,153 @@
+"""Host checking, CORS and rate-limit keying in one pure ASGI pass.
+
+Replaces Starlette's TrustedHostMiddleware and CORSMiddleware. Those
+parse the headers into a ``Headers`` object each, and CORS wraps
+``send`` on every request with an Origin. Here everything the checks
+need is precomputed into sets at startup, and the raw header list is
+scanned once for Host, Origin and the preflight header. Routes listed in
+EDGE_BYPASS_PATHS (internal service-to-service calls such as
+/auth/validate) skip every check.
+
+CORS policy: the origins in BACKEND_CORS_ORIGINS, credentials allowed,
+and any method and header. Preflights are answered here. Other requests
+from an allowed origin get Access-Control-Allow-Origin with that origin.
+"""
+from typing import Iterable, Optional, Sequence
+
+from app.core.config import settings
+
+_HOST = b"host"
+_ORIGIN = b"origin"
+_PREFLIGHT_METHOD = b"access-control-request-method"
+_PREFLIGHT_HEADERS = b"access-control-request-headers"
+
+ALL_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+PREFLIGHT_MAX_AGE = b"600"
+
+
+def _normalize_origin(origin: str) -> str:
+    # AnyHttpUrl renders "https://app.example.com" with a trailing slash;
+    # browsers send the origin without one
+    return str(origin).rstrip("/")
+
+
+def rate_limit_key(request) -> str:
+    """slowapi key function: the client key stored by EdgeMiddleware"""
+    key = request.scope.get("rate_limit_key")
+    if key is None:
+        client = request.scope.get("client")
+        key = client[0] if client else "127.0.0.1"
+    return key
+
+
+class EdgeMiddleware:
+    def __init__(
+        self,
+        app,
+        allowed_hosts: Optional[Sequence[str]] = None,
+        allowed_origins: Optional[Iterable[str]] = None,
+        bypass_paths: Sequence[str] = tuple(settings.EDGE_BYPASS_PATHS),
+    ):
+        self.app = app
+        if allowed_hosts is None:
+            allowed_hosts = ["*"] if settings.DEBUG else settings.ALLOWED_HOSTS
+        if allowed_origins is None:
+            allowed_origins = settings.BACKEND_CORS_ORIGINS
+
+        self.any_host = "*" in allowed_hosts
+        self.hosts = frozenset(h.lower() for h in allowed_hosts if not h.startswith("*"))
+        # "*.example.com" matches any subdomain of example.com
+        self.host_suffixes = tuple(h[1:].lower() for h in allowed_hosts if h.startswith("*."))
+        origins = {_normalize_origin(o) for o in allowed_origins}
+        self.any_origin = "*" in origins
+        self.origins = frozenset(o.encode("latin-1") for o in origins)
+        self.bypass_paths = tuple(bypass_paths)
+
+    def _host_allowed(self, host: Optional[bytes]) -> bool:
+        if self.any_host:
+            return True
+        if host is None:
+            return False
+        name = host.decode("latin-1").lower()
+        if name.startswith("["):  # IPv6 literal
+            name = name.split("]", 1)[0] + "]"
+        else:
+            name = name.split(":", 1)[0]
+        return name in self.hosts or (bool(self.host_suffixes) and name.endswith(self.host_suffixes))
+
+    def _origin_allowed(self, origin: bytes) -> bool:
+        return self.any_origin or origin in self.origins
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.bypass_paths):
+            await self.app(scope, receive, send)
+            return
+
+        host = origin = preflight_method = preflight_headers = None
+        for name, value in scope["headers"]:
+            if name == _HOST:
+                host = value
+            elif name == _ORIGIN:
+                origin = value
+            elif name == _PREFLIGHT_METHOD:
+                preflight_method = value
+            elif name == _PREFLIGHT_HEADERS:
+                preflight_headers = value
+
+        if not self._host_allowed(host):
+            await _plain_response(send, 400, b"Invalid host header")
+            return
+
+        client = scope.get("client")
+        scope["rate_limit_key"] = client[0] if client else "127.0.0.1"
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed = self._origin_allowed(origin)
+        if scope["method"] == "OPTIONS" and preflight_method is not None:
+            headers = [
+                (b"vary", b"Origin"),
+                (b"access-control-allow-methods", ALL_METHODS),
+                (b"access-control-max-age", PREFLIGHT_MAX_AGE),
+                (b"access-control-allow-credentials", b"true"),
+            ]
+            if preflight_headers is not None:
+                headers.append((b"access-control-allow-headers", preflight_headers))
+            if allowed:
+                headers.append((b"access-control-allow-origin", origin))
+                await _plain_response(send, 200, b"OK", headers)
+            else:
+                await _plain_response(send, 400, b"Disallowed CORS origin", headers)
+            return
+
+        if not allowed:
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *cors_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+async def _plain_response(send, status: int, body: bytes, headers: Optional[list] = None) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            *(headers or ()),
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,101 @@
+"""Password hashing policy: scheme, cost factor and start-up calibration."""
+import math
+import time
+from typing import Optional
+
+from passlib.context import CryptContext
+from passlib.hash import argon2, bcrypt
+
+from app.core.config import settings
+
+SCHEME_BCRYPT = "bcrypt"
+SCHEME_ARGON2 = "argon2"
+
+# Never calibrate below these, however slow the hardware
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MIN_TIME_COST = 2
+ARGON2_MAX_TIME_COST = 12
+
+_CALIBRATION_PASSWORD = "calibration-Passw0rd"
+
+
+def _elapsed_ms(handler) -> float:
+    start = time.perf_counter()
+    handler.hash(_CALIBRATION_PASSWORD)
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """Largest bcrypt rounds whose hash time stays within ``target_ms``
+
+    Each extra round doubles the cost, so one measurement is enough.
+    """
+    sample = _elapsed_ms(bcrypt.using(rounds=BCRYPT_MIN_ROUNDS))
+    extra = math.floor(math.log2(target_ms / sample)) if sample > 0 else 0
+    return max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, BCRYPT_MIN_ROUNDS + extra))
+
+
+def calibrate_argon2_time_cost(target_ms: float, memory_cost: int, parallelism: int) -> int:
+    """Largest argon2 time cost within ``target_ms``; cost grows linearly"""
+    sample = _elapsed_ms(argon2.using(
+        type="ID", time_cost=1, memory_cost=memory_cost, parallelism=parallelism
+    ))
+    steps = math.floor(target_ms / sample) if sample > 0 else 0
+    return max(ARGON2_MIN_TIME_COST, min(ARGON2_MAX_TIME_COST, steps))
+
+
+def hash_cost(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    auto_calibrate: bool = settings.PASSWORD_HASH_AUTO_CALIBRATE,
+) -> int:
+    """Cost factor for the scheme: bcrypt rounds or argon2 time cost"""
+    if scheme == SCHEME_ARGON2:
+        if auto_calibrate:
+            return calibrate_argon2_time_cost(
+                settings.PASSWORD_HASH_TARGET_MS,
+                settings.ARGON2_MEMORY_COST,
+                settings.ARGON2_PARALLELISM,
+            )
+        return settings.ARGON2_TIME_COST
+    if auto_calibrate:
+        return calibrate_bcrypt_rounds(settings.PASSWORD_HASH_TARGET_MS)
+    return settings.BCRYPT_ROUNDS
+
+
+def build_password_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    cost: Optional[int] = None,
+    auto_calibrate: bool = settings.PASSWORD_HASH_AUTO_CALIBRATE,
+) -> CryptContext:
+    """Build the CryptContext used for hashing and verifying passwords
+
+    The configured scheme hashes new passwords; the other one is kept for
+    verification only and marked deprecated, so ``needs_update`` flags its
+    hashes for rehashing on the next successful login. Hashes below the
+    configured cost are flagged too. With a fixed cost, hashes above it
+    are flagged as well so stored hashes converge both ways. Calibrated
+    costs only set a floor, because pods on different hardware may
+    calibrate differently and must not keep rehashing each other's output.
+    """
+    if scheme not in (SCHEME_BCRYPT, SCHEME_ARGON2):
+        raise ValueError(f"Unsupported password hash scheme: {scheme}")
+    if cost is None:
+        cost = hash_cost(scheme, auto_calibrate)
+    schemes = [scheme] + [s for s in (SCHEME_BCRYPT, SCHEME_ARGON2) if s != scheme]
+
+    bcrypt_rounds = cost if scheme == SCHEME_BCRYPT else settings.BCRYPT_ROUNDS
+    argon2_time_cost = cost if scheme == SCHEME_ARGON2 else settings.ARGON2_TIME_COST
+    options = {
+        "bcrypt__default_rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "argon2__type": "ID",
+        "argon2__time_cost": argon2_time_cost,
+        "argon2__min_rounds": argon2_time_cost,
+        "argon2__memory_cost": settings.ARGON2_MEMORY_COST,
+        "argon2__parallelism": settings.ARGON2_PARALLELISM,
+    }
+    if not auto_calibrate:
+        options["bcrypt__max_rounds"] = bcrypt_rounds
+        options["argon2__max_rounds"] = argon2_time_cost
+    return CryptContext(schemes=schemes, default=scheme, deprecated="auto", **options)
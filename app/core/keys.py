@@ -0,0 +1,229 @@
+"""Signing keyring for asymmetric JWTs (RS256/ES256) and the published JWKS.
+
+Keys are listed in a JSON manifest next to their private key PEM files:
+
+    {"keys": [
+        {"kid": "20261019-1a2b", "alg": "RS256", "file": "20261019-1a2b.pem",
+         "activate_at": "2026-10-19T12:00:00+00:00"}
+    ]}
+
+The signing key is the most recent one whose ``activate_at`` has passed.
+Keys activating in the future are already published, so consumers have
+them cached before the first token signed with them shows up. A key
+superseded by a newer one stays published and accepted for ``overlap``
+seconds after its successor activates, long enough for every token it
+signed to expire. ``scripts/jwt_keys.py`` rotates and prunes the manifest.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+
+from app.core.config import settings
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+_EC_CURVES = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    alg: str
+    activate_at: float
+    # Parsed once: python-jose would otherwise re-parse the PEM per token
+    signer: Any
+    verifier: Any
+    public_jwk: Dict[str, Any]
+
+
+def load_key(entry: Dict[str, Any], base_dir: str) -> SigningKey:
+    with open(os.path.join(base_dir, entry["file"])) as f:
+        private_pem = f.read()
+    signer = jwk.construct(private_pem, entry["alg"])
+    public_key = signer.public_key()
+    public_jwk = {
+        **public_key.to_dict(),
+        "kid": entry["kid"],
+        "alg": entry["alg"],
+        "use": "sig",
+    }
+    return SigningKey(
+        kid=entry["kid"],
+        alg=entry["alg"],
+        activate_at=datetime.fromisoformat(entry["activate_at"]).timestamp(),
+        signer=signer,
+        verifier=public_key,
+        public_jwk=public_jwk,
+    )
+
+
+def generate_private_key_pem(alg: str) -> bytes:
+    if alg in _EC_CURVES:
+        private_key = ec.generate_private_key(_EC_CURVES[alg]())
+    elif alg.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=3072)
+    else:
+        raise ValueError(f"Unsupported signing algorithm: {alg}")
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def _read_manifest(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"keys": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    # Replace atomically so running workers never read a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def add_key(path: str, alg: str, activate_at: datetime) -> str:
+    """Generate a key that starts signing at ``activate_at``; returns its kid"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(base_dir, exist_ok=True)
+    kid = f"{activate_at:%Y%m%d%H%M}-{secrets.token_hex(4)}"
+    file_name = f"{kid}.pem"
+    pem = generate_private_key_pem(alg)
+    # Written aside and renamed, so a failure never leaves a partial key
+    # file for the keyring to load
+    tmp_path = os.path.join(base_dir, f".{file_name}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        os.replace(tmp_path, os.path.join(base_dir, file_name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    manifest = _read_manifest(path)
+    manifest["keys"].append({
+        "kid": kid,
+        "alg": alg,
+        "file": file_name,
+        "activate_at": activate_at.astimezone(timezone.utc).isoformat(),
+    })
+    _write_manifest(path, manifest)
+    return kid
+
+
+def prune_keys(path: str, overlap_seconds: int, now: Optional[datetime] = None) -> List[str]:
+    """Remove keys whose overlap window has ended; returns their kids"""
+    now = now or datetime.now(timezone.utc)
+    manifest = _read_manifest(path)
+    entries = sorted(manifest["keys"], key=lambda e: datetime.fromisoformat(e["activate_at"]))
+    keep, removed = [], []
+    for entry, successor in zip(entries, entries[1:] + [None]):
+        retired_at = (
+            datetime.fromisoformat(successor["activate_at"]) + timedelta(seconds=overlap_seconds)
+            if successor else None
+        )
+        if retired_at is not None and retired_at <= now:
+            removed.append(entry)
+        else:
+            keep.append(entry)
+    if removed:
+        _write_manifest(path, {**manifest, "keys": keep})
+        base_dir = os.path.dirname(os.path.abspath(path))
+        for entry in removed:
+            try:
+                os.remove(os.path.join(base_dir, entry["file"]))
+            except FileNotFoundError:
+                pass
+    return [entry["kid"] for entry in removed]
+
+
+class KeyRing:
+    """Keys from the manifest, reloaded when the file changes"""
+
+    def __init__(
+        self,
+        path: str = settings.JWT_KEYRING_PATH,
+        overlap_seconds: int = settings.JWT_KEY_OVERLAP_SECONDS,
+        reload_interval: float = 10.0,
+    ):
+        self.path = path
+        self.overlap_seconds = overlap_seconds
+        self.reload_interval = reload_interval
+        self._keys: List[SigningKey] = []
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._jwks_cache: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            with open(self.path) as f:
+                manifest = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(self.path))
+            self._keys = sorted(
+                (load_key(entry, base_dir) for entry in manifest.get("keys", [])),
+                key=lambda k: k.activate_at,
+            )
+            self._mtime = mtime
+            self._jwks_cache = None
+
+    def keys(self) -> List[SigningKey]:
+        self._maybe_reload()
+        return self._keys
+
+    def signing_key(self, now: Optional[float] = None) -> SigningKey:
+        now = time.time() if now is None else now
+        active = [k for k in self.keys() if k.activate_at <= now]
+        if not active:
+            raise RuntimeError(f"No active signing key in {self.path}")
+        return active[-1]
+
+    def published_keys(self, now: Optional[float] = None) -> List[SigningKey]:
+        """Pending, current and still-overlapping keys; all others are retired"""
+        now = time.time() if now is None else now
+        keys = self.keys()
+        published = []
+        for i, key in enumerate(keys):
+            successor = keys[i + 1] if i + 1 < len(keys) else None
+            if successor is None or successor.activate_at + self.overlap_seconds > now:
+                published.append(key)
+        return published
+
+    def verification_key(self, kid: str) -> Optional[SigningKey]:
+        for key in self.published_keys():
+            if key.kid == kid:
+                return key
+        return None
+
+    def jwks(self) -> bytes:
+        """Serialized JWK Set, rebuilt only when the published keys change"""
+        keys = self.published_keys()
+        kids = tuple(k.kid for k in keys)
+        cached = self._jwks_cache
+        if cached is None or cached[0] != kids:
+            body = json.dumps({"keys": [k.public_jwk for k in keys]}).encode()
+            cached = self._jwks_cache = (kids, body)
+        return cached[1]
+
+
+keyring = KeyRing()
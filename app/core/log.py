@@ -0,0 +1,204 @@
+"""Structured logging: JSON records, request IDs and error rate limiting.
+
+Records are handed to a queue on the calling thread and formatted and
+written by a background listener, so a slow or blocked stdout never
+stalls request handling. Each record carries the ID of the request that
+produced it. Repeated identical errors from one logger (e.g. every
+request failing to reach Vault during an outage) are capped per window;
+the first record let through afterwards reports how many were dropped.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+from app.core.config import settings
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most ``limit`` records per (logger, message) through per window
+
+    Only applies to records at ``level`` and above; the message template
+    (not the formatted text) is the key, so "Error storing token in Vault:
+    %s" is throttled as one stream whatever the exception says.
+    """
+
+    def __init__(self, limit: int, window: float, level: int = logging.WARNING):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.level = level
+        # key -> (window start, records let through, records dropped)
+        self._streams: Dict[Tuple[str, str], Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno < self.level:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            start, passed, dropped = self._streams.get(key, (now, 0, 0))
+            if now - start >= self.window:
+                start, passed = now, 0
+            if passed >= self.limit:
+                self._streams[key] = (start, passed, dropped + 1)
+                return False
+            self._streams[key] = (start, passed + 1, 0)
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    converter = time.gmtime
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback on the calling thread (the
+        # arguments may change after we return) but leave the formatting
+        # to the listener. This is the only handler, so the record is
+        # updated in place rather than copied.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = settings.LOG_LEVEL, fmt: str = settings.LOG_FORMAT) -> None:
+    """Route all logging through a queue to a JSON (or text) stdout handler
+
+    Safe to call again, e.g. in a freshly forked worker whose listener
+    thread did not survive the fork.
+    """
+    global _listener
+    if _listener is None:
+        atexit.register(shutdown_logging)
+    else:
+        try:
+            _listener.stop()
+        except Exception:
+            # A listener inherited through fork has no thread to join
+            pass
+
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        ))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    # Drop rate-limited records before doing any more work on them
+    handler.addFilter(RateLimitFilter(
+        settings.LOG_ERROR_RATE_LIMIT, settings.LOG_ERROR_RATE_WINDOW_SECONDS
+    ))
+    handler.addFilter(RequestIdFilter())
+
+    # Skip per-record lookups of the thread and process, which neither
+    # format outputs
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if isinstance(h, _QueueHandler)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records; call before the process exits"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """Bind an X-Request-ID (the caller's or a new one) to the request
+
+    Pure ASGI: sets the context variable read by every log record and
+    echoes the ID on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        header = (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
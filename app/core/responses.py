@@ -0,0 +1,48 @@
+from functools import lru_cache
+from typing import Any, Tuple, Type
+
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+# App-wide default response class: orjson instead of the stdlib json module
+DefaultResponse = ORJSONResponse
+
+
+@lru_cache(maxsize=None)
+def _field_names(schema: Type[BaseModel]) -> Tuple[str, ...]:
+    return tuple(schema.model_fields)
+
+
+def build(schema: Type[BaseModel], data: Any) -> BaseModel:
+    """Build ``schema`` from a dict or attribute object without validation
+
+    Only for data the service produced itself (ORM rows, token payloads):
+    re-validating our own output, e.g. running email validation on every
+    /users/me, is most of the cost of FastAPI's response_model handling.
+    """
+    if isinstance(data, schema):
+        return data
+    if isinstance(data, dict):
+        values = {name: data[name] for name in _field_names(schema) if name in data}
+    else:
+        values = {
+            name: getattr(data, name) for name in _field_names(schema) if hasattr(data, name)
+        }
+    return schema.model_construct(**values)
+
+
+def render(schema: Type[BaseModel], data: Any, status_code: int = 200) -> Response:
+    """Serialize trusted ``data`` as ``schema`` straight to JSON bytes
+
+    Returning a Response skips FastAPI's response_model round trip
+    (validate into a model, jsonable_encoder back to dicts, then encode);
+    the schema's compiled pydantic-core serializer writes the JSON in one
+    pass. Keep ``response_model`` on the route so the OpenAPI schema is
+    unchanged.
+    """
+    model = build(schema, data)
+    return Response(
+        content=model.__pydantic_serializer__.to_json(model),
+        status_code=status_code,
+        media_type="application/json",
+    )
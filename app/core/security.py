@@ -1,73 +1,157 @@
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Dict, List, Union, Optional, Tuple
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 import secrets
 
 from app.core.config import settings
+from app.core.edge import rate_limit_key
+from app.core.hashing import build_password_context
+from app.core.keys import ASYMMETRIC_ALGORITHMS, keyring
+from app.core.tracing import traced
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = build_password_context()
 
 # Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=rate_limit_key)
+
+
+ROLE_SUPERUSER = "superuser"
+
+# Tokens only this service reads (password reset) are always HMAC-signed
+HMAC_ALGORITHM = "HS256"
+
+
+def encode_jwt(claims: Dict[str, Any]) -> str:
+    """Sign with the keyring's current key, or SECRET_KEY for HS256"""
+    if settings.ALGORITHM in ASYMMETRIC_ALGORITHMS:
+        key = keyring.signing_key()
+        return jwt.encode(claims, key.signer, algorithm=key.alg, headers={"kid": key.kid})
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def decode_jwt(token: str) -> dict:
+    """Verify and decode a token; raises JWTError when it is not valid"""
+    if settings.ALGORITHM not in ASYMMETRIC_ALGORITHMS:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    
+    header = jwt.get_unverified_header(token)
+    kid = header.get("kid")
+    if kid is None and settings.JWT_ACCEPT_HS256:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[HMAC_ALGORITHM])
+    key = keyring.verification_key(kid) if kid else None
+    if key is None:
+        raise JWTError("Unknown or retired signing key")
+    return jwt.decode(token, key.verifier, algorithms=[key.alg])
+
+
+def access_token_lifetime() -> timedelta:
+    if settings.STATELESS_ACCESS_TOKENS:
+        return timedelta(minutes=settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES)
+    return timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def user_claims(user: Any, roles: Optional[List[str]] = None) -> Dict[str, Any]:
+    # Everything a stateless check needs to authorize without loading the user
+    roles = list(roles or ())
+    if user.is_superuser and ROLE_SUPERUSER not in roles:
+        roles.insert(0, ROLE_SUPERUSER)
+    return {
+        "username": user.username,
+        "active": bool(user.is_active),
+        "roles": roles,
+        "realm": user.realm,
+    }
 
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    epoch: int = 0,
+    claims: Optional[Dict[str, Any]] = None,
 ) -> str:
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-        )
+    expire = datetime.utcnow() + (expires_delta or access_token_lifetime())
     
     to_encode = {
+        **(claims or {}),
         "exp": expire,
         "sub": str(subject),
         "type": "access",
-        "jti": secrets.token_urlsafe(16),  # JWT ID for tracking
+        "jti": new_jti(),  # JWT ID for tracking
+        "epoch": epoch,  # user's token epoch at issue time
     }
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return encode_jwt(to_encode)
+
+
+def new_jti() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def refresh_token_lifetime() -> timedelta:
+    return timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
 
 
 def create_refresh_token(
-    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    epoch: int = 0,
+    jti: Optional[str] = None,
+    session_id: Optional[int] = None,
 ) -> str:
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            days=settings.REFRESH_TOKEN_EXPIRE_DAYS
-        )
+    expire = datetime.utcnow() + (expires_delta or refresh_token_lifetime())
     
     to_encode = {
         "exp": expire,
         "sub": str(subject),
         "type": "refresh",
-        "jti": secrets.token_urlsafe(16),  # JWT ID for tracking
+        "jti": jti or new_jti(),  # JWT ID for tracking
+        "epoch": epoch,  # user's token epoch at issue time
     }
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    if session_id is not None:
+        to_encode["sid"] = session_id  # refresh token family
+    return encode_jwt(to_encode)
 
 
+@traced("password.verify")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+@traced("password.verify")
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    # Returns a replacement hash when the stored one uses an outdated scheme or cost
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+@traced("password.hash")
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+_dummy_hash: Optional[str] = None
+
+
+@traced("password.verify", dummy=True)
+def dummy_verify_password(plain_password: str) -> bool:
+    # Spend the same time as a real verify so unknown usernames cannot be
+    # told apart from wrong passwords by response time
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = pwd_context.hash(secrets.token_urlsafe(16))
+    pwd_context.verify(plain_password, _dummy_hash)
+    return False
+
+
+def is_epoch_current(payload: dict, token_epoch: int) -> bool:
+    # Tokens issued before the user's current epoch have been revoked
+    return payload.get("epoch", 0) >= (token_epoch or 0)
+
+
 def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        return payload
+        return decode_jwt(token)
     except JWTError:
         return None
 
@@ -80,7 +164,7 @@ def generate_password_reset_token(email: str) -> str:
     encoded_jwt = jwt.encode(
         {"exp": exp, "sub": email, "type": "reset"},
         settings.SECRET_KEY,
-        algorithm=settings.ALGORITHM,
+        algorithm=HMAC_ALGORITHM,
     )
     return encoded_jwt
 
@@ -88,7 +172,7 @@ def generate_password_reset_token(email: str) -> str:
 def verify_password_reset_token(token: str) -> Optional[str]:
     try:
         decoded_token = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            token, settings.SECRET_KEY, algorithms=[HMAC_ALGORITHM]
         )
         if decoded_token.get("type") != "reset":
             return None
@@ -0,0 +1,90 @@
+"""Collapse concurrent identical calls into one.
+
+When many threads ask for the same thing at once (the same Vault secret
+for a popular token, Keycloak's JWKS after a cache miss, the same user
+row), the first caller runs the call and the others wait for and share
+its result or exception instead of issuing their own:
+
+    vault_reads = SingleFlight("vault.get_token")
+    data = vault_reads.do((user_id, jti), read_secret, user_id, jti)
+
+Nothing is cached: a call arriving after the leader finished runs again.
+Shared results are handed to every waiter as is, so treat them as
+read-only. Per-group counters are reported by ``stats()`` and /metrics.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.core.config import settings
+
+_groups: List["SingleFlight"] = []
+_groups_lock = threading.Lock()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str, enabled: bool = settings.SINGLEFLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        # Calls that reached the upstream / calls that shared another's result
+        self.executed = 0
+        self.coalesced = 0
+        with _groups_lock:
+            _groups.append(self)
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Counters of every group, for /metrics"""
+    with _groups_lock:
+        groups = list(_groups)
+    return {
+        group.name: {
+            "executed": group.executed,
+            "coalesced": group.coalesced,
+            "in_flight": group.in_flight(),
+        }
+        for group in groups
+    }
@@ -0,0 +1,28 @@
+"""Realm (tenant) resolution.
+
+One deployment serves KEYCLOAK_REALM (the default) plus the realms in
+KEYCLOAK_REALMS. A request names its realm in the TENANT_HEADER header,
+set by the gateway per host or route; without the header it belongs to
+the default realm. Users are unique per realm, tokens carry the realm
+they were issued for, and the Keycloak clients, login lockouts and sync
+checkpoints are kept per realm.
+"""
+from typing import Optional
+
+from app.core.config import settings
+
+DEFAULT_REALM = settings.KEYCLOAK_REALM
+REALMS = (DEFAULT_REALM, *(r for r in dict.fromkeys(settings.KEYCLOAK_REALMS) if r != DEFAULT_REALM))
+_REALM_SET = frozenset(REALMS)
+
+
+def resolve_realm(value: Optional[str]) -> Optional[str]:
+    """The realm a request asked for; None if it is not served here"""
+    if not value:
+        return DEFAULT_REALM
+    return value if value in _REALM_SET else None
+
+
+def scoped_key(realm: str, key: str) -> str:
+    """``key`` namespaced by realm (unchanged for the default realm)"""
+    return key if realm == DEFAULT_REALM else f"{realm}:{key}"
@@ -0,0 +1,191 @@
+"""OpenTelemetry tracing for requests and the operations behind them.
+
+Disabled by default. When TRACING_ENABLED is set, every HTTP request gets
+a server span (continuing a W3C ``traceparent`` from the caller) with
+child spans for SQL statements, password hashing, Vault and Keycloak
+calls, and the current-user dependency. Sampling is parent-based with
+TRACING_SAMPLE_RATIO for new traces. Spans go to an OTLP/HTTP collector,
+to a JSON-lines file (handy for tests and local runs) or to the console.
+
+While disabled, ``span()`` and ``traced()`` cost a flag check.
+"""
+import functools
+import json
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Optional, Sequence
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SimpleSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.core.config import settings
+
+_enabled = False
+_tracer: trace.Tracer = trace.get_tracer("app")
+
+# Longer statements are truncated in span attributes
+MAX_STATEMENT_LENGTH = 1000
+
+
+class FileSpanExporter(SpanExporter):
+    """Append finished spans to a file as JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(json.loads(s.to_json())) + "\n" for s in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def build_exporter(kind: str = settings.TRACING_EXPORTER) -> SpanExporter:
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if kind == "file":
+        return FileSpanExporter(settings.TRACING_FILE_PATH)
+    if kind == "console":
+        return ConsoleSpanExporter()
+    raise ValueError(f"Unsupported tracing exporter: {kind}")
+
+
+def setup_tracing(
+    enabled: bool = settings.TRACING_ENABLED,
+    sample_ratio: float = settings.TRACING_SAMPLE_RATIO,
+    exporter: Optional[SpanExporter] = None,
+    batch: bool = True,
+) -> Optional[TracerProvider]:
+    global _enabled, _tracer
+    _enabled = enabled
+    if not enabled:
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": settings.PROJECT_NAME,
+            "service.version": settings.PROJECT_VERSION,
+            "deployment.environment": settings.ENVIRONMENT,
+        }),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    exporter = exporter or build_exporter()
+    # The batch processor exports from a background thread and restarts it
+    # in forked workers
+    processor = BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter)
+    provider.add_span_processor(processor)
+    _tracer = provider.get_tracer("app")
+    return provider
+
+
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes: Any):
+    """Context manager for a child span of the current one"""
+    if not _enabled:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, kind=kind, attributes=attributes or None)
+
+
+def traced(name: str, **attributes: Any) -> Callable:
+    """Decorator running a (sync) function inside a span"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(name, attributes=attributes or None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine) -> None:
+    """Record a client span for every SQL statement run on ``engine``"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if not _enabled:
+            return
+        context._otel_span = _tracer.start_span(
+            statement.split(None, 1)[0].upper() if statement else "SQL",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": engine.dialect.name,
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            },
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        db_span = getattr(context, "_otel_span", None)
+        if db_span is not None:
+            db_span.end()
+            context._otel_span = None
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        db_span = getattr(context, "_otel_span", None) if context else None
+        if db_span is not None:
+            db_span.record_exception(exception_context.original_exception)
+            db_span.set_status(Status(StatusCode.ERROR))
+            db_span.end()
+            context._otel_span = None
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not _enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        parent = propagate.extract(carrier)
+        method = scope["method"]
+        status_code = None
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with _tracer.start_as_current_span(
+            f"{method} {scope['path']}",
+            context=parent,
+            kind=SpanKind.SERVER,
+            attributes={"http.method": method, "http.target": scope["path"]},
+        ) as server_span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Name the span after the route template, not the raw path
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    server_span.update_name(f"{method} {route.path}")
+                    server_span.set_attribute("http.route", route.path)
+                if status_code is not None:
+                    server_span.set_attribute("http.status_code", status_code)
+                    if status_code >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
@@ -0,0 +1,82 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+
+@dataclass(frozen=True)
+class AuditLogFilters:
+    user_id: Optional[int] = None
+    action: Optional[str] = None
+    status: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, log_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _filtered(stmt: Select, filters: AuditLogFilters) -> Select:
+    if filters.user_id is not None:
+        stmt = stmt.where(models.AuditLog.user_id == filters.user_id)
+    if filters.action is not None:
+        stmt = stmt.where(models.AuditLog.action == filters.action)
+    if filters.status is not None:
+        stmt = stmt.where(models.AuditLog.status == filters.status)
+    if filters.since is not None:
+        stmt = stmt.where(models.AuditLog.created_at >= filters.since)
+    if filters.until is not None:
+        stmt = stmt.where(models.AuditLog.created_at < filters.until)
+    return stmt.order_by(models.AuditLog.created_at.desc(), models.AuditLog.id.desc())
+
+
+def get_audit_logs(
+    db: Session,
+    filters: AuditLogFilters,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[List[models.AuditLog], Optional[str]]:
+    """Return one page of audit logs, newest first, and the cursor for the next page"""
+    stmt = _filtered(select(models.AuditLog), filters)
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(models.AuditLog.created_at, models.AuditLog.id) < (created_at, log_id)
+        )
+
+    # Fetch one extra row to know whether another page exists
+    rows = list(db.scalars(stmt.limit(limit + 1)))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def iter_audit_logs(
+    db: Session, filters: AuditLogFilters, batch_size: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """Stream matching audit logs as plain dicts through a server-side cursor"""
+    # Plain column rows instead of ORM entities keep memory flat
+    stmt = _filtered(select(*models.AuditLog.__table__.columns), filters).execution_options(
+        yield_per=batch_size
+    )
+    for row in db.execute(stmt):
+        yield row._asdict()
@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Row, and_, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+_RECORD_COLUMNS = (
+    models.IdempotencyKey.fingerprint,
+    models.IdempotencyKey.status_code,
+    models.IdempotencyKey.content_type,
+    models.IdempotencyKey.body,
+)
+
+
+def claim(
+    db: Session,
+    key: str,
+    fingerprint: str,
+    now: datetime,
+    locked_until: datetime,
+    expires_at: datetime,
+) -> bool:
+    """Claim ``key`` for a request about to run; False if a live record holds it"""
+    db.add(models.IdempotencyKey(
+        key=key, fingerprint=fingerprint, locked_until=locked_until, expires_at=expires_at,
+    ))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+
+    # Take over an expired response or a claim whose request never finished
+    result = db.execute(
+        update(models.IdempotencyKey)
+        .where(
+            models.IdempotencyKey.key == key,
+            or_(
+                models.IdempotencyKey.expires_at <= now,
+                and_(
+                    models.IdempotencyKey.status_code.is_(None),
+                    models.IdempotencyKey.locked_until <= now,
+                ),
+            ),
+        )
+        .values(
+            fingerprint=fingerprint, status_code=None, content_type=None, body=None,
+            locked_until=locked_until, expires_at=expires_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def get_record(db: Session, key: str, now: datetime) -> Optional[Row]:
+    """(fingerprint, status_code, content_type, body) of an unexpired record"""
+    return db.execute(
+        select(*_RECORD_COLUMNS).where(
+            models.IdempotencyKey.key == key, models.IdempotencyKey.expires_at > now
+        )
+    ).first()
+
+
+def save_response(
+    db: Session,
+    key: str,
+    fingerprint: str,
+    status_code: int,
+    content_type: Optional[str],
+    body: bytes,
+    expires_at: datetime,
+) -> None:
+    db.execute(
+        update(models.IdempotencyKey)
+        .where(
+            models.IdempotencyKey.key == key,
+            models.IdempotencyKey.fingerprint == fingerprint,
+        )
+        .values(status_code=status_code, content_type=content_type, body=body, expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def release_claim(db: Session, key: str, fingerprint: str) -> None:
+    """Drop an unfinished claim so a retry runs the request again"""
+    db.execute(
+        delete(models.IdempotencyKey).where(
+            models.IdempotencyKey.key == key,
+            models.IdempotencyKey.fingerprint == fingerprint,
+            models.IdempotencyKey.status_code.is_(None),
+        )
+    )
+    db.commit()
+
+
+def prune_expired(db: Session, now: datetime) -> int:
+    result = db.execute(
+        delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= now)
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Row, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+KIND_TOKEN = "token"
+KIND_USER = "user"
+
+_EVENT_COLUMNS = (
+    models.RevocationEvent.id,
+    models.RevocationEvent.kind,
+    models.RevocationEvent.user_id,
+    models.RevocationEvent.jti,
+    models.RevocationEvent.token_type,
+    models.RevocationEvent.expires_at,
+    models.RevocationEvent.token_epoch,
+    models.RevocationEvent.is_active,
+)
+
+
+def blacklist_token(
+    db: Session,
+    jti: str,
+    token_type: str,
+    user_id: int,
+    expires_at: datetime,
+    reason: Optional[str] = None,
+) -> None:
+    """Blacklist a token and publish the revocation (committed by the caller)"""
+    db.add(models.TokenBlacklist(
+        jti=jti,
+        token_type=token_type,
+        user_id=user_id,
+        expires_at=expires_at,
+        reason=reason,
+    ))
+    db.add(models.RevocationEvent(
+        kind=KIND_TOKEN,
+        user_id=user_id,
+        jti=jti,
+        token_type=token_type,
+        expires_at=expires_at,
+    ))
+
+
+def record_user_state(db: Session, user_id: int, token_epoch: int, is_active: bool) -> None:
+    """Publish a user's token epoch / active flag change (committed by the caller)"""
+    db.add(models.RevocationEvent(
+        kind=KIND_USER,
+        user_id=user_id,
+        token_epoch=token_epoch or 0,
+        is_active=bool(is_active),
+    ))
+
+
+def get_events(
+    db: Session, after_id: int, limit: int, up_to: Optional[int] = None
+) -> List[Row]:
+    """Events with ``after_id < id <= up_to``, oldest first"""
+    query = select(*_EVENT_COLUMNS).where(models.RevocationEvent.id > after_id)
+    if up_to is not None:
+        query = query.where(models.RevocationEvent.id <= up_to)
+    return list(db.execute(query.order_by(models.RevocationEvent.id).limit(limit)))
+
+
+def last_event_id(db: Session) -> int:
+    return db.scalar(select(func.max(models.RevocationEvent.id))) or 0
+
+
+def first_event_id(db: Session) -> Optional[int]:
+    return db.scalar(select(func.min(models.RevocationEvent.id)))
+
+
+def get_unexpired_blacklist(db: Session, now: datetime) -> List[Row]:
+    """(jti, token_type, user_id, expires_at) of revoked tokens still in their lifetime"""
+    return list(db.execute(
+        select(
+            models.TokenBlacklist.jti,
+            models.TokenBlacklist.token_type,
+            models.TokenBlacklist.user_id,
+            models.TokenBlacklist.expires_at,
+        )
+        .where(models.TokenBlacklist.expires_at > now)
+        .order_by(models.TokenBlacklist.id)
+    ))
+
+
+def prune_events(db: Session, before: datetime) -> int:
+    result = db.execute(
+        delete(models.RevocationEvent).where(models.RevocationEvent.created_at < before)
+    )
+    db.commit()
+    return result.rowcount
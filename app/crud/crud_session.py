@@ -0,0 +1,133 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def create_session(
+    db: Session,
+    user_id: int,
+    refresh_jti: str,
+    expires_at: datetime,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+) -> models.UserSession:
+    db_session = models.UserSession(
+        user_id=user_id,
+        refresh_jti=refresh_jti,
+        expires_at=expires_at,
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
+    db.add(db_session)
+    return db_session
+
+
+def rotate_session(
+    db: Session,
+    old_jti: str,
+    new_jti: str,
+    expires_at: datetime,
+    session_id: Optional[int] = None,
+) -> Optional[int]:
+    """Compare-and-swap the refresh token of a session (token family)
+
+    A single UPDATE moves the session from ``old_jti`` to ``new_jti`` only
+    if ``old_jti`` is still its current, unrevoked and unexpired token.
+    Returns the session id, or None when the swap did not happen: the
+    token was already rotated (reuse), revoked or expired.
+    """
+    query = update(models.UserSession).where(
+        models.UserSession.refresh_jti == old_jti,
+        models.UserSession.revoked_at.is_(None),
+        models.UserSession.expires_at > _utcnow(),
+    )
+    if session_id is not None:
+        query = query.where(models.UserSession.id == session_id)
+    return db.execute(
+        query
+        .values(refresh_jti=new_jti, expires_at=expires_at, last_used_at=_utcnow())
+        .returning(models.UserSession.id)
+    ).scalar()
+
+
+def revoke_family_on_reuse(db: Session, session_id: int, presented_jti: str) -> bool:
+    """Revoke a session whose superseded refresh token was presented again
+
+    Either the legitimate client or an attacker holds a stolen copy, and
+    there is no telling which, so the whole family is logged out. Returns
+    True if the session was revoked because of reuse.
+    """
+    result = db.execute(
+        update(models.UserSession)
+        .where(
+            models.UserSession.id == session_id,
+            models.UserSession.refresh_jti != presented_jti,
+            models.UserSession.revoked_at.is_(None),
+        )
+        .values(revoked_at=_utcnow())
+    )
+    return result.rowcount > 0
+
+
+def is_refresh_token_current(db: Session, jti: str) -> bool:
+    return db.execute(
+        select(models.UserSession.id).where(
+            models.UserSession.refresh_jti == jti,
+            models.UserSession.revoked_at.is_(None),
+            models.UserSession.expires_at > _utcnow(),
+        )
+    ).first() is not None
+
+
+def revoke_session_by_refresh_jti(db: Session, jti: str) -> Optional[int]:
+    return db.execute(
+        update(models.UserSession)
+        .where(
+            models.UserSession.refresh_jti == jti,
+            models.UserSession.revoked_at.is_(None),
+        )
+        .values(revoked_at=_utcnow())
+        .returning(models.UserSession.id)
+    ).scalar()
+
+
+def get_active_sessions(db: Session, user_id: int) -> List[models.UserSession]:
+    return list(db.scalars(
+        select(models.UserSession)
+        .where(
+            models.UserSession.user_id == user_id,
+            models.UserSession.expires_at > _utcnow(),
+            models.UserSession.revoked_at.is_(None),
+        )
+        .order_by(models.UserSession.last_used_at.desc())
+    ))
+
+
+def revoke_session(
+    db: Session, user_id: int, session_id: int
+) -> Optional[models.UserSession]:
+    db_session = db.get(models.UserSession, session_id)
+    if db_session is None or db_session.user_id != user_id or db_session.revoked_at:
+        return None
+    db_session.revoked_at = _utcnow()
+    return db_session
+
+
+def revoke_all_sessions(db: Session, user_id: int) -> int:
+    result = db.execute(
+        update(models.UserSession)
+        .where(
+            models.UserSession.user_id == user_id,
+            models.UserSession.revoked_at.is_(None),
+        )
+        .values(revoked_at=_utcnow())
+    )
+    return result.rowcount
@@ -0,0 +1,21 @@
+import json
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+
+def get_checkpoint(db: Session, name: str) -> Optional[Dict[str, Any]]:
+    checkpoint = db.get(models.SyncCheckpoint, name)
+    return json.loads(checkpoint.position) if checkpoint is not None else None
+
+
+def save_checkpoint(db: Session, name: str, position: Dict[str, Any]) -> None:
+    db.merge(models.SyncCheckpoint(name=name, position=json.dumps(position)))
+    db.commit()
+
+
+def delete_checkpoint(db: Session, name: str) -> None:
+    db.query(models.SyncCheckpoint).filter(models.SyncCheckpoint.name == name).delete()
+    db.commit()
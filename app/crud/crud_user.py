@@ -1,8 +1,13 @@
-from typing import Optional
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+from sqlalchemy import Row, and_, bindparam, insert, or_, select, update
 from sqlalchemy.orm import Session
 
-from app.core.security import get_password_hash, verify_password
+from app.core.security import dummy_verify_password, get_password_hash, verify_and_update_password
+from app.core.singleflight import SingleFlight
+from app.core.tenancy import DEFAULT_REALM
+from app.crud import crud_revocation, crud_session
 from app.db import models
 from app import schemas
 
@@ -11,34 +16,261 @@ def get_user(db: Session, user_id: int) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.email == email).first()
+# Read-only hot paths (token checks, /users/me) use these prebuilt Core
+# statements: they return immutable Row tuples with only the columns needed,
+# skipping ORM instrumentation and the session identity map.
+USER_ROW_COLUMNS = (
+    models.User.id,
+    models.User.email,
+    models.User.username,
+    models.User.full_name,
+    models.User.is_active,
+    models.User.is_superuser,
+    models.User.created_at,
+    models.User.updated_at,
+    models.User.keycloak_id,
+    models.User.token_epoch,
+    models.User.realm,
+)
+_USER_ROW_BY_ID = select(*USER_ROW_COLUMNS).where(models.User.id == bindparam("user_id"))
+_BLACKLISTED_JTI = (
+    select(models.TokenBlacklist.id)
+    .where(models.TokenBlacklist.jti == bindparam("jti"))
+    .limit(1)
+)
 
 
-def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.username == username).first()
+def get_user_row(db: Session, user_id: int) -> Optional[Row]:
+    return db.execute(_USER_ROW_BY_ID, {"user_id": user_id}).first()
 
 
-def create_user(db: Session, user: schemas.UserCreate, keycloak_id: Optional[str] = None) -> models.User:
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name,
-        hashed_password=hashed_password,
-        is_active=user.is_active,
-        keycloak_id=keycloak_id
+_user_row_reads = SingleFlight("db.get_user_row")
+
+
+def get_user_row_shared(db: Session, user_id: int) -> Optional[Row]:
+    """get_user_row, sharing one query between concurrent lookups of a user
+
+    The row may come from another request's session, so only for callers
+    with no pending changes to the user (token verification). Only
+    lookups on the same engine are shared: a user pinned to the primary
+    after a write must not get a row read from a lagging replica.
+    """
+    return _user_row_reads.do((user_id, db.get_bind()), get_user_row, db, user_id)
+
+
+def is_token_blacklisted(db: Session, jti: Optional[str]) -> bool:
+    return db.execute(_BLACKLISTED_JTI, {"jti": jti}).first() is not None
+
+
+def get_blacklisted_jtis(
+    db: Session, after_id: int = 0, expires_after: Optional[datetime] = None
+) -> List[Row]:
+    """(id, jti) of blacklist entries newer than ``after_id``, oldest first"""
+    query = select(models.TokenBlacklist.id, models.TokenBlacklist.jti).where(
+        models.TokenBlacklist.id > after_id
     )
+    if expires_after is not None:
+        query = query.where(models.TokenBlacklist.expires_at > expires_after)
+    return list(db.execute(query.order_by(models.TokenBlacklist.id)))
+
+
+def get_revoked_user_states(db: Session) -> List[Row]:
+    """(id, token_epoch, is_active) of users whose older tokens are no longer valid"""
+    return list(db.execute(
+        select(models.User.id, models.User.token_epoch, models.User.is_active).where(
+            or_(models.User.token_epoch > 0, models.User.is_active.is_(False))
+        )
+    ))
+
+
+def get_user_by_email(db: Session, email: str, realm: str = DEFAULT_REALM) -> Optional[models.User]:
+    return db.query(models.User).filter(
+        models.User.realm == realm, models.User.email == email
+    ).first()
+
+
+def get_user_by_username(
+    db: Session, username: str, realm: str = DEFAULT_REALM
+) -> Optional[models.User]:
+    return db.query(models.User).filter(
+        models.User.realm == realm, models.User.username == username
+    ).first()
+
+
+def _user_values(
+    user: schemas.UserCreate,
+    hashed_password: str,
+    keycloak_id: Optional[str] = None,
+    realm: str = DEFAULT_REALM,
+) -> Dict[str, object]:
+    return {
+        "realm": realm,
+        "email": user.email,
+        "username": user.username,
+        "full_name": user.full_name,
+        "hashed_password": hashed_password,
+        "is_active": user.is_active,
+        "keycloak_id": keycloak_id,
+    }
+
+
+def create_user(
+    db: Session,
+    user: schemas.UserCreate,
+    keycloak_id: Optional[str] = None,
+    realm: str = DEFAULT_REALM,
+) -> models.User:
+    hashed_password = get_password_hash(user.password)
+    db_user = models.User(**_user_values(user, hashed_password, keycloak_id, realm))
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
 
+def create_users_bulk(
+    db: Session,
+    users: Sequence[schemas.UserCreate],
+    hashed_passwords: Sequence[str],
+    keycloak_ids: Optional[Sequence[Optional[str]]] = None,
+    realm: str = DEFAULT_REALM,
+) -> int:
+    """Insert pre-hashed users with a single multi-row INSERT"""
+    if not users:
+        return 0
+    if keycloak_ids is None:
+        keycloak_ids = [None] * len(users)
+    rows = [
+        _user_values(user, hashed, keycloak_id, realm)
+        for user, hashed, keycloak_id in zip(users, hashed_passwords, keycloak_ids)
+    ]
+    db.execute(insert(models.User), rows)
+    db.commit()
+    return len(rows)
+
+
+def get_existing_identities(
+    db: Session, emails: Iterable[str], usernames: Iterable[str], realm: str = DEFAULT_REALM
+) -> Tuple[Set[str], Set[str]]:
+    """Return the subset of emails and usernames already taken in ``realm``"""
+    emails, usernames = list(emails), list(usernames)
+    if not emails and not usernames:
+        return set(), set()
+    rows = db.execute(
+        select(models.User.email, models.User.username).where(
+            models.User.realm == realm,
+            or_(models.User.email.in_(emails), models.User.username.in_(usernames)),
+        )
+    )
+    taken_emails: Set[str] = set()
+    taken_usernames: Set[str] = set()
+    for email, username in rows:
+        taken_emails.add(email)
+        taken_usernames.add(username)
+    return taken_emails, taken_usernames
+
+
+EXPORT_COLUMNS: List[str] = [
+    "id", "email", "username", "full_name", "is_active",
+    "is_superuser", "keycloak_id", "created_at", "updated_at",
+]
+
+
+def iter_users(
+    db: Session, batch_size: int = 1000, realm: Optional[str] = None
+) -> Iterator[Dict[str, object]]:
+    """Stream users (of one realm, or all) as plain dicts using a server-side cursor"""
+    columns = [getattr(models.User, name) for name in EXPORT_COLUMNS]
+    query = select(*columns)
+    if realm is not None:
+        query = query.where(models.User.realm == realm)
+    result = db.execute(
+        query.order_by(models.User.id).execution_options(yield_per=batch_size)
+    )
+    for row in result:
+        yield row._asdict()
+
+
+# Columns the Keycloak sync compares and writes
+SYNC_COLUMNS = (
+    models.User.id,
+    models.User.keycloak_id,
+    models.User.email,
+    models.User.full_name,
+    models.User.is_active,
+    models.User.token_epoch,
+    models.User.updated_at,
+)
+
+
+def get_users_by_keycloak_ids(
+    db: Session, keycloak_ids: Iterable[str], realm: str = DEFAULT_REALM
+) -> List[Row]:
+    keycloak_ids = list(keycloak_ids)
+    if not keycloak_ids:
+        return []
+    return list(db.execute(
+        select(*SYNC_COLUMNS).where(
+            models.User.realm == realm, models.User.keycloak_id.in_(keycloak_ids)
+        )
+    ))
+
+
+def get_users_changed_since(
+    db: Session,
+    after: Optional[Tuple[datetime, int]],
+    until: datetime,
+    limit: int,
+    realm: str = DEFAULT_REALM,
+) -> List[Row]:
+    """Keycloak-linked users of ``realm`` updated after the ``(updated_at, id)``
+    cursor and no later than ``until``, in cursor order"""
+    query = select(*SYNC_COLUMNS).where(
+        models.User.realm == realm,
+        models.User.keycloak_id.isnot(None),
+        models.User.updated_at <= until,
+    )
+    if after is not None:
+        updated_at, user_id = after
+        query = query.where(or_(
+            models.User.updated_at > updated_at,
+            and_(models.User.updated_at == updated_at, models.User.id > user_id),
+        ))
+    return list(db.execute(
+        query.order_by(models.User.updated_at, models.User.id).limit(limit)
+    ))
+
+
+def apply_user_changes(
+    db: Session, changes: Sequence[Dict[str, object]], token_epochs: Dict[int, int]
+) -> int:
+    """Bulk UPDATE by primary key: each change is ``{"id": ..., field: value}``
+
+    Changes of ``is_active`` are published to the revocation feed, using
+    ``token_epochs`` (user id -> current epoch). ``updated_at`` is bumped
+    unless a change sets it.
+    """
+    if not changes:
+        return 0
+    # Executemany groups rows by the set of columns they update
+    db.execute(update(models.User), list(changes))
+    for change in changes:
+        if "is_active" in change:
+            crud_revocation.record_user_state(
+                db, change["id"], token_epochs.get(change["id"], 0), change["is_active"]
+            )
+    db.commit()
+    return len(changes)
+
+
 def update_user(db: Session, db_user: models.User, user_update: schemas.UserUpdate) -> models.User:
     update_data = user_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_user, field, value)
+    if "is_active" in update_data:
+        crud_revocation.record_user_state(
+            db, db_user.id, db_user.token_epoch, db_user.is_active
+        )
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
@@ -54,14 +286,50 @@ def update_password(db: Session, user: models.User, new_password: str) -> models
     return user
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
-    user = get_user_by_username(db, username=username)
+def revoke_all_tokens(db: Session, user: models.User) -> int:
+    """Invalidate every outstanding token of a user with a single epoch bump"""
+    token_epoch = db.execute(
+        update(models.User)
+        .where(models.User.id == user.id)
+        .values(token_epoch=models.User.token_epoch + 1)
+        .returning(models.User.token_epoch)
+    ).scalar_one()
+    crud_session.revoke_all_sessions(db, user.id)
+    crud_revocation.record_user_state(db, user.id, token_epoch, user.is_active)
+    db.commit()
+    db.refresh(user)
+    return user.token_epoch
+
+
+def get_user_by_login(db: Session, login: str, realm: str = DEFAULT_REALM) -> Optional[models.User]:
+    """User a login form refers to, by username or else by email"""
+    user = get_user_by_username(db, username=login, realm=realm)
     if not user:
-        user = get_user_by_email(db, email=username)
+        user = get_user_by_email(db, email=login, realm=realm)
+    return user
+
+
+def authenticate_user(
+    db: Session, username: str, password: str, realm: str = DEFAULT_REALM
+) -> Optional[models.User]:
+    return check_password(db, get_user_by_login(db, username, realm), password)
+
+
+def check_password(
+    db: Session, user: Optional[models.User], password: str
+) -> Optional[models.User]:
+    """``user`` if ``password`` is theirs; hashes even without a user"""
     if not user:
+        dummy_verify_password(password)
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Stored hash predates the current scheme/cost: upgrade it transparently
+        user.hashed_password = new_hash
+        db.add(user)
+        db.commit()
     return user
 
 
@@ -1,17 +1,59 @@
+from typing import Optional
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.db.replicas import ReplicaRouter
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+replica_engines = [
+    create_engine(url, pool_pre_ping=True) for url in settings.DATABASE_REPLICA_URLS
+]
+replica_router = ReplicaRouter(engine, replica_engines)
+
+
+class RoutingSession(Session):
+    """Session whose read-only variant runs on a replica
+
+    A read-only session (``ReadSessionLocal``) picks its engine on first
+    use, from the user set with ``route_for_user`` if any, and keeps it
+    for its lifetime so all reads of a request see one snapshot.
+    """
+
+    def get_bind(self, mapper=None, **kwargs):
+        if self.info.get("read_only"):
+            bind = self.info.get("bind")
+            if bind is None:
+                bind = self.info["bind"] = replica_router.engine_for(self.info.get("user_id"))
+            return bind
+        return super().get_bind(mapper, **kwargs)
+
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine
+)
+# For lookups only: never write through these sessions
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine,
+    info={"read_only": True},
+)
 
 Base = declarative_base()
 
 
+def route_for_user(db: Session, user_id: Optional[int]) -> None:
+    """Let a read-only session honor the user's read-your-writes window
+
+    Must be called before the session's first query; no-op otherwise.
+    """
+    if db.info.get("read_only") and "bind" not in db.info:
+        db.info["user_id"] = user_id
+
+
 def get_db():
     db = SessionLocal()
     try:
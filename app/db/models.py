@@ -1,6 +1,7 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text
+from sqlalchemy import Boolean, Column, Integer, LargeBinary, String, DateTime, Text, Index
 from sqlalchemy.sql import func
 
+from app.core.config import settings
 from app.db.database import Base
 
 
@@ -8,8 +9,10 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    username = Column(String, unique=True, index=True, nullable=False)
+    # Keycloak realm (tenant); email and username are unique per realm
+    realm = Column(String, nullable=False, default=settings.KEYCLOAK_REALM)
+    email = Column(String, nullable=False)
+    username = Column(String, nullable=False)
     full_name = Column(String, nullable=True)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
@@ -20,6 +23,16 @@ class User(Base):
     # Keycloak integration
     keycloak_id = Column(String, unique=True, nullable=True, index=True)
     
+    # Tokens carry the epoch they were issued under; bumping it revokes them all
+    token_epoch = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    __table_args__ = (
+        Index("ix_users_realm_email", "realm", "email", unique=True),
+        Index("ix_users_realm_username", "realm", "username", unique=True),
+        # The Keycloak sync pages through a realm's recently updated users
+        Index("ix_users_realm_updated_at", "realm", "updated_at"),
+    )
+    
 
 class TokenBlacklist(Base):
     __tablename__ = "token_blacklist"
@@ -33,6 +46,63 @@ class TokenBlacklist(Base):
     reason = Column(String, nullable=True)
 
 
+class RevocationEvent(Base):
+    """Ordered feed of revocations; ``id`` is the stream offset"""
+    __tablename__ = "revocation_events"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # token or user
+    user_id = Column(Integer, nullable=False)
+    # kind=token: the revoked token
+    jti = Column(String, nullable=True)
+    token_type = Column(String, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+    # kind=user: tokens with an older epoch, or all tokens if inactive, are revoked
+    token_epoch = Column(Integer, nullable=True)
+    is_active = Column(Boolean, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class SyncCheckpoint(Base):
+    """Where a resumable sync job (e.g. the Keycloak user sync) stopped"""
+    __tablename__ = "sync_checkpoints"
+    
+    name = Column(String, primary_key=True)
+    position = Column(Text, nullable=False)  # JSON
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class IdempotencyKey(Base):
+    """Response of a request sent with an Idempotency-Key, replayed to retries"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(64), primary_key=True)  # sha256 of realm, path and client key
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request
+    status_code = Column(Integer, nullable=True)  # None while the request runs
+    content_type = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    refresh_jti = Column(String, unique=True, index=True, nullable=False)  # current refresh token
+    ip_address = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_user_sessions_user_id_expires_at", "user_id", "expires_at"),
+    )
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     
@@ -44,3 +114,14 @@ class AuditLog(Base):
     status = Column(String, nullable=False)  # success, failure
     details = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # On PostgreSQL the table is range-partitioned by month on created_at
+    # (see app/db/partitions.py) and its primary key is (id, created_at).
+    # Keyset pagination runs on (created_at, id); each filter gets an index
+    # with the same suffix so filtered pages are index range scans.
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created_at_id", "action", "created_at", "id"),
+        Index("ix_audit_logs_status_created_at_id", "status", "created_at", "id"),
+    )
@@ -0,0 +1,187 @@
+"""Monthly range partitions for the audit_logs table (PostgreSQL only).
+
+The partitioned table itself is created by the Alembic migration; these
+helpers create upcoming partitions ahead of time and retire old ones by
+detaching and dropping whole partitions instead of running large DELETEs.
+
+Rows for a month without a partition (maintenance did not run in time)
+land in the default partition. Creating that month later moves them into
+the new partition; until then they are retired with the default
+partition's other rows past the retention window.
+"""
+import logging
+import re
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = "audit_logs"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+
+_PARTITION_RE = re.compile(rf"^{AUDIT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{AUDIT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ),
+        {"table": AUDIT_TABLE},
+    ).scalar())
+
+
+def list_partitions(conn: Connection) -> List[str]:
+    """Return names of the monthly partitions currently attached to audit_logs"""
+    rows = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :table AND pg_table_is_visible(parent.oid) "
+            "ORDER BY child.relname"
+        ),
+        {"table": AUDIT_TABLE},
+    )
+    return [name for (name,) in rows if partition_month(name) is not None]
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF {AUDIT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+_MONTH_RANGE = "created_at >= :start AND created_at < :end"
+
+
+def _month_range(month: date) -> dict:
+    return {"start": month, "end": add_months(month, 1)}
+
+
+def create_partition(conn: Connection, month: date) -> None:
+    """Create the partition for ``month``, moving its rows out of the
+    default partition
+
+    PostgreSQL refuses to create a partition whose range has rows in the
+    default partition, so the default is detached while they are moved.
+    """
+    has_rows = conn.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {_MONTH_RANGE} LIMIT 1"),
+        _month_range(month),
+    ).scalar()
+    if not has_rows:
+        conn.execute(text(create_partition_sql(month)))
+        return
+
+    conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(text(create_partition_sql(month)))
+    moved = conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {_MONTH_RANGE} RETURNING *) "
+            f"INSERT INTO {partition_name(month)} SELECT * FROM moved"
+        ),
+        _month_range(month),
+    ).rowcount
+    conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.warning(
+        "Moved %d audit rows from %s into %s", moved, DEFAULT_PARTITION, partition_name(month)
+    )
+
+
+def ensure_partitions(
+    conn: Connection, months_ahead: int, start: Optional[date] = None, today: Optional[date] = None
+) -> List[str]:
+    """Create monthly partitions from ``start`` through ``months_ahead`` months from today
+
+    A month that cannot be created is logged and skipped, so the others
+    (and the next runs) still go ahead.
+    """
+    current = month_start(today or date.today())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+    created = []
+    existing = set(list_partitions(conn))
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            try:
+                with conn.begin_nested():
+                    create_partition(conn, month)
+                created.append(name)
+            except Exception as e:
+                logger.error("Cannot create audit partition %s: %s", name, e)
+        month = add_months(month, 1)
+    return created
+
+
+def drop_expired_partitions(
+    conn: Connection, retention_months: int, today: Optional[date] = None, drop: bool = True
+) -> List[str]:
+    """Detach (and by default drop) partitions entirely older than the retention window
+
+    A partition for month M is expired once every row in it is older than
+    ``retention_months`` full months, i.e. M + 1 <= current month - retention.
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    retired = []
+    for name in list_partitions(conn):
+        month = partition_month(name)
+        if add_months(month, 1) > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {name}"))
+        if drop:
+            conn.execute(text(f"DROP TABLE {name}"))
+        retired.append(name)
+    if drop:
+        # Only rows no monthly partition was ready for: few, so a DELETE
+        stale = conn.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"),
+            {"cutoff": cutoff},
+        ).rowcount
+        if stale:
+            logger.warning("Deleted %d expired audit rows from %s", stale, DEFAULT_PARTITION)
+    return retired
+
+
+def maintain_partitions(
+    engine: Engine, months_ahead: int, retention_months: Optional[int] = None, drop: bool = True
+) -> dict:
+    """Create upcoming partitions and retire expired ones in one transaction"""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return {"created": [], "retired": []}
+        created = ensure_partitions(conn, months_ahead)
+        retired = []
+        if retention_months:
+            retired = drop_expired_partitions(conn, retention_months, drop=drop)
+    return {"created": created, "retired": retired}
@@ -0,0 +1,131 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 when it has replayed
+# everything it received (an idle primary writes nothing to replay).
+# NULL when its WAL receiver is not streaming: with nothing received
+# the receive and replay positions match however far behind it is.
+_POSTGRES_LAG = text(
+    "SELECT CASE "
+    "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def measure_lag(engine: Engine) -> float:
+    """Replication lag of ``engine`` in seconds (0 for non-PostgreSQL)
+
+    Raises RuntimeError when the replica is not streaming from the
+    primary, since its lag cannot be known.
+    """
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    with engine.connect() as conn:
+        lag = conn.execute(_POSTGRES_LAG).scalar()
+    if lag is None:
+        raise RuntimeError("WAL receiver is not streaming")
+    return float(lag)
+
+
+class ReplicaRouter:
+    """Chooses the engine for read-only lookups
+
+    Replicas whose lag exceeds ``max_lag`` (or that cannot be reached)
+    are skipped until the next check, at most every ``check_seconds``;
+    with none left, reads go to the primary. After a write that affects
+    token validation, reads about that user go to the primary for
+    ``sticky_seconds`` so the writer sees its own change (read-your-
+    writes). Stickiness is tracked per process: other workers rely on
+    ``max_lag`` alone.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: List[Engine],
+        max_lag: float = settings.REPLICA_MAX_LAG_SECONDS,
+        check_seconds: float = settings.REPLICA_LAG_CHECK_SECONDS,
+        sticky_seconds: Optional[float] = None,
+        lag_probe: Callable[[Engine], float] = measure_lag,
+        clock: Callable[[], float] = time.monotonic,
+        max_sticky_entries: int = 100000,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        # A replica within max_lag has caught up with a write this old
+        self.sticky_seconds = max_lag if sticky_seconds is None else sticky_seconds
+        self.lag_probe = lag_probe
+        self.clock = clock
+        self.max_sticky_entries = max_sticky_entries
+        self._healthy: List[Engine] = list(replicas)
+        self._cycle = itertools.cycle(self._healthy)
+        self._checked_at = float("-inf")
+        self._check_lock = threading.Lock()
+        self._sticky: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_written(self, user_id: int) -> None:
+        if not self.replicas:
+            return
+        now = self.clock()
+        with self._lock:
+            self._sticky[user_id] = now + self.sticky_seconds
+            if len(self._sticky) > self.max_sticky_entries:
+                self._sticky = {k: v for k, v in self._sticky.items() if v > now}
+
+    def is_sticky(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        until = self._sticky.get(user_id)
+        return until is not None and until > self.clock()
+
+    def check_replicas(self) -> None:
+        healthy = []
+        for replica in self.replicas:
+            try:
+                lag = self.lag_probe(replica)
+            except Exception as e:
+                logger.warning("Replica %s unavailable: %s", replica.url.host, e)
+                continue
+            if lag <= self.max_lag:
+                healthy.append(replica)
+            else:
+                logger.warning("Replica %s lagging %.1fs behind", replica.url.host, lag)
+        with self._lock:
+            self._healthy = healthy
+            self._cycle = itertools.cycle(healthy)
+            self._checked_at = self.clock()
+
+    def _ensure_checked(self) -> None:
+        if self.clock() - self._checked_at < self.check_seconds:
+            return
+        # One thread probes; the others use the current list meanwhile
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            if self.clock() - self._checked_at >= self.check_seconds:
+                self.check_replicas()
+        finally:
+            self._check_lock.release()
+
+    def engine_for(self, user_id: Optional[int] = None) -> Engine:
+        if not self.replicas or self.is_sticky(user_id):
+            return self.primary
+        self._ensure_checked()
+        with self._lock:
+            if not self._healthy:
+                return self.primary
+            return next(self._cycle)
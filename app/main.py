@@ -1,14 +1,30 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
+import hashlib
+
+from fastapi import FastAPI, Request, Response
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
 from app.api.v1.api import api_router
+from app.authz.asgi import ext_authz_app
 from app.core.config import settings
+from app.core.keys import ASYMMETRIC_ALGORITHMS, keyring
+from app.core.log import RequestIdMiddleware, setup_logging
+from app.core.tracing import TracingMiddleware, instrument_engine, setup_tracing
+from app.core import singleflight
+from app.core.admission import AdmissionMiddleware, admission_controller
+from app.core.edge import EdgeMiddleware
+from app.core.responses import DefaultResponse
 from app.core.security import limiter
-from app.db.database import engine
+from app.db.database import engine, replica_engines
 from app.db import models
+from app.services.idempotency import IdempotencyMiddleware, idempotency_store
+from app.services.keycloak import keycloak_clients
+
+setup_logging()
+setup_tracing()
+instrument_engine(engine)
+for replica in replica_engines:
+    instrument_engine(replica)
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
@@ -17,30 +33,35 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.PROJECT_VERSION,
     openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
+    default_response_class=DefaultResponse,
 )
 
-# Set up CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.BACKEND_CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Retried register/login/refresh with an Idempotency-Key replay the
+# first response (inside the edge checks, so replays get CORS headers)
+app.add_middleware(IdempotencyMiddleware)
 
-# Security middleware
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"] if settings.DEBUG else settings.ALLOWED_HOSTS,
-)
+# Host check, CORS and rate-limit keying in one pass (skipped for
+# EDGE_BYPASS_PATHS)
+app.add_middleware(EdgeMiddleware)
+
+# Request spans
+app.add_middleware(TracingMiddleware)
 
-# Rate limiting
+# Rate limiting: per client (slowapi) and, under overload, per worker with
+# low priority routes shed first
+app.add_middleware(AdmissionMiddleware)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Request IDs for log correlation (outermost, so every log line has one)
+app.add_middleware(RequestIdMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
+# Envoy HTTP ext_authz (the gRPC variant runs as app.authz.server)
+app.mount("/ext_authz", ext_authz_app)
+
 
 @app.get("/")
 def root():
@@ -61,17 +82,42 @@ def health_check():
     }
 
 
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+def jwks(request: Request):
+    # Public keys for verifying our tokens locally; the set changes rarely
+    # and new keys are published before they sign anything, so let
+    # consumers and proxies cache it
+    body = keyring.jwks() if settings.ALGORITHM in ASYMMETRIC_ALGORITHMS else b'{"keys": []}'
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {
+        "Cache-Control": (
+            f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={settings.JWKS_MAX_AGE_SECONDS}, stale-if-error=86400"
+        ),
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @app.get("/metrics")
 def metrics():
     # Simple metrics endpoint - can be enhanced with prometheus_client
     return {
         "service": settings.PROJECT_NAME,
         "version": settings.PROJECT_VERSION,
-        "status": "operational"
+        "status": "operational",
+        # Concurrent identical upstream calls collapsed into one
+        "singleflight": singleflight.stats(),
+        "admission": admission_controller.stats(),
+        # Realms with Keycloak clients in this worker
+        "keycloak": keycloak_clients.stats(),
+        "idempotency": idempotency_store.stats(),
     }
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from app.server import run
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    run()
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, field_validator
 
@@ -38,6 +38,7 @@ class UserInDB(UserBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     keycloak_id: Optional[str] = None
+    realm: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -60,6 +61,18 @@ class TokenPayload(BaseModel):
     exp: Optional[int] = None
     type: Optional[str] = None
     jti: Optional[str] = None
+    epoch: int = 0
+
+
+class TokenUser(BaseModel):
+    """Current user as described by a stateless access token's claims"""
+    id: int
+    username: str
+    is_active: bool
+    is_superuser: bool = False
+    roles: List[str] = []
+    token_epoch: int = 0
+    realm: Optional[str] = None
 
 
 class TokenRevoke(BaseModel):
@@ -96,4 +109,73 @@ class ValidationResponse(BaseModel):
     valid: bool
     user_id: Optional[int] = None
     username: Optional[str] = None
+    realm: Optional[str] = None
     exp: Optional[int] = None
+
+
+# Revocation feed schemas
+class RevokedToken(BaseModel):
+    jti: str
+    token_type: str
+    user_id: int
+    exp: Optional[int] = None
+
+
+class RevokedUserState(BaseModel):
+    user_id: int
+    token_epoch: int
+    is_active: bool
+
+
+class RevocationSnapshot(BaseModel):
+    offset: int
+    tokens: List[RevokedToken]
+    users: List[RevokedUserState]
+
+
+# Session schemas
+class Session(BaseModel):
+    id: int
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+    created_at: datetime
+    last_used_at: Optional[datetime] = None
+    expires_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+# Audit log schemas
+class AuditLog(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    action: str
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+    status: str
+    details: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLog]
+    next_cursor: Optional[str] = None
+
+
+# Bulk import schemas
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    total: int
+    created: int
+    skipped: int
+    failed: int
+    batches: int
+    errors: List[BulkImportError] = []
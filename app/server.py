@@ -0,0 +1,163 @@
+"""Production server entry point.
+
+Runs the app under gunicorn with uvicorn workers:
+
+    python -m app.server
+
+The worker count defaults to the container's CPU quota (cgroup v2/v1),
+workers use uvloop/httptools when installed, are recycled after
+SERVER_MAX_REQUESTS requests, and the app is imported once in the master
+before forking so workers share its memory copy-on-write.
+"""
+import gc
+import importlib.util
+import logging
+import math
+import os
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(
+    cpu_max_path: str = CGROUP_V2_CPU_MAX,
+    quota_path: str = CGROUP_V1_QUOTA,
+    period_path: str = CGROUP_V1_PERIOD,
+) -> Optional[float]:
+    """Return the CPU quota in cores, or None when unlimited or unknown"""
+    cpu_max = _read(cpu_max_path)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota, period = _read(quota_path), _read(period_path)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count(configured: int = settings.SERVER_WORKERS) -> int:
+    if configured > 0:
+        return configured
+    limit = cgroup_cpu_limit()
+    cpus = available_cpus()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def _post_fork(server, worker) -> None:
+    # Connections opened while importing the app in the master must not
+    # be shared between processes: drop them so each worker opens its own.
+    from app.core.log import setup_logging
+    from app.db.database import engine, replica_engines
+    from app.services.keycloak import keycloak_clients
+    from app.services.redis_client import redis_client
+    from app.services.vault import vault_service
+
+    # The log listener thread does not survive fork
+    setup_logging()
+    engine.dispose(close=False)
+    for replica in replica_engines:
+        replica.dispose(close=False)
+    vault_service.reconnect()
+    keycloak_clients.reset()
+    redis_client.reset()
+
+
+def _pre_fork(server, worker) -> None:
+    # Move everything allocated so far out of the GC's reach so collections
+    # in workers do not touch (and un-share) the preloaded pages.
+    gc.freeze()
+
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": worker_count(),
+        "worker_class": "app.server.UvicornWorker",
+        "preload_app": settings.SERVER_PRELOAD,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "timeout": settings.SERVER_TIMEOUT,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "post_fork": _post_fork,
+        "pre_fork": _pre_fork,
+        "accesslog": "-",
+        "loglevel": settings.LOG_LEVEL.lower(),
+    }
+
+
+try:
+    from uvicorn.workers import UvicornWorker as _BaseUvicornWorker
+
+    class UvicornWorker(_BaseUvicornWorker):
+        CONFIG_KWARGS = {
+            "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+            "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+            "proxy_headers": True,
+        }
+except ImportError:  # uvicorn or gunicorn not installed
+    UvicornWorker = None
+
+
+def run() -> None:
+    from gunicorn.app.base import BaseApplication
+
+    if UvicornWorker is None:
+        raise RuntimeError("uvicorn is required to run the production server")
+
+    class Application(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    options = gunicorn_options()
+    if (
+        options["workers"] > 1
+        and settings.LOGIN_LOCKOUT_ENABLED
+        and not settings.LOGIN_GUARD_REDIS_ENABLED
+    ):
+        logger.warning(
+            "Login lockout counters are per worker without LOGIN_GUARD_REDIS_ENABLED: "
+            "%d workers allow %d times LOGIN_LOCKOUT_THRESHOLD failures",
+            options["workers"], options["workers"],
+        )
+    Application(options).run()
+
+
+if __name__ == "__main__":
+    run()
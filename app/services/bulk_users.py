@@ -0,0 +1,414 @@
+import csv
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+)
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.core.tenancy import DEFAULT_REALM
+from app.crud import crud_user
+from app.db import models
+from app.services.keycloak import keycloak_clients
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportProgress:
+    """Running totals of a bulk import, reported after every batch"""
+    total: int = 0
+    created: int = 0
+    skipped: int = 0
+    failed: int = 0
+    batches: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "created": self.created,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "errors": list(self.errors),
+        }
+
+
+ProgressCallback = Callable[[ImportProgress], None]
+
+
+def parse_ndjson(lines: Iterable[str], first_line: int = 1) -> Iterator[Tuple[int, Any]]:
+    """Yield (line_number, record) pairs from NDJSON lines"""
+    for line_no, line in enumerate(lines, start=first_line):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+
+def parse_csv(
+    lines: Iterable[str], header: Optional[List[str]] = None, first_line: int = 1
+) -> Iterator[Tuple[int, Any]]:
+    """Yield (line_number, record) pairs from CSV lines
+
+    Lines keep their line endings, as when reading a file opened with
+    ``newline=""``, so quoted fields may span lines; a record is numbered
+    by the line it starts on. Without an explicit header the first line
+    is used as the header row.
+    """
+    reader = csv.reader(lines)
+    if header is None:
+        header = next(reader, [])
+    line_num = reader.line_num
+    for row in reader:
+        start, line_num = line_num + 1, reader.line_num
+        if not row:
+            continue
+        # Empty cells mean "not provided" so schema defaults apply
+        yield first_line + start - 1, {
+            k: v for k, v in zip(header, row) if k and v not in ("", None)
+        }
+
+
+def parse_records(
+    lines: Iterable[str], fmt: str, header: Optional[List[str]] = None, first_line: int = 1
+) -> Iterator[Tuple[int, Any]]:
+    if fmt == FORMAT_CSV:
+        return parse_csv(lines, header, first_line)
+    if fmt == FORMAT_NDJSON:
+        return parse_ndjson(lines, first_line)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split an async byte stream (e.g. a request body) into text lines
+
+    Lines keep their newline, as when reading a file opened with ``newline=""``.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            yield line.decode("utf-8") + "\n"
+    if pending:
+        yield pending.decode("utf-8")
+
+
+class LineBatcher:
+    """Group incoming lines into parsed batches, keeping line numbers and the CSV header
+
+    A quoted CSV field may span lines, so a CSV batch only ends on a line
+    that closes every quote it opened.
+    """
+
+    def __init__(self, fmt: str, batch_size: int):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.header: Optional[List[str]] = None
+        self.line_no = 0
+        self.first_line = 1
+        self.lines: List[str] = []
+        self.records = 0
+        # Quote characters seen since the last complete record; quotes
+        # inside a field are doubled, so an odd count means it is open
+        self.quotes = 0
+
+    def feed(self, line: str) -> Optional[List[Tuple[int, Any]]]:
+        self.line_no += 1
+        if not self.lines:
+            self.first_line = self.line_no
+        self.lines.append(line)
+        if self.fmt == FORMAT_CSV:
+            self.quotes += line.count('"')
+            if self.quotes % 2:
+                return None
+            self.quotes = 0
+            if self.header is None:
+                # Blank lines before the header are skipped
+                self.header = next(csv.reader(self.lines), None) or None
+                self.lines = []
+                return None
+        self.records += 1
+        if self.records >= self.batch_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> List[Tuple[int, Any]]:
+        records = list(parse_records(self.lines, self.fmt, self.header, self.first_line))
+        self.lines = []
+        self.records = 0
+        return records
+
+
+class BulkUserService:
+    def __init__(
+        self,
+        batch_size: int = settings.BULK_IMPORT_BATCH_SIZE,
+        hash_workers: int = settings.BULK_HASH_WORKERS,
+        keycloak_workers: int = settings.BULK_KEYCLOAK_WORKERS,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.keycloak_workers = max(1, keycloak_workers)
+        self._hash_pool: Optional[ThreadPoolExecutor] = None
+        self._keycloak_pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def hash_pool(self) -> ThreadPoolExecutor:
+        # bcrypt releases the GIL, so threads give real parallelism
+        # without pickling passwords across process boundaries.
+        if self._hash_pool is None:
+            self._hash_pool = ThreadPoolExecutor(
+                max_workers=self.hash_workers, thread_name_prefix="bulk-hash"
+            )
+        return self._hash_pool
+
+    @property
+    def keycloak_pool(self) -> ThreadPoolExecutor:
+        if self._keycloak_pool is None:
+            self._keycloak_pool = ThreadPoolExecutor(
+                max_workers=self.keycloak_workers, thread_name_prefix="bulk-keycloak"
+            )
+        return self._keycloak_pool
+
+    def _validate_batch(
+        self,
+        db: Session,
+        records: List[Tuple[int, Any]],
+        progress: ImportProgress,
+        realm: str = DEFAULT_REALM,
+    ) -> List[Tuple[int, schemas.UserCreate]]:
+        valid: List[Tuple[int, schemas.UserCreate]] = []
+        for line_no, record in records:
+            progress.total += 1
+            if isinstance(record, Exception):
+                progress.add_error(line_no, f"Invalid record: {record}")
+                continue
+            try:
+                valid.append((line_no, schemas.UserCreate.model_validate(record)))
+            except ValidationError as e:
+                progress.add_error(line_no, "; ".join(err["msg"] for err in e.errors()))
+
+        # One query per batch for duplicates against the database,
+        # plus a set check for duplicates within the batch itself.
+        taken_emails, taken_usernames = crud_user.get_existing_identities(
+            db,
+            emails=[user.email for _, user in valid],
+            usernames=[user.username for _, user in valid],
+            realm=realm,
+        )
+        unique: List[Tuple[int, schemas.UserCreate]] = []
+        for line_no, user in valid:
+            if user.email in taken_emails or user.username in taken_usernames:
+                progress.skipped += 1
+                continue
+            taken_emails.add(user.email)
+            taken_usernames.add(user.username)
+            unique.append((line_no, user))
+        return unique
+
+    def _provision_keycloak(
+        self, users: List[schemas.UserCreate], realm: str = DEFAULT_REALM
+    ) -> List[Optional[str]]:
+        keycloak = keycloak_clients.get(realm)
+        return list(self.keycloak_pool.map(
+            lambda user: keycloak.create_user(
+                email=user.email,
+                username=user.username,
+                password=user.password,
+                full_name=user.full_name,
+            ),
+            users,
+        ))
+
+    def _deprovision_keycloak(self, keycloak_ids: List[str], realm: str = DEFAULT_REALM) -> None:
+        keycloak = keycloak_clients.get(realm)
+        deleted = self.keycloak_pool.map(keycloak.delete_user, keycloak_ids)
+        orphans = [kid for kid, ok in zip(keycloak_ids, deleted) if not ok]
+        if orphans:
+            logger.error("Bulk import left Keycloak users without a local user: %s", orphans)
+
+    def import_batch(
+        self,
+        db: Session,
+        records: List[Tuple[int, Any]],
+        progress: ImportProgress,
+        provision_keycloak: bool = True,
+        realm: str = DEFAULT_REALM,
+    ) -> None:
+        """Validate, hash, provision and insert one batch of parsed records
+
+        Users Keycloak did not create are reported and left out; if the
+        insert fails, the Keycloak users created for the batch are deleted.
+        """
+        batch = self._validate_batch(db, records, progress, realm)
+        progress.batches += 1
+        if not batch:
+            return
+
+        users = [user for _, user in batch]
+        hashes = self.hash_pool.map(lambda user: get_password_hash(user.password), users)
+        keycloak_ids: Optional[List[str]] = None
+        if provision_keycloak:
+            provisioned = self._provision_keycloak(users, realm)
+            hashes = list(hashes)
+            kept = []
+            for i, ((line_no, _), keycloak_id) in enumerate(zip(batch, provisioned)):
+                if keycloak_id is None:
+                    progress.add_error(line_no, "Keycloak provisioning failed")
+                else:
+                    kept.append(i)
+            batch = [batch[i] for i in kept]
+            users = [users[i] for i in kept]
+            hashes = [hashes[i] for i in kept]
+            keycloak_ids = [provisioned[i] for i in kept]
+            if not batch:
+                return
+        hashes = list(hashes)
+
+        try:
+            progress.created += crud_user.create_users_bulk(
+                db, users, hashes, keycloak_ids, realm=realm
+            )
+        except Exception as e:
+            db.rollback()
+            for line_no, _ in batch:
+                progress.add_error(line_no, f"Insert failed: {e}")
+            if keycloak_ids:
+                self._deprovision_keycloak(keycloak_ids, realm)
+
+    def import_lines(
+        self,
+        db: Session,
+        lines: Iterable[str],
+        fmt: str = FORMAT_NDJSON,
+        provision_keycloak: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+        realm: str = DEFAULT_REALM,
+    ) -> ImportProgress:
+        """Import users from an iterable of NDJSON or CSV lines"""
+        progress = ImportProgress()
+        batcher = LineBatcher(fmt, self.batch_size)
+        for line in lines:
+            records = batcher.feed(line)
+            if records:
+                self.import_batch(db, records, progress, provision_keycloak, realm)
+                if on_progress:
+                    on_progress(progress)
+        records = batcher.flush()
+        if records:
+            self.import_batch(db, records, progress, provision_keycloak, realm)
+            if on_progress:
+                on_progress(progress)
+        return progress
+
+    async def import_stream(
+        self,
+        db: Session,
+        chunks: AsyncIterator[bytes],
+        fmt: str = FORMAT_NDJSON,
+        provision_keycloak: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+        realm: str = DEFAULT_REALM,
+    ) -> ImportProgress:
+        """Import users from an async byte stream without buffering the whole body"""
+        progress = ImportProgress()
+        batcher = LineBatcher(fmt, self.batch_size)
+        async for line in aiter_lines(chunks):
+            records = batcher.feed(line)
+            if records:
+                await run_in_threadpool(
+                    self.import_batch, db, records, progress, provision_keycloak, realm
+                )
+                if on_progress:
+                    on_progress(progress)
+        records = batcher.flush()
+        if records:
+            await run_in_threadpool(
+                self.import_batch, db, records, progress, provision_keycloak, realm
+            )
+            if on_progress:
+                on_progress(progress)
+        return progress
+
+    def log_import(
+        self,
+        db: Session,
+        progress: ImportProgress,
+        actor_id: Optional[int] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+    ) -> None:
+        """Record a single audit row for the whole import"""
+        db.add(models.AuditLog(
+            user_id=actor_id,
+            action="bulk_import",
+            ip_address=ip_address,
+            user_agent=user_agent,
+            status="success" if not progress.failed else "partial",
+            details=(
+                f"total={progress.total} created={progress.created} "
+                f"skipped={progress.skipped} failed={progress.failed}"
+            ),
+        ))
+        db.commit()
+
+    def export_lines(
+        self, db: Session, fmt: str = FORMAT_NDJSON, realm: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream all users (of ``realm`` when given) as NDJSON or CSV lines"""
+        rows = crud_user.iter_users(db, batch_size=settings.BULK_EXPORT_BATCH_SIZE, realm=realm)
+        if fmt == FORMAT_CSV:
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=crud_user.EXPORT_COLUMNS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({k: _export_value(v) for k, v in row.items()})
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        elif fmt == FORMAT_NDJSON:
+            for row in rows:
+                yield json.dumps({k: _export_value(v) for k, v in row.items()}) + "\n"
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+bulk_user_service = BulkUserService()
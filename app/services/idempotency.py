@@ -0,0 +1,434 @@
+"""Idempotency keys for retried POSTs (register, login, refresh).
+
+A client that times out retries with the same ``Idempotency-Key`` header.
+The first request claims the key and runs; its 2xx response is stored for
+IDEMPOTENCY_TTL_SECONDS and replayed, byte for byte, to every duplicate,
+so a retry costs one lookup instead of bcrypt, Keycloak provisioning,
+Vault writes and an audit insert. A refresh retried after the rotation
+gets the rotated tokens instead of a reuse error.
+
+- Keys are scoped by realm and path. A key reused with a different
+  request (method, path, query or body) gets a 422.
+- Duplicates arriving while the original runs wait for it: in the same
+  worker on its completion, across workers by polling the store, for up
+  to IDEMPOTENCY_WAIT_SECONDS before a 409 with Retry-After.
+- Error responses are not stored: the claim is released and a retry runs
+  again. A worker that dies mid-request leaves a claim that is taken
+  over after IDEMPOTENCY_LOCK_SECONDS.
+- Records live in Redis (IDEMPOTENCY_REDIS_ENABLED) or in the
+  ``idempotency_keys`` table. When the store cannot be reached the
+  request runs as if it had no key.
+- Stored bodies hold tokens, so they are encrypted (AES-GCM) with a key
+  derived from the client's Idempotency-Key, which is never stored: the
+  store only sees a digest of it. Request fingerprints are HMACs keyed
+  the same way, as login bodies hold passwords. Clients should send random keys
+  (UUIDs); a guessable key makes its response decryptable.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import orjson
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.crud import crud_idempotency
+from app.db.database import SessionLocal
+from app.services.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of IdempotencyStore.begin
+CLAIMED = "claimed"
+REPLAY = "replay"
+IN_FLIGHT = "in_flight"
+MISMATCH = "mismatch"
+
+MAX_KEY_LENGTH = 255
+# How often a duplicate checks on an original running in another worker
+POLL_SECONDS = 0.1
+PRUNE_INTERVAL_SECONDS = 300
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: Optional[int]  # None while the original runs
+    content_type: Optional[str]
+    body: bytes
+
+
+def _encode(record: StoredResponse) -> bytes:
+    # orjson output never contains a newline, so it separates head and body
+    head = orjson.dumps([record.fingerprint, record.status_code, record.content_type])
+    return head + b"\n" + record.body
+
+
+def _decode(raw: bytes) -> StoredResponse:
+    head, body = raw.split(b"\n", 1)
+    fingerprint, status_code, content_type = orjson.loads(head)
+    return StoredResponse(fingerprint, status_code, content_type, body)
+
+
+def _classify(record: StoredResponse, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+    if record.fingerprint != fingerprint:
+        return MISMATCH, None
+    if record.status_code is None:
+        return IN_FLIGHT, None
+    return REPLAY, record
+
+
+class IdempotencyStore:
+    """Claims keys and keeps the responses to replay, in Redis or Postgres
+
+    Not a cache: a missing record means the request runs. Every method
+    may raise when the backend is unavailable.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = settings.IDEMPOTENCY_TTL_SECONDS,
+        lock_seconds: int = settings.IDEMPOTENCY_LOCK_SECONDS,
+        use_redis: bool = settings.IDEMPOTENCY_REDIS_ENABLED,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.use_redis = use_redis
+        self.session_factory = session_factory
+        self._pruned_at = float("-inf")
+        # Requests that ran / were answered from the store / were refused
+        self.executed = 0
+        self.replayed = 0
+        self.rejected = 0
+
+    @property
+    def redis(self):
+        return redis_client.client
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """Claim ``key`` (CLAIMED), or report what holds it: a response to
+        replay (REPLAY), a running original (IN_FLIGHT) or another request
+        (MISMATCH)"""
+        if self.use_redis:
+            pending = _encode(StoredResponse(fingerprint, None, None, b""))
+            if self.redis.set(f"idem:{key}", pending, nx=True, ex=self.lock_seconds):
+                return CLAIMED, None
+            raw = self.redis.get(f"idem:{key}")
+            # Gone in between: let the caller try again
+            return _classify(_decode(raw), fingerprint) if raw else (IN_FLIGHT, None)
+
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            if crud_idempotency.claim(
+                db,
+                key,
+                fingerprint,
+                now=now,
+                locked_until=now + timedelta(seconds=self.lock_seconds),
+                expires_at=now + timedelta(seconds=self.ttl_seconds),
+            ):
+                self._maybe_prune(db, now)
+                return CLAIMED, None
+            row = crud_idempotency.get_record(db, key, now)
+        finally:
+            db.close()
+        if row is None:
+            return IN_FLIGHT, None
+        return _classify(StoredResponse(*row), fingerprint)
+
+    def complete(
+        self, key: str, fingerprint: str, status_code: int, content_type: Optional[str], body: bytes
+    ) -> None:
+        """Store the response of a claimed request for replay (``body`` as
+        encrypted by the middleware)"""
+        if self.use_redis:
+            record = StoredResponse(fingerprint, status_code, content_type, body)
+            self.redis.set(f"idem:{key}", _encode(record), ex=self.ttl_seconds)
+            return
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        db = self.session_factory()
+        try:
+            crud_idempotency.save_response(
+                db, key, fingerprint, status_code, content_type, body, expires_at
+            )
+        finally:
+            db.close()
+
+    def release(self, key: str, fingerprint: str) -> None:
+        """Give up a claim without a response, so a retry runs again"""
+        if self.use_redis:
+            raw = self.redis.get(f"idem:{key}")
+            if raw and _classify(_decode(raw), fingerprint)[0] == IN_FLIGHT:
+                self.redis.delete(f"idem:{key}")
+            return
+
+        db = self.session_factory()
+        try:
+            crud_idempotency.release_claim(db, key, fingerprint)
+        finally:
+            db.close()
+
+    def _maybe_prune(self, db: Session, now: datetime) -> None:
+        # Redis expires its keys itself; the table is pruned by the workers
+        started = time.monotonic()
+        if started - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = started
+        try:
+            crud_idempotency.prune_expired(db, now)
+        except Exception as e:
+            db.rollback()
+            logger.error("Error pruning idempotency keys: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "replayed": self.replayed, "rejected": self.rejected}
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _digest(*parts: bytes) -> str:
+    return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+
+def _client_secret(purpose: bytes, realm: bytes, path: bytes, client_key: bytes) -> bytes:
+    # A different input than the store key's digest, so one cannot be
+    # computed from the other
+    return hashlib.sha256(b"\0".join((purpose, realm, path, client_key))).digest()
+
+
+def _body_key(realm: bytes, path: bytes, client_key: bytes) -> AESGCM:
+    return AESGCM(_client_secret(b"body", realm, path, client_key))
+
+
+def _fingerprint(realm: bytes, path: bytes, client_key: bytes, query: bytes, body: bytes) -> str:
+    """Request fingerprint, keyed by the client's key: login bodies hold
+    passwords, and a plain hash of one could be attacked offline"""
+    secret = _client_secret(b"fingerprint", realm, path, client_key)
+    return hmac.new(secret, b"\0".join((b"POST", path, query, body)), hashlib.sha256).hexdigest()
+
+
+def _seal(cipher: AESGCM, key: str, body: bytes) -> bytes:
+    nonce = os.urandom(12)
+    return nonce + cipher.encrypt(nonce, body, key.encode())
+
+
+def _open(cipher: AESGCM, key: str, sealed: bytes) -> bytes:
+    return cipher.decrypt(sealed[:12], sealed[12:], key.encode())
+
+
+async def _read_body(receive) -> Optional[bytes]:
+    """The whole request body, or None if the client went away"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware applying an IdempotencyStore to IDEMPOTENCY_PATHS
+
+    Duplicates within one worker wait on the original's completion rather
+    than on the store, so only one of them reaches the backend at a time.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: Optional[IdempotencyStore] = None,
+        enabled: bool = settings.IDEMPOTENCY_ENABLED,
+        paths=tuple(settings.IDEMPOTENCY_PATHS),
+        header: str = settings.IDEMPOTENCY_HEADER,
+        wait_seconds: float = settings.IDEMPOTENCY_WAIT_SECONDS,
+    ):
+        self.app = app
+        self.store = store or idempotency_store
+        self.enabled = enabled
+        self.paths = frozenset(paths)
+        self.header = header.lower().encode()
+        self.realm_header = settings.TENANT_HEADER.lower().encode()
+        self.wait_seconds = wait_seconds
+        # key -> completion of the request holding it in this worker
+        self._running: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.enabled
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client_key, realm = None, b""
+        for name, value in scope["headers"]:
+            if name == self.header:
+                client_key = value
+            elif name == self.realm_header:
+                realm = value
+        if client_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not client_key.strip() or len(client_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Invalid {settings.IDEMPOTENCY_HEADER} header")
+            return
+
+        body = await _read_body(receive)
+        if body is None:
+            return
+        path = scope["path"].encode()
+        key = _digest(realm, path, client_key)
+        cipher = _body_key(realm, path, client_key)
+        fingerprint = _fingerprint(realm, path, client_key, scope.get("query_string", b""), body)
+
+        outcome, stored = await self._begin(key, fingerprint)
+        if outcome == REPLAY:
+            try:
+                stored = stored._replace(body=_open(cipher, key, stored.body))
+            except (InvalidTag, ValueError):
+                logger.error("Cannot decrypt the stored idempotent response, running the request")
+                await self._run(scope, receive, send, body, key, fingerprint, None)
+                return
+            self.store.replayed += 1
+            await _send_stored(send, stored)
+            return
+        if outcome == MISMATCH:
+            self.store.rejected += 1
+            await _send_json(
+                send, 422, f"{settings.IDEMPOTENCY_HEADER} reused with a different request"
+            )
+            return
+        if outcome == IN_FLIGHT:
+            self.store.rejected += 1
+            await _send_json(
+                send, 409, f"A request with this {settings.IDEMPOTENCY_HEADER} is in progress",
+                headers=[(b"retry-after", b"1")],
+            )
+            return
+        await self._run(
+            scope, receive, send, body, key, fingerprint, cipher if outcome == CLAIMED else None
+        )
+
+    async def _begin(self, key: str, fingerprint: str) -> Tuple[Optional[str], Optional[StoredResponse]]:
+        """Outcome of ``IdempotencyStore.begin`` once no duplicate in this
+        worker runs, waiting for an in-flight original; None if the store
+        is unavailable"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while True:
+            running = self._running.get(key)
+            if running is not None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(running), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    return IN_FLIGHT, None
+                continue
+
+            # Registered first, so duplicates in this worker wait on it
+            self._running[key] = loop.create_future()
+            try:
+                outcome, stored = await run_in_threadpool(self.store.begin, key, fingerprint)
+            except Exception as e:
+                logger.error("Idempotency store unavailable: %s", e)
+                return None, None
+            if outcome == CLAIMED:
+                return outcome, None
+            self._finish(key)
+            if outcome != IN_FLIGHT or loop.time() >= deadline:
+                return outcome, stored
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def _run(
+        self, scope, receive, send, body, key, fingerprint, cipher: Optional[AESGCM]
+    ) -> None:
+        """Run the request; with ``cipher`` (the key is claimed) store its
+        response encrypted"""
+        claimed = cipher is not None
+        status_code, content_type, chunks = 500, None, []
+
+        async def capture(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type":
+                        content_type = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        self.store.executed += 1
+        stored = False
+        try:
+            await self.app(scope, replay_receive, capture)
+            if claimed and 200 <= status_code < 300:
+                sealed = _seal(cipher, key, b"".join(chunks))
+                stored = await self._call_store(
+                    self.store.complete, key, fingerprint, status_code, content_type, sealed
+                )
+        finally:
+            if claimed and not stored:
+                await self._call_store(self.store.release, key, fingerprint)
+            self._finish(key)
+
+    async def _call_store(self, method, *args) -> bool:
+        try:
+            await run_in_threadpool(method, *args)
+            return True
+        except Exception as e:
+            logger.error("Idempotency store unavailable: %s", e)
+            return False
+
+    def _finish(self, key: str) -> None:
+        running = self._running.pop(key, None)
+        if running is not None and not running.done():
+            running.set_result(None)
+
+
+async def _send_stored(send, stored: StoredResponse) -> None:
+    headers = [
+        (b"content-length", str(len(stored.body)).encode()),
+        (b"idempotent-replayed", b"true"),
+    ]
+    if stored.content_type:
+        headers.append((b"content-type", stored.content_type.encode("latin-1")))
+    await send({"type": "http.response.start", "status": stored.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": stored.body})
+
+
+async def _send_json(send, status_code: int, detail: str, headers=()) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,14 +1,49 @@
-from typing import Optional
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 from keycloak import KeycloakOpenID, KeycloakAdmin
 from keycloak.exceptions import KeycloakError
 
 from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.core.tenancy import DEFAULT_REALM
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Shared by every realm's client; keys start with the realm
+_user_reads = SingleFlight("keycloak.get_user")
+_introspections = SingleFlight("keycloak.validate_token")
+_jwks_fetches = SingleFlight("keycloak.get_jwks")
+_role_reads = SingleFlight("keycloak.get_user_roles")
+
+
+def split_full_name(full_name: Optional[str]) -> Tuple[str, str]:
+    """Keycloak (firstName, lastName) for a local full_name"""
+    parts = full_name.split() if full_name else []
+    return (parts[0] if parts else "", " ".join(parts[1:]))
 
 
 class KeycloakService:
-    def __init__(self):
+    """OpenID and admin clients of one realm"""
+    
+    def __init__(self, realm: str = DEFAULT_REALM):
+        self.realm = realm
         self._keycloak_openid = None
         self._keycloak_admin = None
+        # (fetched at, keys)
+        self._jwks: Optional[Tuple[float, dict]] = None
+        # Internal id of KEYCLOAK_CLIENT_ID, for client role lookups
+        self._client_uuid: Optional[str] = None
+    
+    def reset(self):
+        """Drop cached clients so they are recreated on next use"""
+        self._keycloak_openid = None
+        self._keycloak_admin = None
+        self._jwks = None
+        self._client_uuid = None
     
     @property
     def keycloak_openid(self):
@@ -17,11 +52,13 @@ class KeycloakService:
                 self._keycloak_openid = KeycloakOpenID(
                     server_url=settings.KEYCLOAK_URL,
                     client_id=settings.KEYCLOAK_CLIENT_ID,
-                    realm_name=settings.KEYCLOAK_REALM,
-                    client_secret_key=settings.KEYCLOAK_CLIENT_SECRET
+                    realm_name=self.realm,
+                    client_secret_key=settings.KEYCLOAK_REALM_CLIENT_SECRETS.get(
+                        self.realm, settings.KEYCLOAK_CLIENT_SECRET
+                    )
                 )
             except Exception as e:
-                print(f"Warning: Could not initialize Keycloak OpenID client: {e}")
+                logger.warning("Could not initialize Keycloak OpenID client: %s", e)
                 return None
         return self._keycloak_openid
     
@@ -33,27 +70,30 @@ class KeycloakService:
                     server_url=settings.KEYCLOAK_URL,
                     username=settings.KEYCLOAK_ADMIN_USERNAME,
                     password=settings.KEYCLOAK_ADMIN_PASSWORD,
-                    realm_name=settings.KEYCLOAK_REALM,
+                    realm_name=self.realm,
+                    user_realm_name=settings.KEYCLOAK_ADMIN_REALM or self.realm,
                     verify=True
                 )
             except Exception as e:
-                print(f"Warning: Could not initialize Keycloak Admin client: {e}")
+                logger.warning("Could not initialize Keycloak Admin client: %s", e)
                 return None
         return self._keycloak_admin
     
+    @traced("keycloak.create_user")
     def create_user(self, email: str, username: str, password: str, full_name: Optional[str] = None) -> Optional[str]:
         """Create user in Keycloak and return user ID"""
         if self.keycloak_admin is None:
-            print("Warning: Keycloak admin client not available")
+            logger.warning("Keycloak admin client not available")
             return None
             
         try:
+            first_name, last_name = split_full_name(full_name)
             payload = {
                 "email": email,
                 "username": username,
                 "enabled": True,
-                "firstName": full_name.split()[0] if full_name else "",
-                "lastName": " ".join(full_name.split()[1:]) if full_name and len(full_name.split()) > 1 else "",
+                "firstName": first_name,
+                "lastName": last_name,
                 "credentials": [{
                     "type": "password",
                     "value": password,
@@ -64,70 +104,183 @@ class KeycloakService:
             user_id = self.keycloak_admin.create_user(payload, exist_ok=False)
             return user_id
         except KeycloakError as e:
-            print(f"Error creating user in Keycloak: {e}")
+            logger.error("Error creating user in Keycloak: %s", e)
             return None
     
+    @traced("keycloak.get_user")
     def get_user(self, user_id: str) -> Optional[dict]:
         """Get user from Keycloak"""
         if self.keycloak_admin is None:
-            print("Warning: Keycloak admin client not available")
+            logger.warning("Keycloak admin client not available")
             return None
             
         try:
-            return self.keycloak_admin.get_user(user_id)
+            return _user_reads.do((self.realm, user_id), self.keycloak_admin.get_user, user_id)
         except KeycloakError as e:
-            print(f"Error getting user from Keycloak: {e}")
+            logger.error("Error getting user from Keycloak: %s", e)
             return None
     
-    def update_user(self, user_id: str, **kwargs) -> bool:
-        """Update user in Keycloak"""
+    def _read_roles(self, user_id: str) -> List[str]:
+        admin = self.keycloak_admin
+        roles = [r["name"] for r in admin.get_composite_realm_roles_of_user(user_id)]
+        if self._client_uuid is None:
+            self._client_uuid = admin.get_client_id(settings.KEYCLOAK_CLIENT_ID)
+        if self._client_uuid:
+            roles.extend(
+                r["name"]
+                for r in admin.get_composite_client_roles_of_user(user_id, self._client_uuid)
+            )
+        return roles
+    
+    @traced("keycloak.get_user_roles")
+    def get_user_roles(self, user_id: str) -> Optional[List[str]]:
+        """Names of the user's realm roles and KEYCLOAK_CLIENT_ID client
+        roles, composites expanded"""
         if self.keycloak_admin is None:
-            print("Warning: Keycloak admin client not available")
-            return False
+            logger.warning("Keycloak admin client not available")
+            return None
+            
+        try:
+            return _role_reads.do((self.realm, user_id), self._read_roles, user_id)
+        except KeycloakError as e:
+            logger.error("Error getting user roles from Keycloak: %s", e)
+            return None
+    
+    @traced("keycloak.get_users")
+    def get_users_page(self, first: int, max_results: int) -> Optional[List[dict]]:
+        """One page of the realm's users (full representations)"""
+        if self.keycloak_admin is None:
+            logger.warning("Keycloak admin client not available")
+            return None
+            
+        try:
+            return self.keycloak_admin.get_users(
+                {"first": first, "max": max_results, "briefRepresentation": False}
+            )
+        except KeycloakError as e:
+            logger.error("Error listing users in Keycloak: %s", e)
+            return None
+    
+    @traced("keycloak.get_admin_events")
+    def get_admin_events(self, query: dict) -> Optional[List[dict]]:
+        """Admin events matching ``query``, newest first"""
+        if self.keycloak_admin is None:
+            logger.warning("Keycloak admin client not available")
+            return None
+            
+        try:
+            return self.keycloak_admin.get_admin_events(query)
+        except KeycloakError as e:
+            logger.error("Error getting admin events from Keycloak: %s", e)
+            return None
+    
+    @traced("keycloak.update_user")
+    def update_user(self, user_id: str, **kwargs) -> Optional[bool]:
+        """Update user in Keycloak
+
+        False when Keycloak refuses the update (e.g. the user was deleted),
+        None when Keycloak cannot be reached.
+        """
+        if self.keycloak_admin is None:
+            logger.warning("Keycloak admin client not available")
+            return None
             
         try:
             self.keycloak_admin.update_user(user_id, kwargs)
             return True
         except KeycloakError as e:
-            print(f"Error updating user in Keycloak: {e}")
-            return False
+            logger.error("Error updating user in Keycloak: %s", e)
+            code = e.response_code
+            return False if code is not None and 400 <= code < 500 else None
     
+    @traced("keycloak.delete_user")
     def delete_user(self, user_id: str) -> bool:
         """Delete user from Keycloak"""
         if self.keycloak_admin is None:
-            print("Warning: Keycloak admin client not available")
+            logger.warning("Keycloak admin client not available")
             return False
             
         try:
             self.keycloak_admin.delete_user(user_id)
             return True
         except KeycloakError as e:
-            print(f"Error deleting user from Keycloak: {e}")
+            logger.error("Error deleting user from Keycloak: %s", e)
             return False
     
+    @traced("keycloak.validate_token")
     def validate_token(self, token: str) -> Optional[dict]:
         """Validate token with Keycloak"""
         if self.keycloak_openid is None:
-            print("Warning: Keycloak OpenID client not available")
+            logger.warning("Keycloak OpenID client not available")
             return None
             
         try:
-            return self.keycloak_openid.introspect(token)
+            return _introspections.do((self.realm, token), self.keycloak_openid.introspect, token)
         except KeycloakError as e:
-            print(f"Error validating token with Keycloak: {e}")
+            logger.error("Error validating token with Keycloak: %s", e)
             return None
     
+    @traced("keycloak.get_jwks")
     def get_jwks(self) -> Optional[dict]:
-        """Get JWKS from Keycloak"""
+        """Get JWKS from Keycloak, cached for KEYCLOAK_JWKS_CACHE_SECONDS"""
+        cached = self._jwks
+        if cached is not None and time.monotonic() - cached[0] < settings.KEYCLOAK_JWKS_CACHE_SECONDS:
+            return cached[1]
         if self.keycloak_openid is None:
-            print("Warning: Keycloak OpenID client not available")
+            logger.warning("Keycloak OpenID client not available")
             return None
             
         try:
-            return self.keycloak_openid.certs()
+            # A key rotation makes every verifier miss at once: fetch once
+            jwks = _jwks_fetches.do((self.realm, "certs"), self.keycloak_openid.certs)
         except KeycloakError as e:
-            print(f"Error getting JWKS from Keycloak: {e}")
+            logger.error("Error getting JWKS from Keycloak: %s", e)
             return None
+        self._jwks = (time.monotonic(), jwks)
+        return jwks
+
+
+class KeycloakClientPool:
+    """KeycloakService per realm, created on first use
+
+    At most ``max_clients`` are kept besides the default realm's; the
+    least recently used one is dropped (with its JWKS cache) to make room.
+    """
+    
+    def __init__(
+        self,
+        max_clients: int = settings.KEYCLOAK_MAX_REALM_CLIENTS,
+        default_realm: str = DEFAULT_REALM,
+    ):
+        self.max_clients = max(1, max_clients)
+        self.default = KeycloakService(default_realm)
+        self._services: "OrderedDict[str, KeycloakService]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, realm: Optional[str] = None) -> KeycloakService:
+        if realm is None or realm == self.default.realm:
+            return self.default
+        with self._lock:
+            service = self._services.get(realm)
+            if service is not None:
+                self._services.move_to_end(realm)
+                return service
+            service = self._services[realm] = KeycloakService(realm)
+            if len(self._services) > self.max_clients:
+                self._services.popitem(last=False)
+            return service
+    
+    def reset(self) -> None:
+        """Drop every realm's clients (e.g. after fork)"""
+        with self._lock:
+            services = [self.default, *self._services.values()]
+        for service in services:
+            service.reset()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"realms": [self.default.realm, *self._services], "max_clients": self.max_clients}
 
 
-keycloak_service = KeycloakService()
+keycloak_clients = KeycloakClientPool()
+# The default realm's clients
+keycloak_service = keycloak_clients.default
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def account_for(realm: str, user_id: Optional[int] = None, identifier: str = "") -> str:
+    """Lockout account of a login: the user id when the user exists,
+    otherwise the submitted identifier
+
+    The two kinds live in separate namespaces, each scoped by realm, so
+    no identifier can name another realm's account or a user's id.
+    """
+    if user_id is not None:
+        return f"id\0{realm}\0{user_id}"
+    return f"name\0{realm}\0{identifier}"
+
+
+def _account_key(account: str) -> str:
+    return hashlib.sha256(account.strip().lower().encode()).hexdigest()
+
+
+class LoginGuard:
+    """Per-account failed login counters with progressive lockout
+
+    Locked accounts are rejected before any password hashing, so attack
+    traffic against one account cannot burn CPU on bcrypt. Counters are
+    keyed by ``account_for``: the user id for existing users, so their
+    username and email share one counter, the submitted identifier
+    otherwise. They live in Redis when enabled so all workers share them,
+    otherwise in a bounded per-process table.
+
+    After ``threshold`` failures within ``window`` seconds the account is
+    locked for ``base`` seconds, doubling with every further failure up
+    to ``max_lock`` seconds.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.LOGIN_LOCKOUT_ENABLED,
+        threshold: int = settings.LOGIN_LOCKOUT_THRESHOLD,
+        window: int = settings.LOGIN_FAILURE_WINDOW_SECONDS,
+        base: int = settings.LOGIN_LOCKOUT_BASE_SECONDS,
+        max_lock: int = settings.LOGIN_LOCKOUT_MAX_SECONDS,
+        use_redis: bool = settings.LOGIN_GUARD_REDIS_ENABLED,
+        max_local_entries: int = 100000,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.window = window
+        self.base = base
+        self.max_lock = max_lock
+        self.use_redis = use_redis
+        self.max_local_entries = max_local_entries
+        # account key -> (failures, window ends at, locked until)
+        self._local: "OrderedDict[str, Tuple[int, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lock_seconds(self, failures: int) -> int:
+        if failures < self.threshold:
+            return 0
+        return min(self.max_lock, self.base * 2 ** (failures - self.threshold))
+
+    def locked_for(self, identifier: str) -> int:
+        """Seconds the account remains locked, 0 if it may attempt a login"""
+        if not self.enabled:
+            return 0
+        key = _account_key(identifier)
+        if self.use_redis:
+            try:
+                remaining_ms = redis_client.client.pttl(f"login:lock:{key}")
+                return max(0, math.ceil(remaining_ms / 1000))
+            except Exception as e:
+                logger.error("Error reading login lockout from Redis: %s", e)
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return 0
+            return max(0, math.ceil(entry[2] - time.time()))
+
+    def register_failure(self, identifier: str) -> int:
+        """Count a failed attempt; returns the resulting lock duration in seconds"""
+        if not self.enabled:
+            return 0
+        key = _account_key(identifier)
+        if self.use_redis:
+            try:
+                pipe = redis_client.client.pipeline()
+                pipe.incr(f"login:fail:{key}")
+                pipe.expire(f"login:fail:{key}", self.window, nx=True)
+                failures = pipe.execute()[0]
+                lock = self.lock_seconds(failures)
+                if lock:
+                    redis_client.client.set(f"login:lock:{key}", 1, ex=lock)
+                return lock
+            except Exception as e:
+                logger.error("Error recording login failure in Redis: %s", e)
+
+        now = time.time()
+        with self._lock:
+            failures, window_end, _ = self._local.pop(key, (0, 0.0, 0.0))
+            if window_end <= now:
+                failures, window_end = 0, now + self.window
+            failures += 1
+            lock = self.lock_seconds(failures)
+            self._local[key] = (failures, window_end, now + lock)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+        return lock
+
+    def reset(self, identifier: str) -> None:
+        """Clear counters after a successful login"""
+        if not self.enabled:
+            return
+        key = _account_key(identifier)
+        if self.use_redis:
+            try:
+                redis_client.client.delete(f"login:fail:{key}", f"login:lock:{key}")
+                return
+            except Exception as e:
+                logger.error("Error resetting login lockout in Redis: %s", e)
+        with self._lock:
+            self._local.pop(key, None)
+
+
+login_guard = LoginGuard()
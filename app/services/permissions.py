@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from app.core import security
+from app.core.config import settings
+from app.crud import crud_revocation
+from app.services.keycloak import keycloak_clients
+from app.services.revocation_feed import FeedFollower, RevocationFeed
+
+logger = logging.getLogger(__name__)
+
+# Grants every permission
+WILDCARD = "*"
+
+
+def permission_resource(permission: str) -> str:
+    """``"users:export"`` -> ``"users"``"""
+    return permission.split(":", 1)[0]
+
+
+class PermissionSet:
+    """Permissions granted by a set of roles, compiled for O(1) checks
+
+    ``"*"`` grants everything and ``"<resource>:*"`` every permission on
+    the resource. Roles map to permissions through ROLE_PERMISSIONS; a
+    role that is not listed there grants the permission named like it,
+    so Keycloak roles such as ``users:export`` can be used directly.
+    """
+
+    __slots__ = ("permissions", "resources", "everything")
+
+    def __init__(self, permissions: Iterable[str]):
+        permissions = frozenset(permissions)
+        self.everything = WILDCARD in permissions
+        self.resources: FrozenSet[str] = frozenset(
+            permission_resource(p) for p in permissions if p.endswith(":" + WILDCARD)
+        )
+        self.permissions: FrozenSet[str] = permissions
+
+    @classmethod
+    def from_roles(
+        cls, roles: Iterable[str], role_permissions: Optional[Dict[str, List[str]]] = None
+    ) -> "PermissionSet":
+        mapping = settings.ROLE_PERMISSIONS if role_permissions is None else role_permissions
+        granted: List[str] = []
+        for role in roles:
+            granted.extend(mapping.get(role, (role,)))
+        return cls(granted)
+
+    def allows(self, permission: str, resource: Optional[str] = None) -> bool:
+        if self.everything or permission in self.permissions:
+            return True
+        return (resource or permission_resource(permission)) in self.resources
+
+
+class PermissionService:
+    """Resolves and caches the permissions of authenticated users
+
+    Stateless access tokens carry their roles, so their permissions are
+    compiled once per distinct set of roles. Users loaded from the
+    database get their roles from ``is_superuser`` and, with
+    KEYCLOAK_ROLES_ENABLED, from Keycloak; the compiled set is cached per
+    user for ``ttl_seconds`` in a bounded LRU. This process drops a
+    user's entry on its own changes; changes made elsewhere (other
+    workers, Keycloak role mappings picked up by the user sync) arrive
+    through the revocation feed, followed at most every
+    ``refresh_seconds``.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = settings.PERMISSION_CACHE_TTL_SECONDS,
+        max_entries: int = settings.PERMISSION_CACHE_MAX_ENTRIES,
+        refresh_seconds: int = settings.PERMISSION_CACHE_REFRESH_SECONDS,
+        keycloak_roles: bool = settings.KEYCLOAK_ROLES_ENABLED,
+        feed: Optional[RevocationFeed] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.keycloak_roles = keycloak_roles
+        # user id -> (expires at, permissions)
+        self._users: "OrderedDict[int, Tuple[float, PermissionSet]]" = OrderedDict()
+        self._by_roles: Dict[Tuple[str, ...], PermissionSet] = {}
+        self._lock = threading.Lock()
+        self._follower = FeedFollower(self._apply_events, self._reset, refresh_seconds, feed)
+
+    def roles_for(self, user: Any) -> Optional[List[str]]:
+        """Roles of a user row: superuser plus its Keycloak roles; None
+        when the Keycloak roles cannot be read"""
+        roles = [security.ROLE_SUPERUSER] if user.is_superuser else []
+        if self.keycloak_roles and user.keycloak_id:
+            remote = keycloak_clients.get(user.realm).get_user_roles(user.keycloak_id)
+            if remote is None:
+                return None
+            roles.extend(remote)
+        return roles
+
+    def for_roles(self, roles: Sequence[str]) -> PermissionSet:
+        key = tuple(roles)
+        compiled = self._by_roles.get(key)
+        if compiled is None:
+            compiled = PermissionSet.from_roles(roles)
+            # Distinct role sets are few; replacing the dict keeps reads lock-free
+            with self._lock:
+                if len(self._by_roles) >= self.max_entries:
+                    self._by_roles = {}
+                self._by_roles[key] = compiled
+        return compiled
+
+    def for_user(self, user: Any) -> PermissionSet:
+        self._follower.sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user.id)
+            if entry is not None and entry[0] > now:
+                self._users.move_to_end(user.id)
+                return entry[1]
+
+        roles = self.roles_for(user)
+        if roles is None:
+            # Keycloak is unavailable: answer from the local roles without
+            # caching, so its roles count again once it is back
+            return self.for_roles([security.ROLE_SUPERUSER] if user.is_superuser else [])
+        compiled = self.for_roles(roles)
+        with self._lock:
+            self._users[user.id] = (now + self.ttl_seconds, compiled)
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+        return compiled
+
+    def permissions_for(self, user: Any) -> PermissionSet:
+        """Permissions of the current user (TokenUser or user row)"""
+        roles = getattr(user, "roles", None)
+        if roles is not None:
+            return self.for_roles(roles)
+        return self.for_user(user)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._by_roles = {}
+        self._follower.clear()
+
+    # Cross-worker invalidation
+
+    def _apply_events(self, events: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for event in events:
+                if event["type"] == crud_revocation.KIND_USER:
+                    self._users.pop(event["user_id"], None)
+
+    def _reset(self) -> int:
+        offset = self._follower.feed.head()
+        with self._lock:
+            self._users.clear()
+        return offset
+
+
+permission_service = PermissionService()
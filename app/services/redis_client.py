@@ -0,0 +1,36 @@
+import logging
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RedisClient:
+    """Lazily created, shared Redis connection for optional Redis-backed features"""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self) -> Optional["redis.Redis"]:
+        if self._client is None:
+            try:
+                import redis
+
+                self._client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+            except Exception as e:
+                logger.warning("Could not initialize Redis client: %s", e)
+                return None
+        return self._client
+
+    def reset(self):
+        """Drop the connection pool, e.g. in a freshly forked worker"""
+        self._client = None
+
+
+redis_client = RedisClient()
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.revocation_feed import FeedFollower, RevocationFeed
+
+logger = logging.getLogger(__name__)
+
+# How often expired JTIs are dropped from the set
+PRUNE_INTERVAL_SECONDS = 60
+
+
+class RevocationSet:
+    """Per-process snapshot of revocations for stateless access token checks
+
+    Holds the blacklisted JTIs (until their tokens expire) and, for users
+    whose older tokens are no longer valid, their current token epoch and
+    active flag. It is loaded once from the revocation feed's snapshot and
+    then follows the feed, applying each event as a delta, at most every
+    ``refresh_seconds``. The feed waits at id gaps, so a revocation that
+    commits out of order is not skipped. Revocations made by this process
+    are applied immediately; other workers pick them up on their next
+    refresh. Until the first successful load every token is treated as
+    revoked.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: int = settings.REVOCATION_SET_REFRESH_SECONDS,
+        feed: Optional[RevocationFeed] = None,
+    ):
+        self.refresh_seconds = refresh_seconds
+        # jti -> token expiry (unix time; None if unknown)
+        self._jtis: Dict[str, Optional[float]] = {}
+        # user id -> (token epoch, is active), only for users that differ
+        # from the defaults (epoch 0, active)
+        self._users: Dict[int, Tuple[int, bool]] = {}
+        self._pruned_at = time.time()
+        self._lock = threading.Lock()
+        self._follower = FeedFollower(self._apply, self._load, refresh_seconds, feed)
+
+    @property
+    def loaded(self) -> bool:
+        return self._follower.loaded
+
+    def _load(self) -> int:
+        snapshot = self._follower.feed.snapshot()
+        with self._lock:
+            self._jtis = {t["jti"]: t["exp"] for t in snapshot["tokens"]}
+            self._users = {}
+            for user in snapshot["users"]:
+                self._set_user(user["user_id"], user["token_epoch"], user["is_active"])
+        return snapshot["offset"]
+
+    def _apply(self, events: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            for event in events:
+                if event["type"] == "token":
+                    self._jtis[event["jti"]] = event["exp"]
+                else:
+                    self._set_user(event["user_id"], event["token_epoch"], event["is_active"])
+            # Expired tokens fail verification anyway; drop their entries
+            if now - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+                self._pruned_at = now
+                self._jtis = {j: exp for j, exp in self._jtis.items() if exp is None or exp > now}
+
+    def _set_user(self, user_id: int, token_epoch: Optional[int], is_active: Optional[bool]) -> None:
+        # Caller holds the lock
+        if token_epoch or is_active is False:
+            self._users[user_id] = (token_epoch or 0, is_active is not False)
+        else:
+            self._users.pop(user_id, None)
+
+    def refresh(self) -> bool:
+        """Apply revocations published since the last refresh; returns False on error"""
+        return self._follower.sync(blocking=True)
+
+    def needs_refresh(self) -> bool:
+        """Whether ``is_revoked`` would query the database first"""
+        return not self.loaded or self._follower.stale()
+
+    def is_revoked(self, payload: Dict[str, Any], refresh: bool = True) -> bool:
+        if refresh:
+            # Until there is a snapshot, wait for the first load
+            self._follower.sync(blocking=not self.loaded)
+        if not self.loaded:
+            return True
+        if payload.get("jti") in self._jtis:
+            return True
+        state = self._users.get(int(payload["sub"]))
+        if state is None:
+            return False
+        epoch, active = state
+        return not active or payload.get("epoch", 0) < epoch
+
+    def revoke_jti(self, jti: str, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def update_user(self, user_id: int, token_epoch: int, is_active: bool) -> None:
+        with self._lock:
+            self._set_user(user_id, token_epoch, bool(is_active))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jtis = {}
+            self._users = {}
+        self._follower.clear()
+
+
+revocation_set = RevocationSet()
@@ -0,0 +1,296 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_revocation, crud_user
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# How often a worker deletes events past their retention
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def event_dict(row: Row) -> Dict[str, Any]:
+    if row.kind == crud_revocation.KIND_TOKEN:
+        return {
+            "id": row.id,
+            "type": row.kind,
+            "user_id": row.user_id,
+            "jti": row.jti,
+            "token_type": row.token_type,
+            "exp": _timestamp(row.expires_at),
+        }
+    return {
+        "id": row.id,
+        "type": row.kind,
+        "user_id": row.user_id,
+        "token_epoch": row.token_epoch,
+        "is_active": row.is_active,
+    }
+
+
+class RevocationFeed:
+    """Per-process tail of the revocation_events table for streaming clients
+
+    One thread polls the table at most every ``poll_seconds`` and keeps
+    the newest ``buffer_size`` events in memory, so any number of
+    connected gateways cost one query per poll. Clients resuming from an
+    offset older than the buffer are served straight from the database.
+
+    Event ids come from a sequence and are assigned before commit, so a
+    slow transaction can commit an id below one already seen. The head
+    therefore stops at a gap in the ids until it fills or has been open
+    for ``settle_seconds`` (a rolled back transaction never fills it).
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = settings.REVOCATION_STREAM_POLL_SECONDS,
+        buffer_size: int = settings.REVOCATION_STREAM_BUFFER_SIZE,
+        settle_seconds: float = settings.REVOCATION_STREAM_SETTLE_SECONDS,
+        retention_hours: int = settings.REVOCATION_EVENT_RETENTION_HOURS,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.poll_seconds = poll_seconds
+        self.buffer_size = buffer_size
+        self.settle_seconds = settle_seconds
+        self.retention_hours = retention_hours
+        self.session_factory = session_factory
+        self._ids: List[int] = []
+        self._events: List[Dict[str, Any]] = []
+        # Offsets >= _floor are fully covered by the buffer
+        self._floor = 0
+        self._head = 0
+        self._loaded = False
+        self._gap_since: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._pruned_at = float("-inf")
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def _append(self, rows: List[Row], now: float) -> None:
+        expected = self._head + 1
+        for row in rows:
+            if row.id != expected:
+                if self._gap_since is None:
+                    self._gap_since = now
+                if now - self._gap_since < self.settle_seconds:
+                    break
+            self._gap_since = None
+            self._ids.append(row.id)
+            self._events.append(event_dict(row))
+            self._head = row.id
+            expected = row.id + 1
+        # Trim in chunks so appends stay amortized O(1)
+        if len(self._ids) > 2 * self.buffer_size:
+            cut = len(self._ids) - self.buffer_size
+            self._floor = self._ids[cut - 1]
+            del self._ids[:cut], self._events[:cut]
+
+    def poll(self) -> bool:
+        """Pull new events from the database; returns False on error"""
+        started = time.monotonic()
+        try:
+            db = self.session_factory()
+            try:
+                if not self._loaded:
+                    # Start at the current end; older events are served by catch_up
+                    head = crud_revocation.last_event_id(db)
+                    rows = []
+                else:
+                    rows = crud_revocation.get_events(db, self._head, self.buffer_size)
+                if self.retention_hours and started - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+                    self._pruned_at = started
+                    crud_revocation.prune_events(
+                        db, datetime.now(timezone.utc) - timedelta(hours=self.retention_hours)
+                    )
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error("Error polling revocation events: %s", e)
+            self._checked_at = started
+            return False
+
+        with self._lock:
+            if not self._loaded:
+                self._floor = self._head = head
+                self._loaded = True
+            else:
+                self._append(rows, started)
+            self._checked_at = started
+        return True
+
+    def _ensure_fresh(self) -> None:
+        if time.monotonic() - self._checked_at < self.poll_seconds:
+            return
+        if not self._poll_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if time.monotonic() - self._checked_at >= self.poll_seconds:
+                self.poll()
+        finally:
+            self._poll_lock.release()
+
+    def head(self) -> int:
+        """Offset of the newest published event"""
+        self._ensure_fresh()
+        return self._head
+
+    def events_after(self, offset: int, limit: int = 1000) -> Tuple[List[Dict[str, Any]], bool]:
+        """Published events after ``offset``, oldest first, and whether the
+        client must reload the snapshot because events it missed were pruned
+        """
+        self._ensure_fresh()
+        with self._lock:
+            if self._loaded and offset >= self._floor:
+                start = bisect.bisect_right(self._ids, offset)
+                return self._events[start:start + limit], False
+            head = self._head
+        return self._catch_up(offset, limit, head)
+
+    def _catch_up(self, offset: int, limit: int, head: int) -> Tuple[List[Dict[str, Any]], bool]:
+        db = self.session_factory()
+        try:
+            # Everything up to ``head`` was published; if the table no longer
+            # holds what followed ``offset``, it was pruned
+            first = crud_revocation.first_event_id(db)
+            if offset < (head if first is None else first - 1):
+                return [], True
+            rows = crud_revocation.get_events(db, offset, limit, up_to=head)
+        finally:
+            db.close()
+        return [event_dict(row) for row in rows], False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current deny-list state plus the offset to stream from afterwards"""
+        # Take the offset first: events after it may already be reflected
+        # in the snapshot, and applying them again is harmless
+        offset = self.head()
+        db = self.session_factory()
+        try:
+            tokens = crud_revocation.get_unexpired_blacklist(db, datetime.now(timezone.utc))
+            users = crud_user.get_revoked_user_states(db)
+        finally:
+            db.close()
+        return {
+            "offset": offset,
+            "tokens": [
+                {
+                    "jti": row.jti,
+                    "token_type": row.token_type,
+                    "user_id": row.user_id,
+                    "exp": _timestamp(row.expires_at),
+                }
+                for row in tokens
+            ],
+            "users": [
+                {
+                    "user_id": row.id,
+                    "token_epoch": row.token_epoch or 0,
+                    "is_active": row.is_active is not False,
+                }
+                for row in users
+            ],
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids, self._events = [], []
+            self._floor = self._head = 0
+            self._loaded = False
+            self._gap_since = None
+            self._checked_at = float("-inf")
+
+
+revocation_feed = RevocationFeed()
+
+
+class FeedFollower:
+    """Applies the revocation feed to a per-process structure
+
+    ``sync`` hands ``apply`` the events published since the previous
+    sync, at most every ``interval`` seconds and from one thread at a
+    time. The feed holds its head at id gaps until they settle, so no
+    committed event is skipped. ``reset`` rebuilds the structure from
+    scratch and returns the offset it is current to; it runs on the
+    first sync and whenever events were pruned before they were read.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[List[Dict[str, Any]]], None],
+        reset: Callable[[], int],
+        interval: float,
+        feed: Optional[RevocationFeed] = None,
+    ):
+        self.apply = apply
+        self.reset = reset
+        self.interval = interval
+        self.feed = feed or revocation_feed
+        self._offset: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._offset is not None
+
+    def stale(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.interval
+
+    def sync(self, blocking: bool = False) -> bool:
+        """Catch up with the feed if due; returns False on error"""
+        if not self.stale():
+            return True
+        # One thread syncs; the others keep using the current state
+        if not self._lock.acquire(blocking=blocking):
+            return True
+        try:
+            if self.stale():
+                return self._sync()
+            return True
+        finally:
+            self._lock.release()
+
+    def _sync(self) -> bool:
+        started = time.monotonic()
+        try:
+            if self._offset is None:
+                self._offset = self.reset()
+            while True:
+                events, pruned = self.feed.events_after(self._offset)
+                if pruned:
+                    logger.warning("Revocation events were pruned before they were read, reloading")
+                    self._offset = self.reset()
+                    continue
+                if not events:
+                    break
+                self.apply(events)
+                self._offset = events[-1]["id"]
+        except Exception as e:
+            logger.error("Error following revocation events: %s", e)
+            return False
+        finally:
+            self._checked_at = started
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._offset = None
+            self._checked_at = float("-inf")
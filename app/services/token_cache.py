@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.redis_client import redis_client
+from app.services.revocation_feed import FeedFollower, RevocationFeed
+
+logger = logging.getLogger(__name__)
+
+
+def token_fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ValidationCache:
+    """Short-lived cache of successful /auth/validate responses
+
+    Entries live in a bounded in-process LRU and, optionally, in Redis so
+    that all workers share them. No entry outlives its token's ``exp``.
+    Revocation drops the token's entry and user-level changes (password
+    change, deactivation, log out everywhere) drop every entry of the
+    user. Other workers learn of revocations from the revocation feed,
+    followed every ``sync_seconds``, and drop the user's entries then. A
+    validation that started before an invalidation of its user is not
+    cached, so a slow check cannot put back what was just dropped.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.VALIDATE_CACHE_ENABLED,
+        max_entries: int = settings.VALIDATE_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.VALIDATE_CACHE_TTL_SECONDS,
+        use_redis: bool = settings.VALIDATE_CACHE_REDIS_ENABLED,
+        local_ttl_with_redis: int = settings.VALIDATE_CACHE_LOCAL_TTL_WITH_REDIS,
+        sync_seconds: float = settings.VALIDATE_CACHE_SYNC_SECONDS,
+        feed: Optional[RevocationFeed] = None,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self.local_ttl = min(local_ttl_with_redis, ttl_seconds) if use_redis else ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        # user id -> time.monotonic() of the user's last invalidation
+        self._invalidated: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._follower = FeedFollower(self._apply_events, self._reset, sync_seconds, feed)
+
+    @property
+    def redis(self):
+        return redis_client.client
+
+    # Local tier
+
+    def _local_get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            expires_at, user_id, response = entry
+            if expires_at <= time.time():
+                self._local_pop(fingerprint)
+                return None
+            self._entries.move_to_end(fingerprint)
+            return response
+
+    def _local_set(self, fingerprint: str, expires_at: float, user_id: int, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[fingerprint] = (expires_at, user_id, response)
+            self._entries.move_to_end(fingerprint)
+            self._by_user.setdefault(user_id, set()).add(fingerprint)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._local_pop(oldest)
+
+    def _local_pop(self, fingerprint: str) -> None:
+        # Caller holds the lock
+        entry = self._entries.pop(fingerprint, None)
+        if entry is None:
+            return
+        fingerprints = self._by_user.get(entry[1])
+        if fingerprints is not None:
+            fingerprints.discard(fingerprint)
+            if not fingerprints:
+                del self._by_user[entry[1]]
+
+    # Invalidations made by other workers
+
+    def _apply_events(self, events: List[Dict[str, Any]]) -> None:
+        for user_id in {event["user_id"] for event in events}:
+            self.invalidate_user(user_id)
+
+    def _reset(self) -> int:
+        offset = self._follower.feed.head()
+        self.clear()
+        return offset
+
+    def sync(self) -> None:
+        if self.enabled:
+            self._follower.sync()
+
+    def _mark_invalidated(self, user_id: int) -> None:
+        # Caller holds the lock
+        now = time.monotonic()
+        self._invalidated[user_id] = now
+        if len(self._invalidated) > self.max_entries:
+            # No validation runs for longer than the TTL
+            cutoff = now - self.ttl_seconds
+            self._invalidated = {k: v for k, v in self._invalidated.items() if v > cutoff}
+
+    # Public API
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        self.sync()
+        fingerprint = token_fingerprint(token)
+        response = self._local_get(fingerprint)
+        if response is not None or not self.use_redis:
+            return response
+
+        try:
+            raw = self.redis.get(f"validate:{fingerprint}")
+        except Exception as e:
+            logger.error("Error reading validation cache from Redis: %s", e)
+            return None
+        if raw is None:
+            return None
+        response = json.loads(raw)
+        expires_at = min(time.time() + self.local_ttl, response.get("exp") or 0)
+        self._local_set(fingerprint, expires_at, response["user_id"], response)
+        return response
+
+    def get_local(self, token: str) -> Optional[Dict[str, Any]]:
+        """``get`` from this process's tier only; never blocks
+
+        None when the entry is missing or the revocation feed is due to
+        be followed, as entries revoked meanwhile may still be there.
+        """
+        if not self.enabled or self._follower.stale():
+            return None
+        return self._local_get(token_fingerprint(token))
+
+    def set(self, token: str, response: Dict[str, Any], started: Optional[float] = None) -> None:
+        """Cache a successful validation until min(now + TTL, token exp)
+
+        ``started`` is the ``time.monotonic()`` at which the validation
+        began; it is not cached if its user was invalidated since.
+        """
+        now = time.time()
+        exp = response.get("exp")
+        if not self.enabled or not exp or exp <= now:
+            return
+        self.sync()
+        fingerprint = token_fingerprint(token)
+        user_id = response["user_id"]
+        if started is not None and self._invalidated.get(user_id, float("-inf")) >= started:
+            return
+        self._local_set(fingerprint, min(now + self.local_ttl, exp), user_id, response)
+
+        if self.use_redis:
+            ttl_ms = int((min(now + self.ttl_seconds, exp) - now) * 1000)
+            try:
+                pipe = self.redis.pipeline()
+                pipe.set(f"validate:{fingerprint}", json.dumps(response), px=ttl_ms)
+                pipe.sadd(f"validate:user:{user_id}", fingerprint)
+                # The index must outlive every entry it points at
+                pipe.expire(f"validate:user:{user_id}", self.ttl_seconds)
+                pipe.execute()
+            except Exception as e:
+                logger.error("Error writing validation cache to Redis: %s", e)
+
+    def invalidate_token(self, token: str, user_id: Optional[int] = None) -> None:
+        fingerprint = token_fingerprint(token)
+        with self._lock:
+            self._local_pop(fingerprint)
+            if user_id is not None:
+                self._mark_invalidated(user_id)
+        if self.use_redis:
+            try:
+                self.redis.delete(f"validate:{fingerprint}")
+            except Exception as e:
+                logger.error("Error invalidating validation cache in Redis: %s", e)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for fingerprint in list(self._by_user.get(user_id, ())):
+                self._local_pop(fingerprint)
+            self._mark_invalidated(user_id)
+        if self.use_redis:
+            try:
+                key = f"validate:user:{user_id}"
+                fingerprints = self.redis.smembers(key)
+                keys = [f"validate:{fp.decode()}" for fp in fingerprints]
+                self.redis.delete(key, *keys)
+            except Exception as e:
+                logger.error("Error invalidating validation cache in Redis: %s", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+
+validation_cache = ValidationCache()
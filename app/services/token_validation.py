@@ -0,0 +1,138 @@
+"""Token validation shared by /auth/validate and the ext_authz servers."""
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.core import security
+from app.core.config import settings
+from app.core.tenancy import DEFAULT_REALM
+from app.crud import crud_session, crud_user
+from app.db.database import route_for_user
+from app.services.revocation import revocation_set
+from app.services.token_cache import validation_cache
+from app.services.vault import vault_service
+
+INVALID: Dict[str, Any] = {"valid": False}
+
+
+def claims_user(payload: dict) -> Optional[schemas.TokenUser]:
+    """User described by a stateless access token, or None if it is not one"""
+    if payload.get("type") != "access" or "active" not in payload:
+        return None
+    roles = payload.get("roles") or []
+    return schemas.TokenUser.model_construct(
+        id=int(payload["sub"]),
+        username=payload.get("username"),
+        is_active=payload["active"],
+        is_superuser=security.ROLE_SUPERUSER in roles,
+        roles=roles,
+        token_epoch=payload.get("epoch", 0),
+        # Tokens issued before realms existed belong to the default realm
+        realm=payload.get("realm") or DEFAULT_REALM,
+    )
+
+
+def _check_stateless(token: str, refresh: bool) -> Optional[Dict[str, Any]]:
+    """Response for a stateless access token, None for other tokens"""
+    if not settings.STATELESS_ACCESS_TOKENS:
+        return None
+    payload = security.decode_token(token)
+    if not payload:
+        return INVALID
+    claims = claims_user(payload)
+    if claims is None:
+        return None
+    if not claims.is_active or revocation_set.is_revoked(payload, refresh=refresh):
+        return INVALID
+    return {
+        "valid": True,
+        "user_id": claims.id,
+        "username": claims.username,
+        "realm": claims.realm,
+        "exp": payload.get("exp"),
+        "type": "access",
+    }
+
+
+def check_local(token: str) -> Optional[Dict[str, Any]]:
+    """Answer without any I/O when possible, so it is safe on the event loop
+
+    Uses this process's cached results and, for stateless tokens, its
+    revocation set as last refreshed. Returns the validation response, or
+    None when ``check_token`` is needed (Redis, a due revocation refresh
+    or the database).
+    """
+    cached = validation_cache.get_local(token)
+    if cached is not None:
+        return cached
+    if settings.STATELESS_ACCESS_TOKENS and revocation_set.needs_refresh():
+        return None
+    return _check_stateless(token, refresh=False)
+
+
+def check_token(db: Session, token: str) -> Dict[str, Any]:
+    """Validation response for ``token``, as returned by /auth/validate; blocks"""
+    result = check_local(token)
+    if result is not None:
+        return result
+    result = validation_cache.get(token)
+    if result is not None:
+        return result
+    result = _check_stateless(token, refresh=True)
+    if result is not None:
+        return result
+    return check_stateful(db, token)
+
+
+def check_stateful(db: Session, token: str) -> Dict[str, Any]:
+    """Signature, blacklist, Vault/session, user and epoch checks"""
+    started = time.monotonic()
+    payload = security.decode_token(token)
+    if not payload:
+        return INVALID
+
+    user_id = payload.get("sub")
+    jti = payload.get("jti")
+    if user_id is None:
+        return INVALID
+    route_for_user(db, int(user_id))
+
+    # Check if token is blacklisted
+    if crud_user.is_token_blacklisted(db, jti):
+        return INVALID
+
+    # Refresh tokens are current only while their family points at them;
+    # access tokens are checked in Vault
+    if payload.get("type") == "refresh":
+        if not crud_session.is_refresh_token_current(db, jti):
+            return INVALID
+    else:
+        token_data = vault_service.get_token(user_id, jti)
+        if not token_data or token_data.get("revoked"):
+            return INVALID
+
+    # Check if user exists and is active
+    user = crud_user.get_user_row_shared(db, user_id=int(user_id))
+    if not user or not user.is_active:
+        return INVALID
+
+    if not security.is_epoch_current(payload, user.token_epoch):
+        return INVALID
+
+    # Optionally validate with Keycloak
+    # keycloak_valid = keycloak_service.validate_token(token)
+
+    response = {
+        "valid": True,
+        "user_id": user.id,
+        "username": user.username,
+        "realm": user.realm,
+        "exp": payload.get("exp"),
+        # Not part of ValidationResponse; lets ext_authz refuse refresh tokens
+        "type": payload.get("type"),
+    }
+    validation_cache.set(token, response, started)
+    return response
+
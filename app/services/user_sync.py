@@ -0,0 +1,413 @@
+"""Incremental sync between Keycloak users and local ``User`` rows.
+
+Profile edits (/users/me) and deactivations only touch Postgres, while
+admins edit users in the Keycloak console, so the two drift apart. Three
+resumable passes bring them back together, each saving its position in
+``sync_checkpoints`` after every batch:
+
+- pull: Keycloak admin events (USER resources) since the last event time
+  name the users changed there. They are fetched, diffed against their
+  local rows and written with one bulk UPDATE per batch. Users deleted
+  in Keycloak are deactivated. Role mapping changes are published to the
+  revocation feed so cached permissions are dropped. Needs admin events
+  enabled for the realm.
+- push: local users with ``updated_at`` past the watermark are sent to
+  Keycloak by a small thread pool.
+- reconcile (``full=True``): pages through every Keycloak user, diffs each
+  page against the local rows in one query, and pushes the local values
+  where they differ. Use it once to repair past drift.
+
+Local edits win: pull skips users changed locally since the push
+watermark, and reconcile treats the local row as the truth. Only email,
+full name and the active flag are synced. Usernames cannot change and
+password hashes cannot be copied to Keycloak. A service syncs one realm;
+its checkpoints are named per realm.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_revocation, crud_sync, crud_user
+from app.db import models
+from app.core.tenancy import DEFAULT_REALM, scoped_key
+from app.services.keycloak import KeycloakService, keycloak_clients, split_full_name
+
+logger = logging.getLogger(__name__)
+
+PULL = "keycloak_sync.pull"
+PUSH = "keycloak_sync.push"
+RECONCILE = "keycloak_sync.reconcile"
+
+USER_EVENT_TYPES = ["USER", "REALM_ROLE_MAPPING", "CLIENT_ROLE_MAPPING"]
+ROLE_MAPPING_EVENT_TYPES = frozenset(USER_EVENT_TYPES[1:])
+
+
+@dataclass
+class SyncStats:
+    """Counters of one pass, reported after every batch"""
+    scanned: int = 0
+    updated_local: int = 0
+    updated_keycloak: int = 0
+    deactivated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "scanned": self.scanned,
+            "updated_local": self.updated_local,
+            "updated_keycloak": self.updated_keycloak,
+            "deactivated": self.deactivated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "users_per_second": round(self.scanned / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+ProgressCallback = Callable[[str, SyncStats], None]
+
+
+def _normalize_name(name: Optional[str]) -> Optional[str]:
+    return (" ".join(name.split()) or None) if name else None
+
+
+def from_keycloak(representation: Dict[str, Any]) -> Dict[str, Any]:
+    """Local field values for a Keycloak UserRepresentation"""
+    names = (representation.get("firstName"), representation.get("lastName"))
+    return {
+        "email": representation.get("email"),
+        "full_name": _normalize_name(" ".join(n for n in names if n)),
+        "is_active": bool(representation.get("enabled", True)),
+    }
+
+
+def to_keycloak(row) -> Dict[str, Any]:
+    """Keycloak update payload for a local user row"""
+    first_name, last_name = split_full_name(row.full_name)
+    return {
+        "email": row.email,
+        "firstName": first_name,
+        "lastName": last_name,
+        "enabled": bool(row.is_active),
+    }
+
+
+def diff_user(row, remote: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields whose Keycloak value differs from the local row"""
+    changes: Dict[str, Any] = {}
+    # Keycloak lowercases emails; a user without one keeps the local email
+    if remote["email"] and remote["email"].lower() != (row.email or "").lower():
+        changes["email"] = remote["email"]
+    if remote["full_name"] != _normalize_name(row.full_name):
+        changes["full_name"] = remote["full_name"]
+    if remote["is_active"] != bool(row.is_active):
+        changes["is_active"] = remote["is_active"]
+    return changes
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _chunks(items: Sequence[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class KeycloakSyncService:
+    def __init__(
+        self,
+        batch_size: int = settings.KEYCLOAK_SYNC_BATCH_SIZE,
+        workers: int = settings.KEYCLOAK_SYNC_WORKERS,
+        settle_seconds: float = settings.KEYCLOAK_SYNC_SETTLE_SECONDS,
+        realm: str = DEFAULT_REALM,
+        keycloak: Optional[KeycloakService] = None,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.settle_seconds = settle_seconds
+        self.realm = realm
+        self.keycloak = keycloak or keycloak_clients.get(realm)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="keycloak-sync"
+            )
+        return self._pool
+
+    def _checkpoint(self, name: str) -> str:
+        return scoped_key(self.realm, name)
+
+    # Keycloak side
+
+    def _update_keycloak(self, updates: List[Tuple[str, Dict[str, Any]]]) -> List[Optional[bool]]:
+        return list(self.pool.map(
+            lambda update: self.keycloak.update_user(update[0], **update[1]), updates
+        ))
+
+    def _fetch_keycloak(self, keycloak_ids: List[str]) -> List[Optional[dict]]:
+        return list(self.pool.map(self.keycloak.get_user, keycloak_ids))
+
+    def _changed_users(
+        self, since_ms: int
+    ) -> Optional[Tuple[Dict[str, Tuple[int, bool]], Set[str]]]:
+        """keycloak_id -> (latest event time, deleted) for user admin
+        events at or after ``since_ms``, and the ids whose role mappings
+        changed; None if Keycloak cannot be read"""
+        date_from = datetime.fromtimestamp(since_ms / 1000, timezone.utc).strftime("%Y-%m-%d")
+        changed: Dict[str, Tuple[int, bool]] = {}
+        role_changes: Set[str] = set()
+        first = 0
+        while True:
+            # Newest first; dateFrom has day granularity, so filter on time
+            events = self.keycloak.get_admin_events({
+                "resourceTypes": USER_EVENT_TYPES,
+                "dateFrom": date_from,
+                "first": first,
+                "max": self.batch_size,
+            })
+            if events is None:
+                return None
+            for event in events:
+                if event.get("time", 0) < since_ms:
+                    return changed, role_changes
+                parts = (event.get("resourcePath") or "").split("/")
+                if len(parts) < 2 or parts[0] != "users":
+                    continue
+                # The first event seen for a user is its latest
+                deleted = event.get("operationType") == "DELETE" and len(parts) == 2
+                changed.setdefault(parts[1], (event["time"], deleted))
+                if event.get("resourceType") in ROLE_MAPPING_EVENT_TYPES:
+                    role_changes.add(parts[1])
+            if len(events) < self.batch_size:
+                return changed, role_changes
+            first += len(events)
+
+    # Local side
+
+    def _apply_local(self, db: Session, changes: List[Dict[str, Any]], epochs: Dict[int, int]) -> int:
+        try:
+            return crud_user.apply_user_changes(db, changes, epochs)
+        except IntegrityError:
+            # e.g. an email taken by another local user: retry one by one
+            db.rollback()
+        applied = 0
+        for change in changes:
+            try:
+                applied += crud_user.apply_user_changes(db, [change], epochs)
+            except IntegrityError as e:
+                db.rollback()
+                logger.warning("Keycloak sync could not update user %s: %s", change["id"], e.orig)
+        return applied
+
+    def _push_watermark(self, db: Session) -> Optional[datetime]:
+        position = crud_sync.get_checkpoint(db, self._checkpoint(PUSH))
+        return _as_utc(datetime.fromisoformat(position["updated_at"])) if position else None
+
+    # Passes
+
+    def pull(self, db: Session, on_progress: Optional[ProgressCallback] = None) -> SyncStats:
+        """Apply users changed in Keycloak since the last pull"""
+        stats = SyncStats()
+        position = crud_sync.get_checkpoint(db, self._checkpoint(PULL))
+        if position is None:
+            # Nothing to catch up on: earlier drift is reconcile's job
+            now_ms = int(_utcnow().timestamp() * 1000)
+            crud_sync.save_checkpoint(db, self._checkpoint(PULL), {"time": now_ms})
+            return stats
+
+        result = self._changed_users(position["time"])
+        if result is None:
+            logger.warning("Keycloak sync pull: admin events unavailable")
+            return stats
+        changed, role_changes = result
+        pending_after = self._push_watermark(db)
+
+        # Oldest first: once a batch is applied, every user whose latest
+        # event is at or before its last time is in sync
+        ordered = sorted(changed.items(), key=lambda item: item[1][0])
+        for batch in _chunks(ordered, self.batch_size):
+            ids = [keycloak_id for keycloak_id, _ in batch]
+            live = [keycloak_id for keycloak_id, (_, deleted) in batch if not deleted]
+            remote = dict(zip(live, self._fetch_keycloak(live)))
+            if live and all(rep is None for rep in remote.values()):
+                logger.warning("Keycloak sync pull: cannot read users, stopping")
+                break
+
+            rows = {
+                row.keycloak_id: row
+                for row in crud_user.get_users_by_keycloak_ids(db, ids, self.realm)
+            }
+            changes: List[Dict[str, Any]] = []
+            roles_changed = []
+            for keycloak_id, (_, deleted) in batch:
+                stats.scanned += 1
+                row = rows.get(keycloak_id)
+                if row is None:
+                    stats.skipped += 1
+                    continue
+                if keycloak_id in role_changes:
+                    roles_changed.append(row)
+                if pending_after is not None and row.updated_at is not None \
+                        and _as_utc(row.updated_at) > pending_after:
+                    # Changed locally too and not pushed yet: local wins
+                    stats.skipped += 1
+                    continue
+                if deleted:
+                    diff = {"is_active": False} if row.is_active else {}
+                elif remote[keycloak_id] is None:
+                    stats.failed += 1
+                    continue
+                else:
+                    diff = diff_user(row, from_keycloak(remote[keycloak_id]))
+                if diff:
+                    if diff.get("is_active") is False:
+                        stats.deactivated += 1
+                    # Keeps updated_at, so push does not send the change back
+                    changes.append({"id": row.id, **diff, "updated_at": row.updated_at})
+
+            epochs = {row.id: row.token_epoch for row in rows.values()}
+            stats.updated_local += self._apply_local(db, changes, epochs)
+            for row in roles_changed:
+                # Workers drop their cached permissions of the user
+                # (committed with the checkpoint)
+                crud_revocation.record_user_state(db, row.id, row.token_epoch, row.is_active)
+            stats.batches += 1
+            crud_sync.save_checkpoint(db, self._checkpoint(PULL), {"time": batch[-1][1][0]})
+            if on_progress:
+                on_progress(PULL, stats)
+        return stats
+
+    def push(self, db: Session, on_progress: Optional[ProgressCallback] = None) -> SyncStats:
+        """Send users changed locally since the last push to Keycloak"""
+        stats = SyncStats()
+        position = crud_sync.get_checkpoint(db, self._checkpoint(PUSH))
+        after = None
+        if position is not None:
+            after = (_as_utc(datetime.fromisoformat(position["updated_at"])), position["id"])
+        until = _utcnow() - timedelta(seconds=self.settle_seconds)
+
+        while True:
+            rows = crud_user.get_users_changed_since(
+                db, after, until, self.batch_size, realm=self.realm
+            )
+            if not rows:
+                break
+            results = self._update_keycloak([(row.keycloak_id, to_keycloak(row)) for row in rows])
+            if any(ok is None for ok in results):
+                # Keycloak is unavailable; users it refused (e.g. deleted
+                # there) do not stop the push
+                logger.warning("Keycloak sync push: cannot reach Keycloak, stopping")
+                break
+            stats.scanned += len(rows)
+            stats.updated_keycloak += sum(results)
+            failed = [row.id for row, ok in zip(rows, results) if not ok]
+            if failed:
+                # Left for the next reconcile rather than blocking the watermark
+                stats.failed += len(failed)
+                logger.warning("Keycloak sync push failed for users %s", failed)
+
+            last = rows[-1]
+            after = (_as_utc(last.updated_at), last.id)
+            stats.batches += 1
+            crud_sync.save_checkpoint(
+                db, self._checkpoint(PUSH), {"updated_at": after[0].isoformat(), "id": after[1]}
+            )
+            if on_progress:
+                on_progress(PUSH, stats)
+        return stats
+
+    def reconcile(self, db: Session, on_progress: Optional[ProgressCallback] = None) -> SyncStats:
+        """Compare every Keycloak user with its local row and push differences"""
+        stats = SyncStats()
+        position = crud_sync.get_checkpoint(db, self._checkpoint(RECONCILE)) or {"first": 0}
+        first = position["first"]
+
+        while True:
+            page = self.keycloak.get_users_page(first, self.batch_size)
+            if page is None:
+                logger.warning("Keycloak sync reconcile: cannot list users, stopping at %d", first)
+                return stats
+
+            ids = [rep["id"] for rep in page]
+            rows = {
+                row.keycloak_id: row
+                for row in crud_user.get_users_by_keycloak_ids(db, ids, self.realm)
+            }
+            updates = []
+            for rep in page:
+                stats.scanned += 1
+                row = rows.get(rep["id"])
+                if row is None:
+                    stats.skipped += 1
+                elif diff_user(row, from_keycloak(rep)):
+                    updates.append((rep["id"], to_keycloak(row)))
+            results = self._update_keycloak(updates)
+            updated = sum(1 for ok in results if ok)
+            stats.updated_keycloak += updated
+            stats.failed += len(results) - updated
+
+            first += len(page)
+            stats.batches += 1
+            if len(page) < self.batch_size:
+                crud_sync.delete_checkpoint(db, self._checkpoint(RECONCILE))
+                if on_progress:
+                    on_progress(RECONCILE, stats)
+                return stats
+            crud_sync.save_checkpoint(db, self._checkpoint(RECONCILE), {"first": first})
+            if on_progress:
+                on_progress(RECONCILE, stats)
+
+    def run(
+        self, db: Session, full: bool = False, on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, SyncStats]:
+        """Pull, then push (then reconcile when ``full``)"""
+        results = {
+            PULL: self.pull(db, on_progress),
+            PUSH: self.push(db, on_progress),
+        }
+        if full:
+            results[RECONCILE] = self.reconcile(db, on_progress)
+        return results
+
+    def log_run(self, db: Session, results: Dict[str, SyncStats]) -> None:
+        """Record a single audit row for the whole run"""
+        failed = sum(stats.failed for stats in results.values())
+        db.add(models.AuditLog(
+            action="keycloak_sync",
+            status="success" if not failed else "partial",
+            details=f"realm={self.realm} " + " ".join(
+                f"{name.rsplit('.', 1)[-1]}:scanned={stats.scanned},"
+                f"local={stats.updated_local},keycloak={stats.updated_keycloak},"
+                f"failed={stats.failed}"
+                for name, stats in results.items()
+            ),
+        ))
+        db.commit()
+
+
+keycloak_sync_service = KeycloakSyncService()
@@ -1,18 +1,31 @@
 import hvac
 from typing import Optional, Dict, Any
 import json
+import logging
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 
 class VaultService:
     def __init__(self):
-        self.client = hvac.Client(
+        self.client = self._create_client()
+        self._token_reads = SingleFlight("vault.get_token")
+        self._ensure_mount_point()
+    
+    def _create_client(self) -> hvac.Client:
+        return hvac.Client(
             url=settings.VAULT_URL,
             token=settings.VAULT_TOKEN
         )
-        self._ensure_mount_point()
+    
+    def reconnect(self):
+        """Replace the HTTP client, e.g. in a freshly forked worker"""
+        self.client = self._create_client()
     
     def _ensure_mount_point(self):
         """Ensure the mount point exists in Vault"""
@@ -24,8 +37,9 @@ class VaultService:
                     options={'version': '2'}
                 )
         except Exception as e:
-            print(f"Error ensuring mount point: {e}")
+            logger.error("Error ensuring mount point: %s", e)
     
+    @traced("vault.store_token")
     def store_token(self, user_id: int, token_data: Dict[str, Any]) -> bool:
         """Store token data in Vault"""
         try:
@@ -42,11 +56,15 @@ class VaultService:
             )
             return True
         except Exception as e:
-            print(f"Error storing token in Vault: {e}")
+            logger.error("Error storing token in Vault: %s", e)
             return False
     
+    @traced("vault.get_token")
     def get_token(self, user_id: int, jti: str) -> Optional[Dict[str, Any]]:
-        """Retrieve token data from Vault"""
+        """Retrieve token data from Vault (shared by concurrent readers)"""
+        return self._token_reads.do((user_id, jti), self._read_token, user_id, jti)
+    
+    def _read_token(self, user_id: int, jti: str) -> Optional[Dict[str, Any]]:
         try:
             path = f"{settings.VAULT_PATH_PREFIX}/{user_id}/{jti}"
             response = self.client.secrets.kv.v2.read_secret_version(
@@ -55,9 +73,10 @@ class VaultService:
             )
             return response['data']['data']
         except Exception as e:
-            print(f"Error retrieving token from Vault: {e}")
+            logger.error("Error retrieving token from Vault: %s", e)
             return None
     
+    @traced("vault.revoke_token")
     def revoke_token(self, user_id: int, jti: str) -> bool:
         """Mark token as revoked in Vault"""
         try:
@@ -75,9 +94,10 @@ class VaultService:
                 return True
             return False
         except Exception as e:
-            print(f"Error revoking token in Vault: {e}")
+            logger.error("Error revoking token in Vault: %s", e)
             return False
     
+    @traced("vault.list_user_tokens")
     def list_user_tokens(self, user_id: int) -> list:
         """List all tokens for a user"""
         try:
@@ -88,7 +108,7 @@ class VaultService:
             )
             return response.get('data', {}).get('keys', [])
         except Exception as e:
-            print(f"Error listing tokens from Vault: {e}")
+            logger.error("Error listing tokens from Vault: %s", e)
             return []
     
     def cleanup_expired_tokens(self):
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""Measure ext_authz checks/sec at high concurrency.
+
+Compares the gRPC Authorization service (app.authz.server), the HTTP
+ext_authz endpoint (/ext_authz) and the legacy GET /auth/validate, each
+served from this process (uvicorn for HTTP) and driven by --concurrency
+in-flight requests over one connection pool.
+
+--mode stateless validates stateless access tokens against the
+revocation set; --mode cached pre-seeds the validation cache, as after
+the first check of a stateful token. Either way no request waits on
+Vault, so the numbers show transport and framework overhead. Clients
+and servers share this process (and its GIL), so compare the rows with
+each other rather than with production throughput.
+
+Usage:
+    python benchmarks/bench_ext_authz.py [--requests 20000] [--concurrency 256]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+_db_dir = tempfile.mkdtemp(prefix="bench-authz-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/bench.db")
+os.environ.setdefault("STATELESS_ACCESS_TOKENS", "true")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+for name in ("POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD", "VAULT_TOKEN"):
+    os.environ.setdefault(name, "bench")
+
+import grpc
+import httpx
+import uvicorn
+
+from app.authz.proto import ext_authz_pb2 as pb
+from app.authz.proto import ext_authz_pb2_grpc as pb_grpc
+from app.authz.server import RPC_OK, create_server
+from app.core import security
+from app.core.config import settings
+from app.main import app
+from app.services.token_cache import validation_cache
+
+HTTP_PORT = 18081
+
+
+class _User:
+    id = 1
+    username = "bench"
+    is_active = True
+    is_superuser = False
+    realm = settings.KEYCLOAK_REALM
+
+
+def make_token(mode: str) -> str:
+    token = security.create_access_token(_User.id, claims=security.user_claims(_User))
+    if mode == "cached":
+        settings.STATELESS_ACCESS_TOKENS = False
+        validation_cache.set(token, {
+            "valid": True, "user_id": _User.id, "username": _User.username,
+            "exp": security.decode_token(token)["exp"], "type": "access",
+        })
+    return token
+
+
+async def drive(call, total: int, concurrency: int) -> float:
+    remaining = total
+    failures = 0
+
+    async def worker():
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            if not await call():
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    if failures:
+        raise SystemExit(f"{failures} checks were denied; the benchmark setup is broken")
+    return total / elapsed
+
+
+async def bench_grpc(token: str, total: int, concurrency: int, workers: int) -> float:
+    server, port = create_server("127.0.0.1:0", workers=workers, max_concurrent_rpcs=concurrency * 2)
+    server.start()
+    request = pb.CheckRequest()
+    request.attributes.request.http.headers["authorization"] = f"Bearer {token}"
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = pb_grpc.AuthorizationStub(channel)
+
+            async def call():
+                return (await stub.Check(request)).status.code == RPC_OK
+
+            await drive(call, min(total, 1000), concurrency)  # warm up
+            return await drive(call, total, concurrency)
+    finally:
+        server.stop(grace=None)
+
+
+async def bench_http(url: str, params: dict, headers: dict, total: int, concurrency: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as http:
+
+        async def call():
+            response = await http.get(url, params=params, headers=headers)
+            return response.status_code == 200 and (
+                "x-user-id" in response.headers or response.json()["valid"]
+            )
+
+        await drive(call, min(total, 1000), concurrency)
+        return await drive(call, total, concurrency)
+
+
+def start_http_server() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=HTTP_PORT, log_level="warning", access_log=False
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def main_async(args) -> None:
+    token = make_token(args.mode)
+    base = f"http://127.0.0.1:{HTTP_PORT}"
+    results = {
+        "gRPC Check": await bench_grpc(token, args.requests, args.concurrency, args.grpc_workers),
+        "HTTP /ext_authz": await bench_http(
+            f"{base}/ext_authz/resource", {}, {"Authorization": f"Bearer {token}"},
+            args.requests, args.concurrency,
+        ),
+        "GET /auth/validate": await bench_http(
+            f"{base}{settings.API_V1_PREFIX}/auth/validate", {"token": token}, {},
+            args.requests, args.concurrency,
+        ),
+    }
+    print(f"{args.requests} checks, concurrency {args.concurrency}, mode {args.mode}")
+    for name, rate in results.items():
+        print(f"  {name:20s} {rate:10,.0f} checks/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--grpc-workers", type=int, default=settings.AUTHZ_GRPC_WORKERS)
+    parser.add_argument("--mode", choices=("stateless", "cached"), default="stateless")
+    args = parser.parse_args()
+
+    server = start_http_server()
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
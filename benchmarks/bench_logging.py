@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Measure what logging costs the request thread.
+
+Compares the old print() to stdout with the queue-handler setup from
+app.core.log, for records that are emitted and for records dropped by
+the per-message error rate limit (the Vault-outage case). Formatting and
+writing happen on the listener thread and are not counted.
+
+The budget is relative to building a bare LogRecord, the floor for any
+stdlib logging call on the machine running the benchmark: at most 4x
+that per emitted record and 2.5x per suppressed record.
+
+Usage:
+    python benchmarks/bench_logging.py [--iterations 50000]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+for name in ("POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD", "VAULT_TOKEN"):
+    os.environ.setdefault(name, "bench")
+
+from app.core import log
+from app.core.config import settings
+
+BUDGET_EMITTED = 4.0
+BUDGET_SUPPRESSED = 2.5
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+    logger = logging.getLogger("app.services.vault")
+    error = ConnectionError("Vault unreachable")
+
+    def old_print(i):
+        print(f"Error storing token in Vault: {error}")
+
+    def emitted(i):
+        logger.error("Error storing token in Vault: %s", error)
+
+    def suppressed(i):
+        logger.error("Error retrieving token from Vault: %s", error)
+
+    def bare_record(i):
+        logging.LogRecord(logger.name, logging.ERROR, "", 0, "Error: %s", (error,), None)
+
+    baseline = per_call_us(bare_record, args.iterations)
+    # Everything the code under test writes goes to /dev/null
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    results = {"LogRecord": baseline, "print": per_call_us(old_print, args.iterations)}
+
+    settings.LOG_ERROR_RATE_LIMIT = 0
+    log.setup_logging(fmt="json")
+    results["queue (emitted)"] = per_call_us(emitted, args.iterations)
+
+    settings.LOG_ERROR_RATE_LIMIT = 10
+    log.setup_logging(fmt="json")
+    results["queue (suppressed)"] = per_call_us(suppressed, args.iterations)
+    log.shutdown_logging()
+    sys.stdout.close()
+    sys.stdout = stdout
+
+    ok = (
+        results["queue (emitted)"] <= BUDGET_EMITTED * baseline
+        and results["queue (suppressed)"] <= BUDGET_SUPPRESSED * baseline
+    )
+    for name, us in results.items():
+        print(f"{name:<20} {us:>8.2f} us/call")
+    print(f"budget {'met' if ok else 'EXCEEDED'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Compare FastAPI's default response path with app.core.responses.render.
+
+Default path: response_model validation + jsonable_encoder + JSONResponse.
+Fast path: render() builds the schema without re-validation and writes
+JSON with its compiled pydantic-core serializer.
+
+Usage:
+    python benchmarks/bench_serialization.py [--iterations 50000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import schemas
+from app.core.responses import render
+
+CASES = {
+    "ValidationResponse": (
+        schemas.ValidationResponse,
+        {"valid": True, "user_id": 42, "username": "johndoe", "exp": 1735689600},
+    ),
+    "Token": (
+        schemas.Token,
+        {
+            "access_token": "a" * 220,
+            "refresh_token": "r" * 220,
+            "token_type": "bearer",
+            "expires_in": 1800,
+        },
+    ),
+    "User (ORM-like object)": (
+        schemas.User,
+        SimpleNamespace(
+            id=42, email="john@example.com", username="johndoe", full_name="John Doe",
+            is_active=True, created_at=datetime.now(timezone.utc), updated_at=None,
+            keycloak_id="0b6c6f3e-5a8e-4c1e-9d0e-3f0e9f3a7c11", hashed_password="x",
+        ),
+    ),
+}
+
+
+async def default_path(field, data, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        content = await serialize_response(field=field, response_content=data)
+        JSONResponse(content).body
+    return time.perf_counter() - start
+
+
+def fast_path(schema, data, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render(schema, data).body
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'schema':<24} {'default us/op':>14} {'fast us/op':>12} {'speedup':>8}")
+    for name, (schema, data) in CASES.items():
+        field = create_response_field(name="response", type_=schema, mode="serialization")
+        expected = asyncio.run(serialize_response(field=field, response_content=data))
+        assert json.loads(render(schema, data).body) == json.loads(JSONResponse(expected).body)
+
+        slow = asyncio.run(default_path(field, data, args.iterations))
+        fast = fast_path(schema, data, args.iterations)
+        per_op = 1e6 / args.iterations
+        print(f"{name:<24} {slow * per_op:>14.2f} {fast * per_op:>12.2f} {slow / fast:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Compare ORM user lookups with the Core row path used on hot reads.
+
+ORM path: db.query(User).filter(...).first() + schemas.User.model_validate.
+Row path: crud_user.get_user_row() (prebuilt select of plain columns, no
+identity map or instance state) + render().
+
+Reports time per lookup and, from a tracemalloc snapshot diff, the bytes
+and memory blocks each lookup allocates and keeps while its request is in
+flight (session, identity map, instances, row, response body), against
+in-memory SQLite.
+
+Usage:
+    python benchmarks/bench_user_lookup.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+for name in ("POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD", "VAULT_TOKEN"):
+    os.environ.setdefault(name, "bench")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import schemas
+from app.core.responses import render
+from app.crud import crud_user
+from app.db import models
+from app.db.database import Base
+
+USERS = 1000
+
+
+def orm_lookup(db, user_id: int) -> bytes:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    return schemas.User.model_validate(user).model_dump_json().encode()
+
+
+def row_lookup(db, user_id: int) -> bytes:
+    return render(schemas.User, crud_user.get_user_row(db, user_id)).body
+
+
+def measure(factory, lookup, iterations: int) -> float:
+    # A fresh session per request, like the get_db dependency
+    start = time.perf_counter()
+    for i in range(iterations):
+        with factory() as db:
+            lookup(db, i % USERS + 1)
+    return time.perf_counter() - start
+
+
+def allocations(factory, lookup, iterations: int):
+    """(bytes, blocks) allocated per lookup and still held before the
+    session closes"""
+    # Sessions stay open until the second snapshot, as if every lookup
+    # were an in-flight request, so nothing they hold is freed before
+    # it is counted
+    sessions, bodies = [], []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(iterations):
+        db = factory()
+        sessions.append(db)
+        bodies.append(lookup(db, i % USERS + 1))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    for db in sessions:
+        db.close()
+
+    diff = after.compare_to(before, "filename")
+    return (
+        sum(stat.size_diff for stat in diff) / iterations,
+        sum(stat.count_diff for stat in diff) / iterations,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    with factory() as db:
+        db.add_all(
+            models.User(
+                email=f"user{i}@example.com", username=f"user{i}",
+                full_name=f"User {i}", hashed_password="x", is_active=True,
+            )
+            for i in range(USERS)
+        )
+        db.commit()
+        assert orm_lookup(db, 7) == row_lookup(db, 7)
+
+    per_op = 1e6 / args.iterations
+    print(f"{'path':<6} {'us/op':>8} {'B/op':>8} {'blocks/op':>10}")
+    results = {}
+    for name, lookup in (("orm", orm_lookup), ("row", row_lookup)):
+        elapsed = measure(factory, lookup, args.iterations)
+        size, blocks = allocations(factory, lookup, min(args.iterations, 2000))
+        results[name] = (elapsed, size)
+        print(f"{name:<6} {elapsed * per_op:>8.2f} {size:>8.0f} {blocks:>10.1f}")
+    print(f"orm/row: {results['orm'][0] / results['row'][0]:.1f}x time, "
+          f"{results['orm'][1] / results['row'][1]:.2f}x memory per lookup")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
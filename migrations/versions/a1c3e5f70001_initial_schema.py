@@ -0,0 +1,84 @@
+"""Initial schema - users, tokens, and audit tables
+
+Revision ID: a1c3e5f70001
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a1c3e5f70001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app calls Base.metadata.create_all() on startup, so tables may
+    # already exist when migrations are first run against a database.
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("is_superuser", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("keycloak_id", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_keycloak_id", "users", ["keycloak_id"], unique=True)
+
+    if not inspector.has_table("token_blacklist"):
+        op.create_table(
+            "token_blacklist",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("jti", sa.String(), nullable=False),
+            sa.Column("token_type", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("revoked_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("reason", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_token_blacklist_id", "token_blacklist", ["id"])
+        op.create_index("ix_token_blacklist_jti", "token_blacklist", ["jti"], unique=True)
+
+    if not inspector.has_table("audit_logs"):
+        op.create_table(
+            "audit_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("action", sa.String(), nullable=False),
+            sa.Column("ip_address", sa.String(), nullable=True),
+            sa.Column("user_agent", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("details", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_audit_logs_id", "audit_logs", ["id"])
+        op.create_index("ix_audit_logs_created_at_id", "audit_logs", ["created_at", "id"])
+        op.create_index("ix_audit_logs_user_id_created_at_id", "audit_logs", ["user_id", "created_at", "id"])
+        op.create_index("ix_audit_logs_action_created_at_id", "audit_logs", ["action", "created_at", "id"])
+        op.create_index("ix_audit_logs_status_created_at_id", "audit_logs", ["status", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("audit_logs")
+    op.drop_table("token_blacklist")
+    op.drop_table("users")
@@ -0,0 +1,129 @@
+"""Partition audit_logs by month on created_at
+
+Revision ID: b2d4f6a80002
+Revises: a1c3e5f70001
+Create Date: 2026-10-19 09:30:00.000000
+
+Rebuilds audit_logs as a RANGE-partitioned table with one partition per
+month plus a default partition, copies existing rows across, and keeps the
+id sequence so ids continue where they left off. PostgreSQL only; other
+dialects are left untouched.
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.db import partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b2d4f6a80002"
+down_revision: Union[str, None] = "a1c3e5f70001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_audit_logs_created_at_id": "created_at, id",
+    "ix_audit_logs_user_id_created_at_id": "user_id, created_at, id",
+    "ix_audit_logs_action_created_at_id": "action, created_at, id",
+    "ix_audit_logs_status_created_at_id": "status, created_at, id",
+}
+
+COLUMNS = "id, user_id, action, ip_address, user_agent, status, details, created_at"
+
+
+def _release_legacy_table() -> None:
+    """Rename the plain table out of the way and free its index and sequence names"""
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    op.execute("ALTER TABLE audit_logs_legacy DROP CONSTRAINT IF EXISTS audit_logs_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_audit_logs_id")
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE audit_logs_legacy ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE IF EXISTS audit_logs_id_seq OWNED BY NONE")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or partitions.is_partitioned(bind):
+        return
+
+    _release_legacy_table()
+
+    op.execute("CREATE SEQUENCE IF NOT EXISTS audit_logs_id_seq")
+    op.execute(
+        """
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            user_id INTEGER,
+            action VARCHAR NOT NULL,
+            ip_address VARCHAR,
+            user_agent VARCHAR,
+            status VARCHAR NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id")
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON audit_logs ({columns})")
+
+    # Rows outside every monthly range land here instead of failing inserts
+    op.execute(f"CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT")
+
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM audit_logs_legacy")).scalar()
+    partitions.ensure_partitions(
+        bind,
+        months_ahead=settings.AUDIT_PARTITION_PREMAKE_MONTHS,
+        start=oldest.date() if oldest else date.today(),
+    )
+
+    op.execute(
+        f"INSERT INTO audit_logs ({COLUMNS}) "
+        f"SELECT id, user_id, action, ip_address, user_agent, status, details, "
+        f"coalesce(created_at, now()) FROM audit_logs_legacy"
+    )
+    op.execute(
+        "SELECT setval('audit_logs_id_seq', coalesce((SELECT max(id) FROM audit_logs), 0) + 1, false)"
+    )
+    op.execute("DROP TABLE audit_logs_legacy")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not partitions.is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("ALTER TABLE audit_logs_partitioned DROP CONSTRAINT IF EXISTS audit_logs_pkey")
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE audit_logs_partitioned ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE audit_logs_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq') PRIMARY KEY,
+            user_id INTEGER,
+            action VARCHAR NOT NULL,
+            ip_address VARCHAR,
+            user_agent VARCHAR,
+            status VARCHAR NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id")
+    op.execute("CREATE INDEX ix_audit_logs_id ON audit_logs (id)")
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON audit_logs ({columns})")
+
+    op.execute(f"INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_partitioned")
+    op.execute("DROP TABLE audit_logs_partitioned")
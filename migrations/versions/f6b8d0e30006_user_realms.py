@@ -0,0 +1,46 @@
+"""Add users.realm and scope user indexes by realm
+
+Revision ID: f6b8d0e30006
+Revises: e5a7c9d20005
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6b8d0e30006"
+down_revision: Union[str, None] = "e5a7c9d20005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing users belong to the realm this deployment was serving
+    op.add_column(
+        "users",
+        sa.Column("realm", sa.String(), nullable=False, server_default=settings.KEYCLOAK_REALM),
+    )
+    op.alter_column("users", "realm", server_default=None)
+
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_updated_at", table_name="users")
+    op.create_index("ix_users_realm_email", "users", ["realm", "email"], unique=True)
+    op.create_index("ix_users_realm_username", "users", ["realm", "username"], unique=True)
+    op.create_index("ix_users_realm_updated_at", "users", ["realm", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_realm_updated_at", table_name="users")
+    op.drop_index("ix_users_realm_username", table_name="users")
+    op.drop_index("ix_users_realm_email", table_name="users")
+    op.create_index("ix_users_updated_at", "users", ["updated_at"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.drop_column("users", "realm")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Maintain monthly audit_logs partitions.
+
+Creates partitions AUDIT_PARTITION_PREMAKE_MONTHS ahead and retires
+partitions older than AUDIT_RETENTION_MONTHS. Run daily (see the
+audit-partitions CronJob in k8s/deployment.yaml).
+
+Usage:
+    python scripts/audit_partitions.py
+    python scripts/audit_partitions.py --retention-months 6 --detach-only
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.core.config import settings
+from app.db.database import engine
+from app.db import partitions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Maintain audit_logs partitions")
+    parser.add_argument("--months-ahead", type=int, default=settings.AUDIT_PARTITION_PREMAKE_MONTHS)
+    parser.add_argument("--retention-months", type=int, default=settings.AUDIT_RETENTION_MONTHS,
+                        help="0 keeps all partitions")
+    parser.add_argument("--detach-only", action="store_true",
+                        help="Detach expired partitions but keep them as standalone tables")
+    args = parser.parse_args()
+
+    result = partitions.maintain_partitions(
+        engine,
+        months_ahead=args.months_ahead,
+        retention_months=args.retention_months,
+        drop=not args.detach_only,
+    )
+    for name in result["created"]:
+        print(f"created {name}")
+    for name in result["retired"]:
+        print(f"{'detached' if args.detach_only else 'dropped'} {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Bulk import or export users.
+
+Usage:
+    python scripts/bulk_users.py import users.ndjson
+    python scripts/bulk_users.py import users.csv --format csv --no-keycloak
+    python scripts/bulk_users.py export --format csv > users.csv
+    python scripts/bulk_users.py --realm ashid-sales-at import users.ndjson
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.core.tenancy import DEFAULT_REALM, REALMS
+from app.db.database import SessionLocal
+from app.services.bulk_users import FORMAT_NDJSON, FORMATS, BulkUserService
+
+
+def report_progress(progress) -> None:
+    print(
+        f"batch {progress.batches}: total={progress.total} created={progress.created} "
+        f"skipped={progress.skipped} failed={progress.failed}",
+        file=sys.stderr,
+    )
+
+
+def run_import(args, service: BulkUserService) -> int:
+    db = SessionLocal()
+    try:
+        with open(args.file, newline="", encoding="utf-8") as f:
+            progress = service.import_lines(
+                db,
+                f,
+                fmt=args.format,
+                provision_keycloak=not args.no_keycloak,
+                on_progress=report_progress,
+                realm=args.realm or DEFAULT_REALM,
+            )
+        service.log_import(db, progress)
+    finally:
+        db.close()
+
+    for error in progress.errors:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+def run_export(args, service: BulkUserService) -> int:
+    db = SessionLocal()
+    try:
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        try:
+            for line in service.export_lines(db, fmt=args.format, realm=args.realm):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    finally:
+        db.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import or export users")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--hash-workers", type=int, default=None)
+    parser.add_argument("--realm", choices=REALMS, default=None,
+                        help="Realm to import into (default realm) or export (all realms)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import users from a file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=FORMATS, default=FORMAT_NDJSON)
+    import_parser.add_argument("--no-keycloak", action="store_true",
+                               help="Skip Keycloak provisioning")
+
+    export_parser = subparsers.add_parser("export", help="Export users to stdout or a file")
+    export_parser.add_argument("--format", choices=FORMATS, default=FORMAT_NDJSON)
+    export_parser.add_argument("--output", "-o", default=None)
+
+    args = parser.parse_args()
+
+    kwargs = {}
+    if args.batch_size:
+        kwargs["batch_size"] = args.batch_size
+    if args.hash_workers:
+        kwargs["hash_workers"] = args.hash_workers
+    service = BulkUserService(**kwargs)
+
+    if args.command == "import":
+        return run_import(args, service)
+    return run_export(args, service)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,12 @@
 #!/bin/bash
 
-# Generate initial database migration
+# Generate a new database migration from model changes
 set -e
 
-echo "Generating initial migration..."
-alembic revision --autogenerate -m "Initial migration - users, tokens, and audit tables"
+MESSAGE=${1:-"Schema update"}
+
+echo "Generating migration: $MESSAGE"
+alembic revision --autogenerate -m "$MESSAGE"
 
 echo "Migration generated!"
 echo "Review the generated migration file in migrations/versions/"
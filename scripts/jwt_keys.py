@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Manage the JWT signing keyring (JWT_KEYRING_PATH).
+
+`rotate` adds a new key that starts signing after --activate-in seconds.
+Until then it is only published in /.well-known/jwks.json, so consumers
+caching the JWKS already know it when the first token signed with it
+arrives; keep the delay above JWKS_MAX_AGE_SECONDS plus the
+stale-while-revalidate window. `prune` deletes keys whose overlap window
+(JWT_KEY_OVERLAP_SECONDS after their successor activated) has ended.
+
+Usage:
+    python scripts/jwt_keys.py list
+    python scripts/jwt_keys.py rotate --alg ES256
+    python scripts/jwt_keys.py rotate --activate-in 0   # first key
+    python scripts/jwt_keys.py prune
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.core.config import settings
+from app.core import keys
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Manage the JWT signing keyring")
+    parser.add_argument("--path", default=settings.JWT_KEYRING_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rotate = sub.add_parser("rotate", help="Add a new signing key")
+    # argparse does not check defaults against choices; HS256 (the
+    # ALGORITHM default) has no key to generate
+    default_alg = (
+        settings.ALGORITHM if settings.ALGORITHM in keys.ASYMMETRIC_ALGORITHMS else "RS256"
+    )
+    rotate.add_argument("--alg", default=default_alg, choices=keys.ASYMMETRIC_ALGORITHMS)
+    rotate.add_argument("--activate-in", type=int, default=2 * settings.JWKS_MAX_AGE_SECONDS,
+                        help="Seconds until the key starts signing")
+    sub.add_parser("prune", help="Remove keys past their overlap window")
+    sub.add_parser("list", help="Show keys and their state")
+    args = parser.parse_args()
+
+    if args.command == "rotate":
+        activate_at = datetime.now(timezone.utc) + timedelta(seconds=args.activate_in)
+        kid = keys.add_key(args.path, args.alg, activate_at)
+        print(f"added {kid} ({args.alg}), signing from {activate_at.isoformat()}")
+    elif args.command == "prune":
+        for kid in keys.prune_keys(args.path, settings.JWT_KEY_OVERLAP_SECONDS):
+            print(f"removed {kid}")
+    else:
+        keyring = keys.KeyRing(args.path, reload_interval=0)
+        published = {k.kid for k in keyring.published_keys()}
+        now = datetime.now(timezone.utc).timestamp()
+        active = [k for k in keyring.keys() if k.activate_at <= now]
+        signing = active[-1].kid if active else None
+        for key in keyring.keys():
+            if key.kid == signing:
+                state = "signing"
+            elif key.kid in published:
+                state = "pending" if key.activate_at > now else "overlap"
+            else:
+                state = "retired"
+            activate_at = datetime.fromtimestamp(key.activate_at, timezone.utc).isoformat()
+            print(f"{key.kid}  {key.alg}  {activate_at}  {state}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
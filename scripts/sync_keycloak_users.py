@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""Sync users between Keycloak and the local database.
+
+Usage:
+    python scripts/sync_keycloak_users.py            # pull, then push
+    python scripts/sync_keycloak_users.py --full     # also reconcile every user
+    python scripts/sync_keycloak_users.py --only pull --realm ashid-sales-at
+
+Each pass resumes from its checkpoint, so the job can run from cron and
+be interrupted at any time.
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.core.tenancy import REALMS
+from app.db.database import SessionLocal
+from app.services.user_sync import PULL, PUSH, RECONCILE, KeycloakSyncService
+
+PASSES = {"pull": PULL, "push": PUSH, "reconcile": RECONCILE}
+
+
+def report_progress(name, stats) -> None:
+    data = stats.as_dict()
+    print(
+        f"{name} batch {data['batches']}: scanned={data['scanned']} "
+        f"local={data['updated_local']} keycloak={data['updated_keycloak']} "
+        f"failed={data['failed']} ({data['users_per_second']} users/s)",
+        file=sys.stderr,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sync users between Keycloak and the database")
+    parser.add_argument("--only", nargs="+", choices=list(PASSES), default=None,
+                        help="Run just these passes (default: pull, push)")
+    parser.add_argument("--full", action="store_true", help="Also reconcile every Keycloak user")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--realm", choices=REALMS, default=None,
+                        help="Sync only this realm (default: every served realm)")
+    args = parser.parse_args()
+
+    kwargs = {}
+    if args.batch_size:
+        kwargs["batch_size"] = args.batch_size
+    if args.workers:
+        kwargs["workers"] = args.workers
+
+    report = {}
+    failed = False
+    db = SessionLocal()
+    try:
+        for realm in [args.realm] if args.realm else REALMS:
+            service = KeycloakSyncService(realm=realm, **kwargs)
+            if args.only:
+                results = {
+                    PASSES[name]: getattr(service, name)(db, on_progress=report_progress)
+                    for name in args.only
+                }
+            else:
+                results = service.run(db, full=args.full, on_progress=report_progress)
+            service.log_run(db, results)
+            report[realm] = {name: stats.as_dict() for name, stats in results.items()}
+            failed = failed or any(stats.failed for stats in results.values())
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import asyncio
+
+from app.core.admission import (
+    CRITICAL,
+    EXEMPT,
+    LOW,
+    NORMAL,
+    AdmissionController,
+    AdmissionMiddleware,
+)
+
+
+def _controller(clock, **kwargs):
+    options = dict(
+        enabled=True, initial_limit=10, min_limit=2, max_limit=100,
+        window_seconds=1.0, tolerance=2.0, decrease=0.5,
+        normal_share=0.8, low_share=0.5,
+        critical_paths=("/api/v1/auth/validate",),
+        low_paths=("/api/v1/auth/token",),
+        exempt_paths=("/api/v1/revocations/events",),
+        clock=clock,
+    )
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_classify_by_prefix(clock):
+    controller = _controller(clock)
+    assert controller.classify("/api/v1/auth/validate") == CRITICAL
+    assert controller.classify("/api/v1/auth/token") == LOW
+    assert controller.classify("/api/v1/users/me") == NORMAL
+    assert controller.classify("/api/v1/revocations/events") == EXEMPT
+
+
+def test_low_priority_is_shed_first(clock):
+    controller = _controller(clock)
+    admitted = {cls: 0 for cls in (LOW, NORMAL, CRITICAL)}
+    for cls in (LOW, NORMAL, CRITICAL):
+        while controller.try_acquire(cls):
+            admitted[cls] += 1
+    # 50% of 10 for low, up to 80% for normal, the rest for critical
+    assert admitted == {LOW: 5, NORMAL: 3, CRITICAL: 2}
+    assert controller.shed == {LOW: 1, NORMAL: 1, CRITICAL: 1}
+
+
+def _window(controller, cls, latency, samples=10):
+    for _ in range(samples):
+        assert controller.try_acquire(cls)
+    for _ in range(samples - 1):
+        controller.release(cls, latency)
+    # The last completion closes the window
+    controller.clock.now += 1.0
+    controller.release(cls, latency)
+
+
+def test_limit_shrinks_when_latency_inflates_and_recovers(clock):
+    controller = _controller(clock, initial_limit=40, max_limit=40)
+    _window(controller, CRITICAL, 0.010)
+    assert controller.limit == 40
+
+    # Latency triples against the baseline: multiplicative decrease
+    _window(controller, CRITICAL, 0.030)
+    assert controller.limit == 20
+    _window(controller, CRITICAL, 0.030)
+    assert controller.limit == 10
+
+    # Back to normal with the limit saturated: additive increase
+    _window(controller, CRITICAL, 0.010)
+    assert controller.limit > 10
+
+
+def test_middleware_returns_503_with_retry_after(clock):
+    controller = _controller(clock, initial_limit=2, min_limit=2)
+    controller.in_flight = 1  # one request already running
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def request(path):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await AdmissionMiddleware(app, controller)({"type": "http", "path": path}, None, send)
+        return messages[0]
+
+    shed = asyncio.run(request("/api/v1/auth/token"))
+    assert shed["status"] == 503
+    assert (b"retry-after", b"1") in shed["headers"]
+
+    assert asyncio.run(request("/api/v1/auth/validate"))["status"] == 200
+    assert asyncio.run(request("/api/v1/revocations/events"))["status"] == 200
+    assert calls == ["/api/v1/auth/validate", "/api/v1/revocations/events"]
+    assert controller.in_flight == 1
@@ -99,3 +99,56 @@ def test_get_current_user(test_user):
     data = response.json()
     assert data["email"] == test_user["email"]
     assert data["username"] == test_user["username"]
+
+
+def test_logout_all_revokes_outstanding_tokens(test_user):
+    client.post(f"{settings.API_V1_PREFIX}/auth/register", json=test_user)
+    login_response = client.post(
+        f"{settings.API_V1_PREFIX}/auth/token",
+        data={
+            "username": test_user["username"],
+            "password": test_user["password"]
+        }
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    sessions = client.get(f"{settings.API_V1_PREFIX}/users/me/sessions", headers=headers)
+    assert sessions.status_code == 200
+    assert len(sessions.json()) >= 1
+    
+    response = client.post(f"{settings.API_V1_PREFIX}/users/me/logout-all", headers=headers)
+    assert response.status_code == 200
+    
+    response = client.get(f"{settings.API_V1_PREFIX}/users/me", headers=headers)
+    assert response.status_code == 401
+
+
+def test_refresh_rotates_and_reuse_revokes_the_family(test_user):
+    client.post(f"{settings.API_V1_PREFIX}/auth/register", json=test_user)
+    login_response = client.post(
+        f"{settings.API_V1_PREFIX}/auth/token",
+        data={
+            "username": test_user["username"],
+            "password": test_user["password"]
+        }
+    )
+    first_refresh = login_response.json()["refresh_token"]
+    
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/auth/refresh", params={"refresh_token": first_refresh}
+    )
+    assert response.status_code == 200
+    second_refresh = response.json()["refresh_token"]
+    
+    # Replaying the superseded token revokes the whole family...
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/auth/refresh", params={"refresh_token": first_refresh}
+    )
+    assert response.status_code == 401
+    
+    # ...so the token issued by the rotation is dead as well
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/auth/refresh", params={"refresh_token": second_refresh}
+    )
+    assert response.status_code == 401
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import uuid
+
+from app.crud import crud_user
+from app.services import bulk_users
+from app.services.bulk_users import FORMAT_CSV, BulkUserService, LineBatcher, aiter_lines
+from tests.test_api import TestingSessionLocal
+
+
+class _FakeKeycloak:
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.users = {}
+
+    def create_user(self, email, username, password, full_name=None):
+        if username in self.refuse:
+            return None
+        self.users[f"kc-{username}"] = username
+        return f"kc-{username}"
+
+    def delete_user(self, user_id):
+        return self.users.pop(user_id, None) is not None
+
+
+def test_csv_batches_keep_header_and_line_numbers():
+    batcher = LineBatcher(FORMAT_CSV, batch_size=2)
+    lines = [
+        "email,username,password",
+        "a@example.com,a,Passw0rd!",
+        "b@example.com,b,Passw0rd!",
+        "c@example.com,c,Passw0rd!",
+    ]
+    batches = [records for records in map(batcher.feed, lines) if records]
+    batches.append(batcher.flush())
+
+    assert [[line for line, _ in batch] for batch in batches] == [[2, 3], [4]]
+    assert batches[1][0][1]["username"] == "c"
+
+
+def test_csv_export_round_trips_quoted_newlines():
+    service = BulkUserService(batch_size=1, hash_workers=2)
+    realm = f"csv-{uuid.uuid4().hex[:8]}"
+    full_name = 'Ada\r\nLovelace, "Countess"'
+    lines = [
+        "email,username,password,full_name\r\n",
+        'ada@example.com,ada,Bulk1234!,"Ada\r\n',
+        'Lovelace, ""Countess"""\r\n',
+        "bob@example.com,bob,Bulk1234!,Bob\r\n",
+    ]
+
+    db = TestingSessionLocal()
+    try:
+        progress = service.import_lines(
+            db, lines, fmt=FORMAT_CSV, provision_keycloak=False, realm=realm
+        )
+        exported = "".join(service.export_lines(db, fmt=FORMAT_CSV, realm=realm)).encode()
+    finally:
+        db.close()
+    assert progress.created == 2 and progress.failed == 0
+
+    async def parse():
+        async def chunks():
+            # Chunk boundaries fall inside the quoted field
+            for i in range(0, len(exported), 7):
+                yield exported[i:i + 7]
+
+        batcher = LineBatcher(FORMAT_CSV, batch_size=1)
+        records = []
+        async for line in aiter_lines(chunks()):
+            records += batcher.feed(line) or []
+        return records + batcher.flush()
+
+    records = asyncio.run(parse())
+    assert [line for line, _ in records] == [2, 4]
+    assert [record["full_name"] for _, record in records] == [full_name, "Bob"]
+
+
+def test_import_lines_skips_duplicates_and_reports_errors():
+    service = BulkUserService(batch_size=2, hash_workers=2)
+    records = [
+        {"email": "bulk1@example.com", "username": "bulk1", "password": "Bulk1234!"},
+        {"email": "bulk2@example.com", "username": "bulk2", "password": "Bulk1234!"},
+        {"email": "bulk1@example.com", "username": "bulk1", "password": "Bulk1234!"},
+        {"email": "bulk3@example.com", "username": "bulk3", "password": "weak"},
+    ]
+    lines = [json.dumps(record) for record in records] + ["not json"]
+
+    db = TestingSessionLocal()
+    try:
+        progress = service.import_lines(db, lines, provision_keycloak=False)
+        exported = [json.loads(line) for line in service.export_lines(db)]
+    finally:
+        db.close()
+
+    assert progress.total == 5
+    assert progress.skipped + progress.created == 3
+    assert progress.failed == 2
+    assert {error["line"] for error in progress.errors} == {4, 5}
+    assert {"bulk1", "bulk2"} <= {user["username"] for user in exported}
+    assert all("hashed_password" not in user for user in exported)
+
+
+def test_keycloak_failures_are_reported_and_failed_inserts_deprovisioned(monkeypatch):
+    keycloak = _FakeKeycloak()
+    monkeypatch.setattr(bulk_users.keycloak_clients, "get", lambda realm=None: keycloak)
+    service = BulkUserService(batch_size=3, hash_workers=2)
+    run = uuid.uuid4().hex[:8]
+    names = [f"kc{i}-{run}" for i in range(3)]
+    keycloak.refuse = {names[1]}
+    lines = [
+        json.dumps({"email": f"{name}@example.com", "username": name, "password": "Bulk1234!"})
+        for name in names
+    ]
+
+    db = TestingSessionLocal()
+    try:
+        progress = service.import_lines(db, lines)
+        created = {user["username"] for user in map(json.loads, service.export_lines(db))}
+    finally:
+        db.close()
+    assert progress.created == 2
+    assert progress.errors == [{"line": 2, "error": "Keycloak provisioning failed"}]
+    assert names[1] not in created and {names[0], names[2]} <= created
+
+    def broken_insert(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(crud_user, "create_users_bulk", broken_insert)
+    keycloak.users.clear()
+    keycloak.refuse = set()
+    db = TestingSessionLocal()
+    try:
+        progress = service.import_lines(db, [lines[1]])
+    finally:
+        db.close()
+    assert progress.failed == 1 and progress.created == 0
+    assert keycloak.users == {}
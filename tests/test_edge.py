@@ -0,0 +1,85 @@
+import asyncio
+
+from app.core.edge import EdgeMiddleware
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": scope.get("rate_limit_key", "").encode()})
+
+
+def _request(middleware, path="/api/v1/users/me", method="GET", headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "client": ("10.0.0.7", 51000),
+    }
+    asyncio.run(middleware(scope, None, send))
+    start, body = messages
+    return start["status"], dict(start["headers"]), body["body"]
+
+
+def _edge(**kwargs):
+    options = dict(
+        allowed_hosts=["auth.example.com", "*.internal.example.com"],
+        allowed_origins=["https://app.example.com/"],
+        bypass_paths=("/api/v1/auth/validate",),
+    )
+    options.update(kwargs)
+    return EdgeMiddleware(_endpoint, **options)
+
+
+def test_host_check():
+    edge = _edge()
+    assert _request(edge, headers=[("host", "auth.example.com:8000")])[0] == 200
+    assert _request(edge, headers=[("host", "svc.internal.example.com")])[0] == 200
+    assert _request(edge, headers=[("host", "evil.example.org")])[0] == 400
+    assert _request(edge)[0] == 400
+    assert _request(_edge(allowed_hosts=["*"]), headers=[("host", "anything")])[0] == 200
+
+
+def test_bypass_paths_skip_checks():
+    status, _, _ = _request(_edge(), path="/api/v1/auth/validate", headers=[("host", "evil")])
+    assert status == 200
+
+
+def test_rate_limit_key_is_the_client_address():
+    _, _, body = _request(_edge(), headers=[("host", "auth.example.com")])
+    assert body == b"10.0.0.7"
+
+
+def test_cors_simple_request():
+    edge = _edge()
+    host = ("host", "auth.example.com")
+    _, headers, _ = _request(edge, headers=[host, ("origin", "https://app.example.com")])
+    assert headers[b"access-control-allow-origin"] == b"https://app.example.com"
+    assert headers[b"access-control-allow-credentials"] == b"true"
+
+    _, headers, _ = _request(edge, headers=[host, ("origin", "https://evil.example.org")])
+    assert b"access-control-allow-origin" not in headers
+
+
+def test_cors_preflight():
+    edge = _edge()
+    preflight = [
+        ("host", "auth.example.com"),
+        ("origin", "https://app.example.com"),
+        ("access-control-request-method", "POST"),
+        ("access-control-request-headers", "authorization, content-type"),
+    ]
+    status, headers, _ = _request(edge, method="OPTIONS", headers=preflight)
+    assert status == 200
+    assert headers[b"access-control-allow-origin"] == b"https://app.example.com"
+    assert headers[b"access-control-allow-headers"] == b"authorization, content-type"
+
+    preflight[1] = ("origin", "https://evil.example.org")
+    status, headers, _ = _request(edge, method="OPTIONS", headers=preflight)
+    assert status == 400
+    assert b"access-control-allow-origin" not in headers
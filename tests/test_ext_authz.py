@@ -0,0 +1,150 @@
+import time
+
+import grpc
+import pytest
+from fastapi.testclient import TestClient
+
+from app.authz import checks
+from app.authz.proto import ext_authz_pb2 as pb
+from app.authz.proto import ext_authz_pb2_grpc as pb_grpc
+from app.authz.server import RPC_OK, RPC_UNAUTHENTICATED, create_server
+from app.core import security
+from app.core.config import settings
+from app.main import app
+from app.services import token_validation
+from app.services.revocation import RevocationSet
+from app.services.revocation_feed import RevocationFeed
+from app.services.token_cache import validation_cache
+
+client = TestClient(app)
+
+
+class _User:
+    id = 7
+    username = "envoy-user"
+    is_active = True
+    is_superuser = False
+    realm = "ashid-sales-de"
+
+
+@pytest.fixture(autouse=True)
+def _isolated(session_factory, monkeypatch):
+    monkeypatch.setattr(checks, "ReadSessionLocal", session_factory)
+    feed = RevocationFeed(session_factory=session_factory)
+    monkeypatch.setattr(token_validation, "revocation_set", RevocationSet(feed=feed))
+    validation_cache.clear()
+    yield
+    validation_cache.clear()
+
+
+@pytest.fixture
+def stateless(monkeypatch):
+    monkeypatch.setattr(settings, "STATELESS_ACCESS_TOKENS", True)
+    return security.create_access_token(_User.id, claims=security.user_claims(_User))
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server, port = create_server("127.0.0.1:0", workers=4)
+    server.start()
+    channel = grpc.insecure_channel(f"127.0.0.1:{port}")
+    yield pb_grpc.AuthorizationStub(channel)
+    channel.close()
+    server.stop(grace=None)
+
+
+def _check(stub, authorization=None):
+    request = pb.CheckRequest()
+    if authorization is not None:
+        request.attributes.request.http.headers["authorization"] = authorization
+    return stub.Check(request, timeout=5)
+
+
+def _headers(response):
+    return {h.header.key: h.header.value for h in response.ok_response.headers}
+
+
+def _cached(token, token_type):
+    validation_cache.set(token, {
+        "valid": True, "user_id": 9, "username": "cached",
+        "exp": int(time.time()) + 300, "type": token_type,
+    })
+
+
+def test_bearer_token_parsing():
+    assert checks.bearer_token("Bearer abc") == "abc"
+    assert checks.bearer_token("bearer  abc ") == "abc"
+    assert checks.bearer_token("Basic abc") is None
+    assert checks.bearer_token("Bearer ") is None
+    assert checks.bearer_token(None) is None
+
+
+def test_grpc_allows_stateless_token_with_identity_headers(stub, stateless):
+    response = _check(stub, f"Bearer {stateless}")
+    assert response.status.code == RPC_OK
+    assert response.WhichOneof("http_response") == "ok_response"
+    assert _headers(response) == {
+        "x-user-id": "7", "x-username": "envoy-user", "x-user-realm": "ashid-sales-de",
+    }
+
+
+def test_grpc_denies_missing_and_invalid_tokens(stub):
+    for authorization in (None, "Bearer not-a-jwt", "Basic dXNlcjpwYXNz"):
+        response = _check(stub, authorization)
+        assert response.status.code == RPC_UNAUTHENTICATED
+        assert response.denied_response.status.code == 401
+
+
+def test_grpc_denies_refresh_tokens(stub):
+    _cached("refresh-token", "refresh")
+    assert _check(stub, "Bearer refresh-token").status.code == RPC_UNAUTHENTICATED
+
+    _cached("access-token", "access")
+    response = _check(stub, "Bearer access-token")
+    assert response.status.code == RPC_OK
+    assert _headers(response)["x-user-id"] == "9"
+
+
+def test_http_ext_authz(stateless):
+    response = client.get("/ext_authz/orders/42", headers={"Authorization": f"Bearer {stateless}"})
+    assert response.status_code == 200
+    assert response.headers["x-user-id"] == "7"
+    assert response.headers["x-username"] == "envoy-user"
+
+    response = client.post("/ext_authz/orders", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+
+def test_http_ext_authz_denies_revoked_token(stateless):
+    payload = security.decode_token(stateless)
+    token_validation.revocation_set.refresh()
+    token_validation.revocation_set.revoke_jti(payload["jti"])
+    response = client.get("/ext_authz/", headers={"Authorization": f"Bearer {stateless}"})
+    assert response.status_code == 401
+
+
+def test_ext_authz_denies_when_the_check_fails(stub, monkeypatch):
+    def unavailable(token):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(checks, "check_blocking", unavailable)
+    monkeypatch.setattr(checks, "check", unavailable)
+    token = "not-cached-or-stateless"
+    response = client.get("/ext_authz/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+    assert _check(stub, f"Bearer {token}").status.code == RPC_UNAUTHENTICATED
+
+
+def test_local_check_leaves_io_to_the_blocking_check(stateless):
+    # The revocation set has not been loaded yet
+    assert token_validation.check_local(stateless) is None
+    assert checks.check(stateless)["user_id"] == _User.id
+
+    token_validation.revocation_set.refresh()
+    assert token_validation.check_local(stateless)["user_id"] == _User.id
+
+    _cached("cached-token", "access")
+    assert token_validation.check_local("cached-token")["username"] == "cached"
+    assert token_validation.check_local("unknown-token") == {"valid": False}
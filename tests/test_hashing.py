@@ -0,0 +1,22 @@
+from app.core import hashing
+
+
+def test_lower_cost_hash_is_upgraded_on_verify():
+    old_hash = hashing.build_password_context("bcrypt", cost=4).hash("Secret123")
+    context = hashing.build_password_context("bcrypt", cost=5, auto_calibrate=False)
+
+    valid, new_hash = context.verify_and_update("Secret123", old_hash)
+    assert valid
+    assert new_hash.startswith("$2b$05$")
+    assert context.verify_and_update("Secret123", new_hash) == (True, None)
+
+
+def test_wrong_password_is_never_rehashed():
+    old_hash = hashing.build_password_context("bcrypt", cost=4).hash("Secret123")
+    context = hashing.build_password_context("bcrypt", cost=5, auto_calibrate=False)
+    assert context.verify_and_update("wrong", old_hash) == (False, None)
+
+
+def test_calibrated_cost_stays_within_bounds():
+    rounds = hashing.calibrate_bcrypt_rounds(target_ms=1)
+    assert rounds == hashing.BCRYPT_MIN_ROUNDS
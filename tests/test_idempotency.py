@@ -0,0 +1,164 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from app.core.config import settings
+from app.core.security import limiter
+from app.db import models
+from app.services.idempotency import (
+    CLAIMED, IdempotencyMiddleware, IdempotencyStore, StoredResponse, _decode, _encode,
+)
+from tests.test_api import client
+
+
+def _app(store, wait_seconds=5.0):
+    app = FastAPI()
+    app.state.calls = 0
+    app.state.gate = None
+
+    @app.post("/run")
+    async def run(payload: dict):
+        app.state.calls += 1
+        if app.state.gate is not None:
+            await app.state.gate.wait()
+        return {"call": app.state.calls, **payload}
+
+    @app.post("/fail")
+    async def fail():
+        app.state.calls += 1
+        raise HTTPException(status_code=400, detail="nope")
+
+    wrapped = IdempotencyMiddleware(
+        app, store=store, enabled=True, paths=("/run", "/fail"), wait_seconds=wait_seconds
+    )
+    return app, wrapped
+
+
+def _store(session_factory, **kwargs):
+    return IdempotencyStore(use_redis=False, session_factory=session_factory, **kwargs)
+
+
+def _post(wrapped, path, key=None, json=None):
+    async def request():
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            headers = {"Idempotency-Key": key} if key else {}
+            return await http.post(path, json=json if json is not None else {}, headers=headers)
+    return asyncio.run(request())
+
+
+def test_duplicates_replay_the_stored_response(session_factory):
+    store = _store(session_factory)
+    app, wrapped = _app(store)
+
+    first = _post(wrapped, "/run", "k1", {"a": 1})
+    again = _post(wrapped, "/run", "k1", {"a": 1})
+    assert first.status_code == again.status_code == 200
+    assert again.content == first.content
+    assert again.headers["idempotent-replayed"] == "true"
+    assert app.state.calls == 1
+
+    # Another key, or none, runs the request
+    assert _post(wrapped, "/run", "k2", {"a": 1}).json()["call"] == 2
+    assert _post(wrapped, "/run", None, {"a": 1}).json()["call"] == 3
+    assert store.stats() == {"executed": 2, "replayed": 1, "rejected": 0}
+
+    record = StoredResponse("f", 200, "application/json", b'{"x":"a\nb"}')
+    assert _decode(_encode(record)) == record
+
+
+def test_stored_bodies_are_encrypted_with_the_client_key(session_factory):
+    store = _store(session_factory)
+    app, wrapped = _app(store)
+    first = _post(wrapped, "/run", "secret-key", {"token": "plain-token"})
+
+    with session_factory() as db:
+        stored = db.query(models.IdempotencyKey).one()
+    assert b"plain-token" not in stored.body
+    assert b"secret-key" not in stored.key.encode()
+    # The fingerprint is no plain hash of the body: it differs per client key
+    _post(wrapped, "/run", "other-key", {"token": "plain-token"})
+    with session_factory() as db:
+        fingerprints = {row.fingerprint for row in db.query(models.IdempotencyKey)}
+    assert len(fingerprints) == 2
+    assert _post(wrapped, "/run", "secret-key", {"token": "plain-token"}).content == first.content
+
+    # A record that cannot be decrypted is not replayed: the request runs
+    with session_factory() as db:
+        db.query(models.IdempotencyKey).update({"body": b"0" * 40})
+        db.commit()
+    again = _post(wrapped, "/run", "secret-key", {"token": "plain-token"})
+    assert again.status_code == 200 and "idempotent-replayed" not in again.headers
+    assert app.state.calls == 3
+
+
+def test_reused_keys_and_errors(session_factory):
+    store = _store(session_factory)
+    app, wrapped = _app(store)
+
+    _post(wrapped, "/run", "k1", {"a": 1})
+    reused = _post(wrapped, "/run", "k1", {"a": 2})
+    assert reused.status_code == 422
+    assert app.state.calls == 1
+
+    # Error responses are not stored: the retry runs again
+    assert _post(wrapped, "/fail", "k3").status_code == 400
+    assert _post(wrapped, "/fail", "k3").status_code == 400
+    assert app.state.calls == 3
+    assert _post(wrapped, "/run", "x" * 300).status_code == 400
+
+
+def test_concurrent_duplicates_share_one_execution(session_factory):
+    store = _store(session_factory)
+    app, wrapped = _app(store)
+
+    async def scenario():
+        app.state.gate = asyncio.Event()
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            send = lambda: http.post("/run", json={"a": 1}, headers={"Idempotency-Key": "k1"})
+            pending = [asyncio.ensure_future(send()) for _ in range(3)]
+            await asyncio.sleep(0.2)
+            app.state.gate.set()
+            return await asyncio.gather(*pending)
+
+    responses = asyncio.run(scenario())
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.content for r in responses}) == 1
+    assert app.state.calls == 1
+
+
+def test_original_running_elsewhere_and_abandoned_claims(session_factory):
+    store = _store(session_factory, lock_seconds=30)
+    app, wrapped = _app(store, wait_seconds=0.3)
+    first = _post(wrapped, "/run", "k1", {"a": 1})
+    # As if another worker were still running the original
+    with session_factory() as db:
+        db.query(models.IdempotencyKey).update({"status_code": None})
+        db.commit()
+
+    busy = _post(wrapped, "/run", "k1", {"a": 1})
+    assert busy.status_code == 409
+    assert busy.headers["retry-after"] == "1"
+
+    # A claim past its lock is taken over
+    abandoned = _store(session_factory, lock_seconds=0)
+    assert abandoned.begin("k", "f")[0] == CLAIMED
+    assert abandoned.begin("k", "f")[0] == CLAIMED
+    assert first.json()["call"] == 1
+
+
+def test_register_retry_is_answered_from_the_store():
+    limiter.reset()
+    user = {"email": "idem@example.com", "username": "idem-user", "password": "Idem1234!"}
+    headers = {"Idempotency-Key": "register-idem-user"}
+    url = f"{settings.API_V1_PREFIX}/auth/register"
+
+    first = client.post(url, json=user, headers=headers)
+    retry = client.post(url, json=user, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["id"] == first.json()["id"]
+    assert retry.headers["idempotent-replayed"] == "true"
+    # Without the key the duplicate is a new registration attempt
+    assert client.post(url, json=user).status_code == 400
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from jose import JWTError, jwt
+
+from app.core import keys, security
+from app.core.config import settings
+
+OVERLAP = 3600
+
+
+@pytest.fixture
+def keyring_path(tmp_path):
+    return str(tmp_path / "keyring.json")
+
+
+@pytest.fixture
+def asymmetric(monkeypatch, keyring_path):
+    ring = keys.KeyRing(keyring_path, overlap_seconds=OVERLAP, reload_interval=0)
+    monkeypatch.setattr(settings, "ALGORITHM", "ES256")
+    monkeypatch.setattr(security, "keyring", ring)
+    return ring
+
+
+def test_tokens_carry_kid_and_verify_with_published_jwks(asymmetric, keyring_path):
+    kid = keys.add_key(keyring_path, "ES256", datetime.now(timezone.utc))
+    token = security.create_access_token(42)
+
+    assert jwt.get_unverified_header(token)["kid"] == kid
+    assert security.decode_token(token)["sub"] == "42"
+    # A consumer only needs the JWKS document
+    jwks = json.loads(asymmetric.jwks())
+    assert jwt.decode(token, jwks, algorithms=["ES256"])["sub"] == "42"
+
+
+def test_rotation_publishes_pending_key_and_keeps_old_key_during_overlap(asymmetric, keyring_path):
+    now = datetime.now(timezone.utc)
+    old_kid = keys.add_key(keyring_path, "ES256", now - timedelta(days=1))
+    old_token = security.create_access_token(1)
+    new_kid = keys.add_key(keyring_path, "RS256", now + timedelta(minutes=10))
+
+    # The new key is published but does not sign yet
+    assert [k.kid for k in asymmetric.published_keys()] == [old_kid, new_kid]
+    assert asymmetric.signing_key().kid == old_kid
+
+    later = (now + timedelta(minutes=11)).timestamp()
+    assert asymmetric.signing_key(later).kid == new_kid
+    assert old_kid in [k.kid for k in asymmetric.published_keys(later)]
+
+    retired = (now + timedelta(minutes=10, seconds=OVERLAP + 1)).timestamp()
+    assert [k.kid for k in asymmetric.published_keys(retired)] == [new_kid]
+    assert keys.prune_keys(keyring_path, OVERLAP, now + timedelta(minutes=10, seconds=OVERLAP + 1)) == [old_kid]
+    with pytest.raises(JWTError):
+        security.decode_jwt(old_token)
+
+
+def test_unknown_kid_is_rejected(asymmetric, keyring_path):
+    keys.add_key(keyring_path, "ES256", datetime.now(timezone.utc))
+    forged = jwt.encode(
+        {"sub": "1"}, keys.generate_private_key_pem("ES256").decode(),
+        algorithm="ES256", headers={"kid": "unknown"},
+    )
+    assert security.decode_token(forged) is None
+
+
+def test_hs256_tokens_accepted_after_switch_only_when_allowed(asymmetric, keyring_path, monkeypatch):
+    keys.add_key(keyring_path, "ES256", datetime.now(timezone.utc))
+    legacy = jwt.encode({"sub": "5"}, settings.SECRET_KEY, algorithm="HS256")
+    assert security.decode_token(legacy)["sub"] == "5"
+
+    monkeypatch.setattr(settings, "JWT_ACCEPT_HS256", False)
+    assert security.decode_token(legacy) is None
+
+
+def test_failed_key_generation_leaves_no_key_file(keyring_path, tmp_path):
+    with pytest.raises(ValueError):
+        keys.add_key(keyring_path, "HS256", datetime.now(timezone.utc))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,49 @@
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.core.log import JsonFormatter, RateLimitFilter, request_id_var
+from app.main import app
+
+
+def _record(msg="Error storing token in Vault: %s", args=("timeout",), level=logging.ERROR):
+    return logging.LogRecord("app.services.vault", level, __file__, 1, msg, args, None)
+
+
+def test_rate_limit_caps_repeated_errors_and_reports_suppressed():
+    limiter = RateLimitFilter(limit=2, window=60)
+    results = [limiter.filter(_record(args=(f"error {i}",))) for i in range(5)]
+    assert results == [True, True, False, False, False]
+
+    # Other messages and levels below WARNING are not affected
+    assert limiter.filter(_record(msg="Error revoking token in Vault: %s"))
+    assert limiter.filter(_record(level=logging.INFO))
+
+    # After the window, the next record reports what was dropped
+    limiter.window = 0
+    record = _record()
+    assert limiter.filter(record)
+    assert record.suppressed == 3
+
+
+def test_json_formatter_includes_request_id_and_extra_fields():
+    record = _record()
+    record.request_id = "abc123"
+    record.user_id = 7
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Error storing token in Vault: timeout"
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "app.services.vault"
+    assert entry["request_id"] == "abc123"
+    assert entry["user_id"] == 7
+
+
+def test_request_id_is_echoed_or_generated():
+    client = TestClient(app)
+    response = client.get("/health", headers={"X-Request-ID": "req-42"})
+    assert response.headers["x-request-id"] == "req-42"
+
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32
+    assert request_id_var.get() is None
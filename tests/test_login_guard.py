@@ -0,0 +1,75 @@
+import uuid
+
+from app.core.config import settings
+from app.core.security import limiter
+from app.core.tenancy import DEFAULT_REALM
+from app.services.login_guard import LoginGuard, account_for, login_guard
+from tests.test_api import client
+
+
+def test_progressive_lockout_and_reset():
+    guard = LoginGuard(enabled=True, threshold=3, window=60, base=10, max_lock=25, use_redis=False)
+
+    assert [guard.register_failure("Alice") for _ in range(2)] == [0, 0]
+    assert guard.locked_for("alice") == 0
+
+    assert guard.register_failure("alice") == 10
+    assert guard.register_failure("alice") == 20
+    assert guard.register_failure(" ALICE ") == 25
+    assert 0 < guard.locked_for("alice") <= 25
+
+    guard.reset("alice")
+    assert guard.locked_for("alice") == 0
+
+
+def test_accounts_are_tracked_independently():
+    guard = LoginGuard(enabled=True, threshold=1, use_redis=False)
+    guard.register_failure("mallory")
+    assert guard.locked_for("mallory") > 0
+    assert guard.locked_for("bob") == 0
+
+
+def test_username_and_email_share_the_account_counter(monkeypatch):
+    monkeypatch.setattr(login_guard, "enabled", True)
+    monkeypatch.setattr(login_guard, "use_redis", False)
+    monkeypatch.setattr(login_guard, "threshold", 2)
+    limiter.reset()
+    name = f"guard-{uuid.uuid4().hex[:8]}"
+    email = f"{name}@example.com"
+    url = f"{settings.API_V1_PREFIX}/auth/token"
+    registered = client.post(f"{settings.API_V1_PREFIX}/auth/register", json={
+        "email": email, "username": name, "password": "Guard1234!",
+    })
+    assert registered.status_code == 200
+
+    def login(identifier, password="wrong-password"):
+        return client.post(url, data={"username": identifier, "password": password})
+
+    assert login(name).status_code == 401
+    assert login(email).status_code == 401
+    locked = login(name, "Guard1234!")
+    assert locked.status_code == 429
+    assert login(email, "Guard1234!").status_code == 429
+
+
+def test_identifiers_cannot_lock_accounts_by_id_or_in_other_realms(monkeypatch):
+    monkeypatch.setattr(login_guard, "enabled", True)
+    monkeypatch.setattr(login_guard, "use_redis", False)
+    monkeypatch.setattr(login_guard, "threshold", 1)
+    limiter.reset()
+    name = f"guard-{uuid.uuid4().hex[:8]}"
+    registered = client.post(f"{settings.API_V1_PREFIX}/auth/register", json={
+        "email": f"{name}@example.com", "username": name, "password": "Guard1234!",
+    })
+    user_id = registered.json()["id"]
+    url = f"{settings.API_V1_PREFIX}/auth/token"
+
+    for identifier in (f"user:{user_id}", f"id:{user_id}", account_for(DEFAULT_REALM, user_id)):
+        client.post(url, data={"username": identifier, "password": "wrong-password"})
+    login = client.post(url, data={"username": name, "password": "Guard1234!"})
+    assert login.status_code == 200
+
+    assert account_for(DEFAULT_REALM, identifier="sales:user:5") != account_for(
+        "sales", identifier="user:5"
+    )
+    assert account_for("sales", 5) != account_for("sales", identifier="5")
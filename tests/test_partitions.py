@@ -0,0 +1,65 @@
+from contextlib import nullcontext
+from datetime import date
+from types import SimpleNamespace
+
+from app.db import partitions
+
+
+def test_partition_names_round_trip():
+    month = date(2024, 12, 1)
+    assert partitions.partition_name(month) == "audit_logs_y2024m12"
+    assert partitions.partition_month("audit_logs_y2024m12") == month
+    assert partitions.partition_month("audit_logs_default") is None
+
+
+def test_add_months_crosses_year_boundaries():
+    assert partitions.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert partitions.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+def test_create_partition_sql_uses_half_open_month_range():
+    sql = partitions.create_partition_sql(date(2024, 12, 1))
+    assert "audit_logs_y2024m12 PARTITION OF audit_logs" in sql
+    assert "FROM ('2024-12-01') TO ('2025-01-01')" in sql
+
+
+class _Connection:
+    """Records statements; ``default_rows`` months have rows in the default
+    partition, ``failing`` statements raise"""
+
+    def __init__(self, default_rows=(), failing=()):
+        self.default_rows = set(default_rows)
+        self.failing = failing
+        self.statements = []
+
+    def begin_nested(self):
+        return nullcontext()
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if any(fragment in sql for fragment in self.failing):
+            raise RuntimeError("boom")
+        self.statements.append(sql)
+        if sql.startswith("SELECT child"):
+            return []
+        found = params and params.get("start") in self.default_rows
+        return SimpleNamespace(scalar=lambda: found, rowcount=1)
+
+
+def test_creating_a_month_moves_its_rows_out_of_the_default_partition():
+    conn = _Connection(default_rows={date(2024, 12, 1)})
+    created = partitions.ensure_partitions(conn, months_ahead=1, today=date(2024, 12, 15))
+    assert created == ["audit_logs_y2024m12", "audit_logs_y2025m01"]
+    december = conn.statements[1:6]
+    assert december[1] == "ALTER TABLE audit_logs DETACH PARTITION audit_logs_default"
+    assert december[2].startswith("CREATE TABLE IF NOT EXISTS audit_logs_y2024m12")
+    assert "INSERT INTO audit_logs_y2024m12" in december[3]
+    assert december[4] == "ALTER TABLE audit_logs ATTACH PARTITION audit_logs_default DEFAULT"
+    # January has no rows to move
+    assert not any("DETACH" in sql for sql in conn.statements[6:])
+
+
+def test_a_month_that_cannot_be_created_does_not_stop_the_others():
+    conn = _Connection(failing=("audit_logs_y2024m12 PARTITION",))
+    created = partitions.ensure_partitions(conn, months_ahead=1, today=date(2024, 12, 15))
+    assert created == ["audit_logs_y2025m01"]
@@ -0,0 +1,152 @@
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import update
+
+from app import schemas
+from app.core.config import settings
+from app.core.security import limiter
+from app.crud import crud_revocation
+from app.db import models
+from app.services import permissions
+from app.services.permissions import PermissionService, PermissionSet, permission_service
+from app.services.revocation_feed import RevocationFeed
+from tests.test_api import TestingSessionLocal, client
+
+
+class _FakeKeycloak:
+    def __init__(self, roles):
+        self.roles = roles
+        self.calls = 0
+
+    def get_user_roles(self, user_id):
+        self.calls += 1
+        return self.roles
+
+
+def _row(user_id, is_superuser=False, keycloak_id="kc"):
+    return SimpleNamespace(
+        id=user_id, is_superuser=is_superuser, keycloak_id=keycloak_id, realm=None
+    )
+
+
+def _feed(session_factory, settle_seconds=0):
+    return RevocationFeed(
+        poll_seconds=0, settle_seconds=settle_seconds, retention_hours=0,
+        session_factory=session_factory,
+    )
+
+
+def _record_user_state(session_factory, user_id, event_id=None):
+    with session_factory() as db:
+        crud_revocation.record_user_state(db, user_id, token_epoch=0, is_active=True)
+        if event_id is not None:
+            db.flush()
+            db.query(models.RevocationEvent).filter(
+                models.RevocationEvent.id == crud_revocation.last_event_id(db)
+            ).update({"id": event_id})
+        db.commit()
+
+
+def test_permission_sets_expand_roles_and_wildcards():
+    mapping = {"superuser": ["*"], "auditor": ["audit:read", "users:*"]}
+    auditor = PermissionSet.from_roles(["auditor"], mapping)
+    assert auditor.allows("audit:read")
+    assert auditor.allows("users:export", "users")
+    assert not auditor.allows("audit:export")
+    assert not auditor.allows("revocations:read")
+
+    # Roles missing from the mapping grant the permission of the same name
+    assert PermissionSet.from_roles(["audit:export"], mapping).allows("audit:export")
+    assert PermissionSet.from_roles(["superuser"], mapping).allows("anything:at-all")
+    assert not PermissionSet.from_roles([], mapping).allows("audit:read")
+
+
+def test_user_permissions_are_cached_until_invalidated(monkeypatch, session_factory):
+    keycloak = _FakeKeycloak(["audit:read"])
+    monkeypatch.setattr(permissions.keycloak_clients, "get", lambda realm=None: keycloak)
+    service = PermissionService(ttl_seconds=300, refresh_seconds=300, keycloak_roles=True,
+                                feed=_feed(session_factory))
+    user = _row(1)
+
+    assert service.for_user(user).allows("audit:read")
+    assert service.for_user(user) is service.for_user(user)
+    assert keycloak.calls == 1
+
+    keycloak.roles = []
+    service.invalidate_user(user.id)
+    assert not service.for_user(user).allows("audit:read")
+    assert keycloak.calls == 2
+
+    # Keycloak down: local roles only, and nothing is cached
+    keycloak.roles = None
+    service.invalidate_user(user.id)
+    assert service.for_user(_row(1, is_superuser=True)).allows("audit:read")
+    assert not service.for_user(user).allows("audit:read")
+    assert keycloak.calls == 4
+
+    # Token claims are compiled once per distinct set of roles
+    claims = schemas.TokenUser(id=2, username="t", is_active=True, roles=["audit:read"])
+    assert service.permissions_for(claims) is service.for_roles(["audit:read"])
+
+
+def test_other_workers_changes_arrive_through_the_revocation_feed(monkeypatch, session_factory):
+    keycloak = _FakeKeycloak(["audit:read"])
+    monkeypatch.setattr(permissions.keycloak_clients, "get", lambda realm=None: keycloak)
+    service = PermissionService(ttl_seconds=300, refresh_seconds=0, keycloak_roles=True,
+                                feed=_feed(session_factory))
+    service.for_user(_row(41))
+    service.for_user(_row(42))
+    assert keycloak.calls == 2
+
+    _record_user_state(session_factory, 41)
+    service.for_user(_row(41))
+    service.for_user(_row(42))
+    assert keycloak.calls == 3
+
+
+def test_change_committed_out_of_order_is_not_skipped(monkeypatch, session_factory):
+    keycloak = _FakeKeycloak(["audit:read"])
+    monkeypatch.setattr(permissions.keycloak_clients, "get", lambda realm=None: keycloak)
+    service = PermissionService(ttl_seconds=300, refresh_seconds=0, keycloak_roles=True,
+                                feed=_feed(session_factory, settle_seconds=60))
+    service.for_user(_row(43))
+    service.for_user(_row(44))
+    with session_factory() as db:
+        head = crud_revocation.last_event_id(db)
+
+    # The later event commits while the earlier one's transaction is open
+    _record_user_state(session_factory, 43, event_id=head + 2)
+    service.for_user(_row(43))
+    assert keycloak.calls == 2
+    _record_user_state(session_factory, 44, event_id=head + 1)
+    service.for_user(_row(43))
+    service.for_user(_row(44))
+    assert keycloak.calls == 4
+
+
+def test_require_permission_guards_admin_endpoints():
+    limiter.reset()
+    # test.db outlives the run; a fresh name keeps reruns registering a new user
+    name = f"perm-{uuid.uuid4().hex[:8]}"
+    user = {"email": f"{name}@example.com", "username": name, "password": "Perm1234!"}
+    registered = client.post(f"{settings.API_V1_PREFIX}/auth/register", json=user)
+    assert registered.status_code == 200
+
+    def audit_logs():
+        login = client.post(f"{settings.API_V1_PREFIX}/auth/token", data={
+            "username": user["username"], "password": user["password"],
+        })
+        bearer = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        return client.get(f"{settings.API_V1_PREFIX}/audit/logs", headers=bearer)
+
+    response = audit_logs()
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Missing permission: audit:read"
+
+    user_id = registered.json()["id"]
+    with TestingSessionLocal() as db:
+        db.execute(update(models.User).where(models.User.id == user_id).values(is_superuser=True))
+        db.commit()
+    permission_service.invalidate_user(user_id)
+    assert audit_logs().status_code == 200
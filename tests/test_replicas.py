@@ -0,0 +1,143 @@
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.crud import crud_user
+from app.db import database
+from app.db.database import ReadSessionLocal, SessionLocal, route_for_user
+from app.db.replicas import ReplicaRouter, measure_lag
+
+
+def _engine(label):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE whoami (name TEXT)"))
+        conn.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": label})
+    return engine
+
+
+def _router(clock, primary, replicas, lags=None, **kwargs):
+    lags = lags if lags is not None else {}
+
+    def probe(engine):
+        lag = lags.get(engine, 0.0)
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    return ReplicaRouter(
+        primary, replicas, max_lag=5.0, check_seconds=10.0,
+        lag_probe=probe, clock=clock, **kwargs,
+    )
+
+
+def test_reads_round_robin_over_healthy_replicas(clock):
+    primary, r1, r2 = _engine("primary"), _engine("r1"), _engine("r2")
+    router = _router(clock, primary, [r1, r2])
+    assert {router.engine_for(), router.engine_for()} == {r1, r2}
+
+
+def test_lagging_or_unreachable_replicas_fall_back_to_primary(clock):
+    primary, r1, r2 = _engine("primary"), _engine("r1"), _engine("r2")
+    lags = {r1: 30.0, r2: ConnectionError("down")}
+    router = _router(clock, primary, [r1, r2], lags=lags)
+    assert router.engine_for() is primary
+
+    # Rechecked after check_seconds
+    lags[r1] = 1.0
+    clock.now += 11
+    assert router.engine_for() is r1
+
+
+def test_writes_pin_the_user_to_the_primary_for_the_lag_window(clock):
+    primary, replica = _engine("primary"), _engine("replica")
+    router = _router(clock, primary, [replica])
+    router.mark_written(7)
+    assert router.engine_for(7) is primary
+    assert router.engine_for(8) is replica
+
+    clock.now += 5.1
+    assert router.engine_for(7) is replica
+
+
+def test_read_sessions_use_the_routed_engine(monkeypatch, clock):
+    primary, replica = _engine("primary"), _engine("replica")
+    router = _router(clock, primary, [replica])
+    monkeypatch.setattr(database, "replica_router", router)
+    router.mark_written(1)
+
+    def whoami(session_factory, user_id=None):
+        with session_factory() as db:
+            route_for_user(db, user_id)
+            return db.execute(text("SELECT name FROM whoami")).scalar()
+
+    assert whoami(ReadSessionLocal) == "replica"
+    assert whoami(ReadSessionLocal, user_id=1) == "primary"
+    # Regular sessions always use their own bind (the app's primary)
+    with SessionLocal(bind=primary) as db:
+        assert db.execute(text("SELECT name FROM whoami")).scalar() == "primary"
+
+
+
+def test_shared_user_lookups_do_not_cross_engines(monkeypatch, clock):
+    primary, replica = _engine("primary"), _engine("replica")
+    router = _router(clock, primary, [replica])
+    monkeypatch.setattr(database, "replica_router", router)
+    replica_read = threading.Event()
+    release = threading.Event()
+
+    def get_user_row(db, user_id):
+        name = db.execute(text("SELECT name FROM whoami")).scalar()
+        if name == "replica":
+            replica_read.set()
+            release.wait(timeout=2)
+        return name
+
+    monkeypatch.setattr(crud_user, "get_user_row", get_user_row)
+
+    def lookup(results):
+        with ReadSessionLocal() as db:
+            route_for_user(db, 1)
+            results.append(crud_user.get_user_row_shared(db, 1))
+
+    on_replica = []
+    reader = threading.Thread(target=lookup, args=(on_replica,))
+    reader.start()
+    assert replica_read.wait(timeout=2)
+
+    # Written meanwhile: this lookup must not share the replica's read
+    router.mark_written(1)
+    on_primary = []
+    lookup(on_primary)
+    release.set()
+    reader.join()
+    assert on_primary == ["primary"]
+    assert on_replica == ["replica"]
+
+def _postgres_replica(lag):
+    """Engine stand-in whose lag query returns ``lag``"""
+    @contextmanager
+    def connect():
+        yield SimpleNamespace(execute=lambda query: SimpleNamespace(scalar=lambda: lag))
+
+    return SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"), url=SimpleNamespace(host="replica"),
+        connect=connect,
+    )
+
+
+def test_replica_without_a_streaming_wal_receiver_is_unhealthy(clock):
+    assert measure_lag(_postgres_replica(1.5)) == 1.5
+    disconnected = _postgres_replica(None)
+    with pytest.raises(RuntimeError):
+        measure_lag(disconnected)
+
+    primary = _engine("primary")
+    router = ReplicaRouter(primary, [disconnected], check_seconds=10.0, clock=clock)
+    assert router.engine_for() is primary
@@ -0,0 +1,37 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import schemas
+from app.core.responses import build, render
+
+
+def _response_model_output(schema, data):
+    """What FastAPI returns for ``data`` with ``response_model=schema``"""
+    return schema.model_validate(data, from_attributes=True).model_dump(mode="json")
+
+
+@pytest.mark.parametrize("schema, data", [
+    (schemas.Token, {"access_token": "a", "refresh_token": "r", "expires_in": 900}),
+    (schemas.Token, {"access_token": "a", "refresh_token": "r", "token_type": "bearer",
+                     "expires_in": 900, "session_id": "ignored"}),
+    (schemas.ValidationResponse, {"valid": False}),
+    (schemas.ValidationResponse, {"valid": True, "user_id": 7, "username": None,
+                                  "realm": "default", "exp": 1700000000, "type": "access"}),
+    (schemas.ValidationResponse, SimpleNamespace(valid=True, user_id=7, username="u")),
+])
+def test_render_matches_the_response_model(schema, data):
+    response = render(schema, data)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == _response_model_output(schema, data)
+
+
+def test_build_fills_defaults_and_passes_models_through():
+    token = build(schemas.Token, {"access_token": "a", "refresh_token": "r", "expires_in": 1})
+    assert token.token_type == "bearer"
+    assert build(schemas.Token, token) is token
+
+    invalid = build(schemas.ValidationResponse, {"valid": False})
+    assert (invalid.user_id, invalid.username, invalid.realm, invalid.exp) == (None,) * 4
+    assert render(schemas.ValidationResponse, invalid, status_code=401).status_code == 401
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+
+from app.api.deps import claims_user
+from app.core import security
+from app.crud import crud_revocation
+from app.db import models
+from app.services.revocation import RevocationSet
+from app.services.revocation_feed import RevocationFeed
+
+
+def _payload(user_id, jti="jti-1", epoch=0):
+    return {"sub": str(user_id), "jti": jti, "epoch": epoch, "type": "access"}
+
+
+def _revocations(session_factory, settle_seconds=0):
+    feed = RevocationFeed(
+        poll_seconds=0, settle_seconds=settle_seconds, retention_hours=0,
+        session_factory=session_factory,
+    )
+    return RevocationSet(refresh_seconds=0, feed=feed)
+
+
+def _blacklist(session_factory, jti, expires_in=timedelta(hours=1), event_id=None):
+    with session_factory() as db:
+        crud_revocation.blacklist_token(
+            db, jti=jti, token_type="access", user_id=1,
+            expires_at=datetime.now(timezone.utc) + expires_in,
+        )
+        if event_id is not None:
+            db.flush()
+            db.query(models.RevocationEvent).filter(models.RevocationEvent.jti == jti).update(
+                {"id": event_id}
+            )
+        db.commit()
+
+
+def test_unloaded_set_fails_closed():
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    revocations = _revocations(session_factory=broken_session)
+    assert revocations.is_revoked(_payload(1))
+
+
+def test_blacklisted_jtis_are_picked_up_incrementally(session_factory):
+    revocations = _revocations(session_factory)
+    assert not revocations.is_revoked(_payload(1, jti="later"))
+
+    _blacklist(session_factory, "later")
+    assert revocations.is_revoked(_payload(1, jti="later"))
+
+
+def test_load_skips_expired_jtis_and_applies_user_deltas(session_factory):
+    _blacklist(session_factory, "expired", expires_in=timedelta(hours=-1))
+    _blacklist(session_factory, "live")
+    revocations = _revocations(session_factory)
+    assert not revocations.is_revoked(_payload(1, jti="expired"))
+    assert revocations.is_revoked(_payload(1, jti="live"))
+
+    with session_factory() as db:
+        crud_revocation.record_user_state(db, 5, token_epoch=3, is_active=True)
+        db.commit()
+    assert revocations.is_revoked(_payload(5, jti="x", epoch=2))
+    assert not revocations.is_revoked(_payload(5, jti="x", epoch=3))
+
+
+def test_revocation_committed_out_of_order_is_not_skipped(session_factory):
+    revocations = _revocations(session_factory, settle_seconds=60)
+    assert not revocations.is_revoked(_payload(1, jti="slow"))
+
+    # Event 2 commits while event 1's transaction is still open
+    _blacklist(session_factory, "fast", event_id=2)
+    assert not revocations.is_revoked(_payload(1, jti="fast"))
+    _blacklist(session_factory, "slow", event_id=1)
+    assert revocations.is_revoked(_payload(1, jti="slow"))
+    assert revocations.is_revoked(_payload(1, jti="fast"))
+
+
+def test_epoch_and_deactivation_revoke_older_tokens(session_factory):
+    revocations = _revocations(session_factory)
+    revocations.refresh()
+
+    revocations.update_user(7, token_epoch=2, is_active=True)
+    assert revocations.is_revoked(_payload(7, epoch=1))
+    assert not revocations.is_revoked(_payload(7, epoch=2))
+
+    revocations.update_user(7, token_epoch=2, is_active=False)
+    assert revocations.is_revoked(_payload(7, epoch=2))
+
+
+def test_access_token_carries_claims_for_stateless_checks():
+    user = models.User(id=3, username="admin", is_active=True, is_superuser=True)
+    token = security.create_access_token(
+        user.id, epoch=4, claims=security.user_claims(user)
+    )
+    claims = claims_user(security.decode_token(token))
+    assert claims.id == 3
+    assert claims.username == "admin"
+    assert claims.is_superuser and claims.token_epoch == 4
+
+    refresh = security.create_refresh_token(user.id)
+    assert claims_user(security.decode_token(refresh)) is None
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.api.v1.endpoints import revocations
+from app.crud import crud_revocation, crud_user
+from app.db import models
+from app.services.revocation_feed import RevocationFeed
+from tests.test_api import client
+from app.core.config import settings
+
+
+def _feed(session_factory, **kwargs):
+    options = {"poll_seconds": 0, "settle_seconds": 0, "retention_hours": 0}
+    options.update(kwargs)
+    return RevocationFeed(session_factory=session_factory, **options)
+
+
+def _revoke(session_factory, jti, user_id=1):
+    with session_factory() as db:
+        crud_revocation.blacklist_token(
+            db, jti=jti, token_type="access", user_id=user_id,
+            expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+        )
+        db.commit()
+
+
+def test_events_follow_the_head_in_order(session_factory):
+    _revoke(session_factory, "before-start")
+    feed = _feed(session_factory)
+    start = feed.head()
+
+    _revoke(session_factory, "jti-a")
+    with session_factory() as db:
+        user = models.User(email="feed@example.com", username="feed", hashed_password="x")
+        db.add(user)
+        db.commit()
+        crud_user.revoke_all_tokens(db, user)
+        user_id = user.id
+
+    events, reset = feed.events_after(start)
+    assert not reset
+    assert [e["type"] for e in events] == ["token", "user"]
+    assert events[0]["jti"] == "jti-a"
+    assert events[1] == {
+        "id": events[1]["id"], "type": "user", "user_id": user_id,
+        "token_epoch": 1, "is_active": True,
+    }
+    assert feed.events_after(events[-1]["id"]) == ([], False)
+
+    snapshot = feed.snapshot()
+    assert snapshot["offset"] == events[-1]["id"]
+    assert {t["jti"] for t in snapshot["tokens"]} == {"before-start", "jti-a"}
+    assert snapshot["users"] == [{"user_id": user_id, "token_epoch": 1, "is_active": True}]
+
+
+def test_head_waits_for_gaps_to_settle(session_factory):
+    feed = _feed(session_factory, settle_seconds=60)
+    start = feed.head()
+    with session_factory() as db:
+        # An id skipped by a transaction that has not committed yet
+        db.add(models.RevocationEvent(id=start + 2, kind="token", user_id=1, jti="late"))
+        db.commit()
+
+    assert feed.events_after(start) == ([], False)
+
+    with session_factory() as db:
+        db.add(models.RevocationEvent(id=start + 1, kind="token", user_id=1, jti="early"))
+        db.commit()
+    events, _ = feed.events_after(start)
+    assert [e["jti"] for e in events] == ["early", "late"]
+
+
+def test_old_offsets_are_served_from_the_database_until_pruned(session_factory):
+    feed = _feed(session_factory, buffer_size=2)
+    start = feed.head()
+    for i in range(6):
+        _revoke(session_factory, f"jti-{i}")
+        feed.poll()
+
+    events, reset = feed.events_after(start, limit=100)
+    assert not reset
+    assert [e["jti"] for e in events] == [f"jti-{i}" for i in range(6)]
+
+    with session_factory() as db:
+        crud_revocation.prune_events(db, datetime.now(timezone.utc) + timedelta(seconds=1))
+    assert feed.events_after(start) == ([], True)
+
+
+def test_event_stream_emits_sse(session_factory, monkeypatch):
+    feed = _feed(session_factory)
+    monkeypatch.setattr(revocations, "revocation_feed", feed)
+    monkeypatch.setattr(settings, "REVOCATION_STREAM_POLL_SECONDS", 0.01)
+    start = feed.head()
+    _revoke(session_factory, "streamed")
+
+    async def first_chunks(count):
+        stream = revocations.event_stream(start)
+        try:
+            return [await stream.__anext__() for _ in range(count)]
+        finally:
+            await stream.aclose()
+
+    retry, chunk = asyncio.run(first_chunks(2))
+    assert retry.startswith(b"retry: ")
+    lines = chunk.decode().splitlines()
+    assert lines[0] == f"id: {start + 1}"
+    assert lines[1] == "event: token"
+    assert '"jti":"streamed"' in lines[2]
+
+
+def test_revocation_endpoints_require_superuser():
+    assert client.get(f"{settings.API_V1_PREFIX}/revocations/snapshot").status_code == 401
+    assert client.get(f"{settings.API_V1_PREFIX}/revocations/events").status_code == 401
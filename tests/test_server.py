@@ -0,0 +1,25 @@
+from app import server
+
+
+def test_cgroup_v2_quota(tmp_path):
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text("150000 100000\n")
+    assert server.cgroup_cpu_limit(str(cpu_max)) == 1.5
+
+    cpu_max.write_text("max 100000\n")
+    assert server.cgroup_cpu_limit(str(cpu_max)) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    quota, period = tmp_path / "quota", tmp_path / "period"
+    quota.write_text("50000")
+    period.write_text("100000")
+    assert server.cgroup_cpu_limit(str(tmp_path / "missing"), str(quota), str(period)) == 0.5
+
+    quota.write_text("-1")
+    assert server.cgroup_cpu_limit(str(tmp_path / "missing"), str(quota), str(period)) is None
+
+
+def test_configured_worker_count_wins():
+    assert server.worker_count(configured=3) == 3
+    assert server.worker_count(configured=0) >= 1
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from app.core.singleflight import SingleFlight, stats
+
+THREADS = 8
+
+
+def _run_concurrently(target):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def _slow_upstream(calls, result=None, error=None):
+    def call():
+        calls.append(1)
+        # Long enough for every thread to arrive while the leader waits
+        time.sleep(0.2)
+        if error is not None:
+            raise error
+        return result
+    return call
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    group = SingleFlight("test.share", enabled=True)
+    calls = []
+    upstream = _slow_upstream(calls, result={"jti": "abc"})
+
+    results, errors = _run_concurrently(lambda: group.do("abc", upstream))
+
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == THREADS and all(r == {"jti": "abc"} for r in results)
+    assert (group.executed, group.coalesced) == (1, THREADS - 1)
+    assert stats()["test.share"]["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    group = SingleFlight("test.errors", enabled=True)
+    calls = []
+    upstream = _slow_upstream(calls, error=RuntimeError("vault down"))
+
+    results, errors = _run_concurrently(lambda: group.do("k", upstream))
+    assert not results
+    assert len(errors) == THREADS and len(calls) == 1
+
+    # The next call after the failure goes upstream again
+    assert group.do("k", lambda: "recovered") == "recovered"
+
+
+def test_different_keys_do_not_coalesce():
+    group = SingleFlight("test.keys", enabled=True)
+    calls = []
+    upstream = _slow_upstream(calls, result=1)
+    counter = iter(range(THREADS))
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            key = next(counter)
+        return group.do(key, upstream)
+
+    _run_concurrently(call)
+    assert len(calls) == THREADS
+    assert group.coalesced == 0
+
+
+def test_disabled_group_calls_through():
+    group = SingleFlight("test.disabled", enabled=False)
+    with pytest.raises(ValueError):
+        group.do("k", int, "not a number")
+    assert group.executed == 0
@@ -0,0 +1,106 @@
+import uuid
+
+import pytest
+
+from app.core import tenancy
+from app.core.config import settings
+from app.core.security import limiter
+from app.services import keycloak
+from app.services.keycloak import KeycloakClientPool, KeycloakService, keycloak_clients
+from tests.test_api import client
+
+OTHER_REALM = "ashid-sales-at"
+
+
+class _FakeKeycloak:
+    def create_user(self, **kwargs):
+        return None
+
+
+class _FakeOpenID:
+    def __init__(self):
+        self.calls = 0
+
+    def certs(self):
+        self.calls += 1
+        return {"keys": [self.calls]}
+
+
+@pytest.fixture
+def two_realms(monkeypatch):
+    monkeypatch.setattr(tenancy, "_REALM_SET", frozenset({tenancy.DEFAULT_REALM, OTHER_REALM}))
+    monkeypatch.setattr(keycloak_clients, "get", lambda realm=None: _FakeKeycloak())
+    # Other tests' registrations count against the per-client limit
+    limiter.reset()
+
+
+def _register(username, realm=None):
+    headers = {settings.TENANT_HEADER: realm} if realm else {}
+    return client.post(f"{settings.API_V1_PREFIX}/auth/register", headers=headers, json={
+        "email": f"{username}@example.com", "username": username, "password": "Tenant123!",
+    })
+
+
+def _login(username, realm=None):
+    headers = {settings.TENANT_HEADER: realm} if realm else {}
+    return client.post(f"{settings.API_V1_PREFIX}/auth/token", headers=headers, data={
+        "username": username, "password": "Tenant123!",
+    })
+
+
+def test_realm_resolution():
+    assert tenancy.resolve_realm(None) == tenancy.DEFAULT_REALM
+    assert tenancy.resolve_realm(tenancy.DEFAULT_REALM) == tenancy.DEFAULT_REALM
+    assert tenancy.resolve_realm("not-served") is None
+    assert tenancy.scoped_key(tenancy.DEFAULT_REALM, "alice") == "alice"
+    assert tenancy.scoped_key(OTHER_REALM, "alice") == f"{OTHER_REALM}:alice"
+
+
+def test_usernames_are_unique_per_realm_and_tokens_stay_in_their_realm(two_realms):
+    # test.db outlives the run; a fresh name keeps reruns registering a new user
+    username = f"tenant-{uuid.uuid4().hex[:8]}"
+    assert _register(username).status_code == 200
+    response = _register(username, OTHER_REALM)
+    assert response.status_code == 200
+    assert response.json()["realm"] == OTHER_REALM
+    assert _register(username, OTHER_REALM).status_code == 400
+
+    login = _login(username, OTHER_REALM)
+    assert login.status_code == 200
+    bearer = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    me = client.get(f"{settings.API_V1_PREFIX}/users/me",
+                    headers={**bearer, settings.TENANT_HEADER: OTHER_REALM})
+    assert me.status_code == 200
+    assert me.json()["realm"] == OTHER_REALM
+    # The same token is not valid in another realm
+    assert client.get(f"{settings.API_V1_PREFIX}/users/me", headers=bearer).status_code == 401
+
+
+def test_unknown_realm_is_rejected(two_realms):
+    assert _register("nobody", "not-served").status_code == 404
+
+
+def test_client_pool_keeps_default_and_evicts_least_recently_used():
+    pool = KeycloakClientPool(max_clients=2, default_realm="default")
+    a, b = pool.get("a"), pool.get("b")
+    assert pool.get("a") is a
+    pool.get("c")
+    assert pool.get("a") is a and pool.get("b") is not b
+    assert pool.get() is pool.get("default") is pool.default
+    assert len(pool.stats()["realms"]) == 3
+
+
+def test_jwks_are_cached_per_realm(monkeypatch):
+    monkeypatch.setattr(keycloak.settings, "KEYCLOAK_JWKS_CACHE_SECONDS", 300)
+    first, second = KeycloakService("a"), KeycloakService("b")
+    first._keycloak_openid, second._keycloak_openid = _FakeOpenID(), _FakeOpenID()
+
+    assert first.get_jwks() == first.get_jwks() == {"keys": [1]}
+    assert second.get_jwks() == {"keys": [1]}
+    assert first._keycloak_openid.calls == second._keycloak_openid.calls == 1
+
+    first.reset()
+    first._keycloak_openid = _FakeOpenID()
+    first.get_jwks()
+    assert first._keycloak_openid.calls == 1
@@ -0,0 +1,75 @@
+import time
+
+from app.crud import crud_revocation
+from app.services.revocation_feed import RevocationFeed
+from app.services.token_cache import ValidationCache
+
+
+def _cache(session_factory, **kwargs):
+    # Each instance follows its own feed, like separate workers
+    feed = RevocationFeed(
+        poll_seconds=0, settle_seconds=0, retention_hours=0, session_factory=session_factory
+    )
+    return ValidationCache(enabled=True, use_redis=False, sync_seconds=0, feed=feed, **kwargs)
+
+
+def _response(user_id=1, exp_in=300):
+    return {"valid": True, "user_id": user_id, "username": "u", "exp": int(time.time()) + exp_in}
+
+
+def test_cache_hit_and_token_invalidation(session_factory):
+    cache = _cache(session_factory)
+    cache.set("token-a", _response())
+    assert cache.get("token-a")["user_id"] == 1
+
+    cache.invalidate_token("token-a")
+    assert cache.get("token-a") is None
+
+
+def test_user_invalidation_drops_all_user_entries(session_factory):
+    cache = _cache(session_factory)
+    cache.set("token-a", _response(user_id=1))
+    cache.set("token-b", _response(user_id=1))
+    cache.set("token-c", _response(user_id=2))
+
+    cache.invalidate_user(1)
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is None
+    assert cache.get("token-c") is not None
+
+
+def test_entries_never_outlive_exp_and_lru_is_bounded(session_factory):
+    cache = _cache(session_factory, max_entries=2)
+    cache.set("expired", _response(exp_in=-1))
+    assert cache.get("expired") is None
+
+    for token in ("t1", "t2", "t3"):
+        cache.set(token, _response())
+    assert cache.get("t1") is None
+    assert cache.get("t3") is not None
+
+
+def test_revocations_in_one_worker_drop_entries_in_the_others(session_factory):
+    here, there = _cache(session_factory), _cache(session_factory)
+    for cache in (here, there):
+        cache.set("token-a", _response(user_id=7))
+        cache.set("token-b", _response(user_id=8))
+
+    here.invalidate_user(7)
+    with session_factory() as db:
+        crud_revocation.record_user_state(db, 7, token_epoch=1, is_active=True)
+        db.commit()
+
+    assert there.get("token-a") is None
+    assert there.get("token-b") is not None
+
+
+def test_validation_started_before_an_invalidation_is_not_cached(session_factory):
+    cache = _cache(session_factory)
+    started = time.monotonic()
+    cache.invalidate_user(1)
+    cache.set("token-a", _response(user_id=1), started)
+    assert cache.get("token-a") is None
+
+    cache.set("token-a", _response(user_id=1), time.monotonic())
+    assert cache.get("token-a") is not None
@@ -0,0 +1,53 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.core import tracing
+from app.core.config import settings
+from app.main import app
+from tests.test_api import engine
+
+client = TestClient(app)
+tracing.instrument_engine(engine)
+
+
+def _spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_login_is_traced_down_to_db_and_password_hashing(tmp_path):
+    path = str(tmp_path / "spans.jsonl")
+    tracing.setup_tracing(
+        enabled=True, sample_ratio=1.0, exporter=tracing.FileSpanExporter(path), batch=False
+    )
+    try:
+        client.post(f"{settings.API_V1_PREFIX}/auth/token", data={
+            "username": "nobody-traced", "password": "Wrong1234!",
+        })
+    finally:
+        tracing.setup_tracing(enabled=False)
+
+    spans = _spans(path)
+    names = {s["name"] for s in spans}
+    assert "POST /api/v1/auth/token" in names
+    assert {"SELECT", "password.verify", "audit.commit"} <= names
+
+    # Everything belongs to the request's trace
+    server = next(s for s in spans if s["kind"] == "SpanKind.SERVER")
+    assert {s["context"]["trace_id"] for s in spans} == {server["context"]["trace_id"]}
+
+
+def test_incoming_traceparent_is_continued(tmp_path):
+    path = str(tmp_path / "spans.jsonl")
+    tracing.setup_tracing(
+        enabled=True, sample_ratio=0.0, exporter=tracing.FileSpanExporter(path), batch=False
+    )
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    try:
+        client.get("/health", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    finally:
+        tracing.setup_tracing(enabled=False)
+
+    # Sampled by the caller even though new traces would not be
+    assert [s["context"]["trace_id"] for s in _spans(path)] == [f"0x{trace_id}"]
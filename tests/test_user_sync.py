@@ -0,0 +1,290 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app.crud import crud_revocation, crud_sync
+from app.db import models
+from app.services.user_sync import PULL, PUSH, RECONCILE, KeycloakSyncService
+
+
+class FakeKeycloak:
+    def __init__(self, users=None):
+        self.users = dict(users or {})
+        self.events = []
+        self.updates = []
+        self.fail_reads = False
+        # Users deleted in Keycloak, and Keycloak being unreachable
+        self.deleted = set()
+        self.down = False
+
+    def get_user(self, user_id):
+        if self.fail_reads:
+            return None
+        return self.users.get(user_id)
+
+    def get_users_page(self, first, max_results):
+        return [self.users[k] for k in sorted(self.users)][first:first + max_results]
+
+    def get_admin_events(self, query):
+        events = sorted(self.events, key=lambda e: e["time"], reverse=True)
+        return events[query["first"]:query["first"] + query["max"]]
+
+    def update_user(self, user_id, **payload):
+        if self.down:
+            return None
+        if user_id in self.deleted:
+            return False
+        self.updates.append((user_id, payload))
+        self.users.setdefault(user_id, {"id": user_id}).update(payload)
+        return True
+
+    def event(self, user_id, time_ms, operation="UPDATE", resource_type="USER", path=""):
+        self.events.append({
+            "time": time_ms,
+            "resourceType": resource_type,
+            "operationType": operation,
+            "resourcePath": f"users/{user_id}{path}",
+        })
+
+
+def _rep(keycloak_id, email, first="", last="", enabled=True):
+    return {"id": keycloak_id, "email": email, "firstName": first,
+            "lastName": last, "enabled": enabled}
+
+
+def _setup(session_factory, *users):
+    with session_factory() as db:
+        for i, (keycloak_id, email, full_name) in enumerate(users, start=1):
+            db.add(models.User(
+                id=i, email=email, username=f"user{i}", full_name=full_name,
+                hashed_password="x", keycloak_id=keycloak_id,
+            ))
+        db.commit()
+
+
+def _touch(session_factory, user_id, when, **values):
+    with session_factory() as db:
+        db.execute(
+            update(models.User).where(models.User.id == user_id).values(updated_at=when, **values)
+        )
+        db.commit()
+
+
+def _user(session_factory, user_id):
+    with session_factory() as db:
+        return db.get(models.User, user_id)
+
+
+def _service(keycloak, batch_size=2, **kwargs):
+    return KeycloakSyncService(
+        batch_size=batch_size, workers=2, settle_seconds=0, keycloak=keycloak, **kwargs
+    )
+
+
+def test_push_sends_local_changes_once_and_resumes(session_factory):
+    _setup(session_factory,
+           ("kc-1", "a@example.com", "Ann Lee"), ("kc-2", "b@example.com", None),
+           ("kc-3", "c@example.com", None), (None, "d@example.com", None))
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    for user_id in (1, 2, 3, 4):
+        _touch(session_factory, user_id, past + timedelta(seconds=user_id))
+    keycloak = FakeKeycloak()
+    service = _service(keycloak)
+
+    with session_factory() as db:
+        stats = service.push(db)
+    assert [kid for kid, _ in keycloak.updates] == ["kc-1", "kc-2", "kc-3"]
+    assert keycloak.updates[0][1] == {
+        "email": "a@example.com", "firstName": "Ann", "lastName": "Lee", "enabled": True,
+    }
+    assert (stats.scanned, stats.batches) == (3, 2)
+
+    # Only changes past the watermark go out on the next run
+    keycloak.updates.clear()
+    _touch(session_factory, 2, past + timedelta(seconds=10), full_name="Bo Diddley")
+    with session_factory() as db:
+        service.push(db)
+        position = crud_sync.get_checkpoint(db, PUSH)
+    assert keycloak.updates == [
+        ("kc-2", {"email": "b@example.com", "firstName": "Bo", "lastName": "Diddley", "enabled": True}),
+    ]
+    assert position["id"] == 2
+
+
+def test_push_keeps_a_watermark_per_realm(session_factory):
+    _setup(session_factory,
+           ("kc-1", "a@example.com", None), ("kc-2", "b@example.com", None),
+           ("kc-3", "c@example.com", None))
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    for user_id in (1, 2, 3):
+        _touch(session_factory, user_id, past + timedelta(seconds=user_id))
+    _touch(session_factory, 2, past + timedelta(seconds=2), realm="acme")
+    default_keycloak, acme_keycloak = FakeKeycloak(), FakeKeycloak()
+    default, acme = _service(default_keycloak), _service(acme_keycloak, realm="acme")
+
+    # The second realm's run does not move the first realm's watermark
+    with session_factory() as db:
+        acme.push(db)
+        default.push(db)
+    assert [kid for kid, _ in acme_keycloak.updates] == ["kc-2"]
+    assert [kid for kid, _ in default_keycloak.updates] == ["kc-1", "kc-3"]
+
+    with session_factory() as db:
+        assert crud_sync.get_checkpoint(db, PUSH)["id"] == 3
+        assert crud_sync.get_checkpoint(db, "acme:" + PUSH)["id"] == 2
+        acme.push(db)
+        default.push(db)
+    assert len(acme_keycloak.updates) == 1
+    assert len(default_keycloak.updates) == 2
+
+
+def test_push_moves_past_users_keycloak_refuses_and_stops_when_it_is_down(session_factory):
+    _setup(session_factory,
+           ("kc-1", "a@example.com", None), ("kc-2", "b@example.com", None),
+           ("kc-3", "c@example.com", None))
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    for user_id in (1, 2, 3):
+        _touch(session_factory, user_id, past + timedelta(seconds=user_id))
+    keycloak = FakeKeycloak()
+    service = _service(keycloak)
+
+    keycloak.down = True
+    with session_factory() as db:
+        assert service.push(db).batches == 0
+        assert crud_sync.get_checkpoint(db, PUSH) is None
+
+    # A whole batch of users deleted in Keycloak does not block the rest
+    keycloak.down = False
+    keycloak.deleted = {"kc-1", "kc-2"}
+    with session_factory() as db:
+        stats = service.push(db)
+    assert (stats.failed, stats.updated_keycloak) == (2, 1)
+    assert [kid for kid, _ in keycloak.updates] == ["kc-3"]
+
+
+def test_pulled_changes_are_not_pushed_back(session_factory):
+    _setup(session_factory, ("kc-1", "a@example.com", None), ("kc-2", "b@example.com", None))
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    for user_id in (1, 2):
+        _touch(session_factory, user_id, past + timedelta(seconds=user_id))
+    keycloak = FakeKeycloak()
+    service = _service(keycloak)
+    with session_factory() as db:
+        service.push(db)
+        service.pull(db)
+    pushed_at = _user(session_factory, 2).updated_at
+    # Then edited in the Keycloak console
+    keycloak.users["kc-2"] = _rep("kc-2", "new@example.com", "Bea", "Smith")
+    keycloak.event("kc-2", int(datetime.now(timezone.utc).timestamp() * 1000))
+    keycloak.updates.clear()
+
+    with session_factory() as db:
+        assert service.pull(db).updated_local == 1
+        service.push(db)
+    assert _user(session_factory, 2).email == "new@example.com"
+    assert keycloak.updates == []
+    assert _user(session_factory, 2).updated_at == pushed_at
+
+
+def test_pull_applies_keycloak_changes_and_deactivates_deleted_users(session_factory):
+    _setup(session_factory,
+           ("kc-1", "a@example.com", "Ann Lee"), ("kc-2", "b@example.com", None),
+           ("kc-3", "c@example.com", None), ("kc-4", "d@example.com", "Dee"))
+    keycloak = FakeKeycloak({
+        "kc-1": _rep("kc-1", "A@EXAMPLE.COM", "Ann", "Lee"),  # case only: no change
+        "kc-2": _rep("kc-2", "b2@example.com", "Bea", "Smith"),
+        "kc-4": _rep("kc-4", "d@example.com", "Dee", enabled=False),
+    })
+    service = _service(keycloak)
+
+    with session_factory() as db:
+        # The first run only sets the starting point
+        assert service.pull(db).scanned == 0
+        start = crud_sync.get_checkpoint(db, PULL)["time"]
+
+    for offset, user_id in enumerate(("kc-1", "kc-2", "kc-4", "kc-9"), start=1):
+        keycloak.event(user_id, start + offset)
+    keycloak.event("kc-3", start + 5, operation="DELETE")
+    keycloak.event("kc-2", start - 1)  # before the checkpoint
+
+    with session_factory() as db:
+        stats = service.pull(db)
+        events = crud_revocation.get_events(db, after_id=0, limit=10)
+        assert crud_sync.get_checkpoint(db, PULL)["time"] == start + 5
+
+    assert (stats.scanned, stats.updated_local, stats.deactivated, stats.skipped) == (5, 3, 2, 1)
+    ann, bea, cy, dee = (_user(session_factory, user_id) for user_id in (1, 2, 3, 4))
+    assert (ann.email, ann.full_name) == ("a@example.com", "Ann Lee")
+    assert (bea.email, bea.full_name) == ("b2@example.com", "Bea Smith")
+    assert not cy.is_active and not dee.is_active
+    assert sorted((e.user_id, e.is_active) for e in events) == [(3, False), (4, False)]
+
+
+def test_pull_keeps_unpushed_local_edits_and_stops_when_keycloak_is_down(session_factory):
+    _setup(session_factory, ("kc-1", "a@example.com", "Local Edit"))
+    keycloak = FakeKeycloak({"kc-1": _rep("kc-1", "a@example.com", "Remote", "Edit")})
+    service = _service(keycloak)
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        crud_sync.save_checkpoint(db, PULL, {"time": 1000})
+        crud_sync.save_checkpoint(db, PUSH, {"updated_at": (now - timedelta(hours=1)).isoformat(), "id": 0})
+    _touch(session_factory, 1, now)
+    keycloak.event("kc-1", 2000)
+
+    with session_factory() as db:
+        assert service.pull(db).skipped == 1
+    assert _user(session_factory, 1).full_name == "Local Edit"
+
+    keycloak.fail_reads = True
+    keycloak.event("kc-1", 3000)
+    with session_factory() as db:
+        crud_sync.save_checkpoint(db, PUSH, {"updated_at": now.isoformat(), "id": 1})
+        service.pull(db)
+        # Not advanced: the change is retried on the next run
+        assert crud_sync.get_checkpoint(db, PULL)["time"] == 2000
+
+
+def test_pull_publishes_role_mapping_changes(session_factory):
+    _setup(session_factory, ("kc-1", "a@example.com", None), ("kc-2", "b@example.com", None))
+    keycloak = FakeKeycloak({"kc-1": _rep("kc-1", "a@example.com"),
+                             "kc-2": _rep("kc-2", "b@example.com")})
+    with session_factory() as db:
+        crud_sync.save_checkpoint(db, PULL, {"time": 1000})
+    keycloak.event("kc-1", 2000, operation="CREATE", resource_type="REALM_ROLE_MAPPING",
+                   path="/role-mappings/realm")
+    keycloak.event("kc-2", 2001)
+
+    with session_factory() as db:
+        stats = _service(keycloak).pull(db)
+        events = crud_revocation.get_events(db, after_id=0, limit=10)
+    assert (stats.scanned, stats.updated_local) == (2, 0)
+    # Workers drop the cached permissions of kc-1 only
+    assert [(e.user_id, e.is_active) for e in events] == [(1, True)]
+
+
+def test_reconcile_pushes_drifted_users_and_resumes_from_checkpoint(session_factory):
+    _setup(session_factory,
+           ("kc-1", "a@example.com", "Ann Lee"), ("kc-2", "b@example.com", None),
+           ("kc-3", "c@example.com", "Cy"))
+    keycloak = FakeKeycloak({
+        "kc-1": _rep("kc-1", "a@example.com", "Ann", "Lee"),
+        "kc-2": _rep("kc-2", "old@example.com"),
+        "kc-3": _rep("kc-3", "c@example.com", "Old"),
+        "kc-4": _rep("kc-4", "orphan@example.com"),
+    })
+    service = _service(keycloak)
+
+    with session_factory() as db:
+        # Resume after the first page, as if interrupted
+        crud_sync.save_checkpoint(db, RECONCILE, {"first": 2})
+        stats = service.reconcile(db)
+        assert crud_sync.get_checkpoint(db, RECONCILE) is None
+    assert [kid for kid, _ in keycloak.updates] == ["kc-3"]
+    assert (stats.scanned, stats.skipped) == (2, 1)
+
+    keycloak.updates.clear()
+    with session_factory() as db:
+        stats = service.reconcile(db)
+    assert [kid for kid, _ in keycloak.updates] == ["kc-2"]
+    assert keycloak.users["kc-2"]["email"] == "b@example.com"
+    assert (stats.scanned, stats.updated_keycloak, stats.batches) == (4, 1, 3)